@@ -0,0 +1,53 @@
+"""
+Compara la extracción original (cuatro find_all sobre BeautifulSoup) con los
+backends de src.utils.html_extractor sobre una página grande sintética.
+
+Uso: python -m benchmarks.bench_extractor [n_secciones]
+"""
+import sys
+import timeit
+from bs4 import BeautifulSoup
+from src.utils.html_extractor import BACKENDS, extraer_contenido
+
+PARRAFO = "Bitcoin y Ethereum lideran el mercado mientras los desarrolladores publican nuevas mejoras de escalabilidad."
+
+def pagina_sintetica(secciones: int) -> str:
+    cuerpo = []
+    for i in range(secciones):
+        cuerpo.append(f"<nav><a href='/{i}'>menú {i}</a></nav><script>var x = {i};</script>")
+        cuerpo.append(f"<h2>Sección {i} sobre el estado actual del ecosistema cripto</h2>")
+        cuerpo.append("<div class='contenido'>" + "".join(f"<p>{PARRAFO} ({j})</p>" for j in range(5)) + "</div>")
+    return f"<html><head><title>Informe</title></head><body>{''.join(cuerpo)}<footer>pie</footer></body></html>"
+
+def extraccion_original(html: str) -> tuple:
+    soup = BeautifulSoup(html, 'html.parser')
+    for element in soup(['script', 'style', 'footer', 'nav', 'iframe', 'img']):
+        element.decompose()
+    title = soup.title.string if soup.title else "Contenido Web"
+    content_blocks = []
+    for tag in ['h1', 'h2', 'h3', 'p']:
+        for el in soup.find_all(tag):
+            text = el.get_text().strip()
+            if len(text.split()) > 5:
+                content_blocks.append(text)
+    return title, "\n".join(content_blocks[:30])
+
+def medir(nombre: str, funcion, repeticiones: int = 5) -> float:
+    mejor = min(timeit.repeat(funcion, number=1, repeat=repeticiones))
+    print(f"{nombre:<12} {mejor * 1000:8.1f} ms")
+    return mejor
+
+if __name__ == "__main__":
+    secciones = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    html = pagina_sintetica(secciones)
+    print(f"Página sintética: {len(html) // 1024} KB, {secciones} secciones\n")
+
+    base = medir("original", lambda: extraccion_original(html))
+    for nombre in BACKENDS:
+        t = medir(nombre, lambda: extraer_contenido(html, backend=nombre))
+        print(f"{'':<12} x{base / t:.1f}")
+
+    # Peor caso: el presupuesto no se agota y hay que recorrer la página entera
+    print("\nSin presupuesto (recorrido completo):")
+    for nombre in BACKENDS:
+        medir(nombre, lambda: extraer_contenido(html, max_bloques=10**9, max_medida=10**9, backend=nombre))
@@ -1,27 +1,84 @@
-from flask import Flask
+import hashlib
+import hmac
+import json
 from telegram.ext import (
     Application,
     CommandHandler,
     CallbackQueryHandler,
     filters
 )
-from telegram import BotCommand
-import asyncio
-import os
-from src.config import TELEGRAM_TOKEN as TOKEN, logger, BotMeta
+from telegram import BotCommand, Update
+from src.config import TELEGRAM_TOKEN as TOKEN, logger, BotMeta, PORT, TelegramConfig, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_URL
 from src.handlers.base import setup_base_handlers
 from src.handlers.crypto import precio_cripto
 from src.handlers.post import PostHandler
 from src.handlers.resume import ResumeHandler
+from src.services.crypto_mapper import crypto_mapper
+from src.services.http_client import cerrar_http_client
+from src.services.persistence import SQLitePersistence
+from src.services.price_cache import precio_cache
+from src.services.openai import cerrar_cliente_openai, metricas as metricas_openai
+from src.services.price_updater import detener_actualizador, iniciar_actualizador
+from src.services.web_fetcher import cerrar_web_fetcher
+from src.utils.admission import ControlAdmision, responder_rechazo
+from src.utils.dedup import SeenSet
 from src.utils.filters import MentionedBotFilter, TopicFilter
+from src.utils.send_limiter import LimitadorEnvios
+from src.utils.update_processor import ChatUpdateProcessor
 
-app = Flask(__name__)
+MAX_BODY = 1_000_000  # una actualización de Telegram ocupa unos pocos KB
 
-@app.route('/')
-def health_check():
-    return f"{BotMeta.NAME} está activo ✅", 200
+def secreto_webhook(token: str) -> str:
+    """Secreto derivado del token: todos los workers registran y validan el mismo valor"""
+    return hmac.new(token.encode(), b"webhook-secret", hashlib.sha256).hexdigest()
 
-application = Application.builder().token(TOKEN).build()
+# Sin WEBHOOK_SECRET se deriva del token; uno aleatorio por proceso haría que cada
+# set_webhook invalidara el secreto de los demás workers (403 en todas sus entregas)
+secret_token = WEBHOOK_SECRET or secreto_webhook(TOKEN)
+# Telegram reintenta la entrega si no respondemos a tiempo: se descartan update_id repetidos.
+# Solo dentro de este proceso: con varios workers, un reintento que cae en otro no se detecta.
+updates_vistos = SeenSet(max_size=10000)
+
+async def on_startup(app):
+    # Carga el snapshot local de monedas y refresca la lista en segundo plano
+    await crypto_mapper.maybe_refresh_list()
+    iniciar_actualizador(app)
+
+async def on_shutdown(app):
+    detener_actualizador()
+    await cerrar_http_client()
+    await cerrar_cliente_openai()
+    cerrar_web_fetcher()
+    precio_cache.cerrar()
+
+# Con webhook las actualizaciones llegan por HTTP y se encolan a mano: no hace falta Updater
+# En paralelo entre conversaciones, en orden dentro de cada una; lo que va a la IA
+# tiene su propio tope y control de admisión para no frenar las consultas de precio
+admision = ControlAdmision(
+    tasa_usuario=TelegramConfig.ADMISION_TASA_USUARIO,
+    rafaga_usuario=TelegramConfig.ADMISION_RAFAGA_USUARIO,
+    tasa_chat=TelegramConfig.ADMISION_TASA_CHAT,
+    rafaga_chat=TelegramConfig.ADMISION_RAFAGA_CHAT,
+    max_backlog=TelegramConfig.ADMISION_MAX_BACKLOG,
+    backlog_externo=lambda: metricas_openai.en_cola,
+)
+builder = Application.builder().token(TOKEN).concurrent_updates(
+    ChatUpdateProcessor(
+        TelegramConfig.MAX_CONCURRENT_UPDATES,
+        limite_caro=TelegramConfig.MAX_UPDATES_CAROS,
+        admision=admision,
+        al_rechazar=responder_rechazo,
+    )
+).rate_limiter(LimitadorEnvios(
+    por_segundo=TelegramConfig.ENVIOS_POR_SEGUNDO,
+    grupo_por_minuto=TelegramConfig.ENVIOS_GRUPO_POR_MINUTO,
+    privado_por_segundo=TelegramConfig.ENVIOS_PRIVADO_POR_SEGUNDO,
+    rafaga_chat=TelegramConfig.ENVIOS_RAFAGA_CHAT,
+    max_reintentos=TelegramConfig.ENVIOS_MAX_REINTENTOS,
+)).persistence(SQLitePersistence(update_interval=TelegramConfig.PERSISTENCIA_INTERVALO))
+if WEBHOOK_URL:
+    builder = builder.updater(None)
+application = builder.build()
 post_handler = PostHandler()
 resume_handler = ResumeHandler()
 
@@ -38,16 +95,103 @@ async def set_commands():
 
 def setup_handlers():
     setup_base_handlers(application)
-    filtro = MentionedBotFilter() & TopicFilter()
+    filtro = TopicFilter() & MentionedBotFilter()
     application.add_handler(CommandHandler("precio", precio_cripto, filters=filtro))
     application.add_handler(CommandHandler("post", post_handler.handle, filters=filtro))
     application.add_handler(CommandHandler("resumen_texto", resume_handler.handle_resumen_texto, filters=filtro))
     application.add_handler(CommandHandler("resumen_url", resume_handler.handle_resumen_url, filters=filtro))
     application.add_handler(CallbackQueryHandler(post_handler.handle_confirmation, pattern="^(confirm|cancel)_post_"))
 
-if __name__ == '__main__':
+async def _responder(send, status: int, cuerpo: bytes = b"", tipo: bytes = b"text/plain; charset=utf-8"):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", tipo), (b"content-length", str(len(cuerpo)).encode())],
+    })
+    await send({"type": "http.response.body", "body": cuerpo})
+
+async def _leer_cuerpo(receive) -> bytes:
+    cuerpo = bytearray()
+    while True:
+        mensaje = await receive()
+        cuerpo += mensaje.get("body", b"")
+        if len(cuerpo) > MAX_BODY:
+            raise ValueError("cuerpo demasiado grande")
+        if not mensaje.get("more_body"):
+            return bytes(cuerpo)
+
+async def _iniciar():
     setup_handlers()
-    loop = asyncio.get_event_loop()
-    loop.create_task(set_commands())
-    loop.create_task(application.run_polling())
-    app.run(host='0.0.0.0', port=int(os.getenv('PORT', 10000)))
+    await application.initialize()
+    await on_startup(application)
+    await application.start()
+    await set_commands()
+    if WEBHOOK_URL:
+        await application.bot.set_webhook(
+            url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+            secret_token=secret_token,
+            allowed_updates=Update.ALL_TYPES
+        )
+        logger.info(f"🌐 Webhook registrado en {WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}")
+    else:
+        # Desarrollo local: sin URL pública se sigue usando long polling en el mismo loop
+        await application.updater.start_polling()
+        logger.info("🔁 WEBHOOK_URL no configurada, usando polling")
+
+async def _detener():
+    if application.updater and application.updater.running:
+        await application.updater.stop()
+    await application.stop()
+    await on_shutdown(application)
+    await application.shutdown()
+
+async def _lifespan(receive, send):
+    while True:
+        mensaje = await receive()
+        if mensaje["type"] == "lifespan.startup":
+            try:
+                await _iniciar()
+            except Exception as e:
+                logger.exception("Error al iniciar el bot")
+                await send({"type": "lifespan.startup.failed", "message": str(e)})
+                return
+            await send({"type": "lifespan.startup.complete"})
+        elif mensaje["type"] == "lifespan.shutdown":
+            await _detener()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+async def _webhook(scope, receive, send):
+    headers = dict(scope["headers"])
+    recibido = headers.get(b"x-telegram-bot-api-secret-token", b"")
+    if not hmac.compare_digest(recibido, secret_token.encode()):
+        await _responder(send, 403)
+        return
+    try:
+        datos = json.loads(await _leer_cuerpo(receive))
+        update = Update.de_json(datos, application.bot)
+    except Exception as e:
+        logger.warning(f"Actualización inválida en el webhook: {e}")
+        await _responder(send, 400)
+        return
+    if update and updates_vistos.add(update.update_id):
+        await application.update_queue.put(update)
+    # Se responde enseguida: el procesamiento sigue en la cola de la Application
+    await _responder(send, 200)
+
+async def app(scope, receive, send):
+    """Aplicación ASGI: health check en / y webhook de Telegram en WEBHOOK_PATH"""
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+    elif scope["type"] != "http":
+        return
+    elif scope["path"] == "/" and scope["method"] in ("GET", "HEAD"):
+        await _responder(send, 200, f"{BotMeta.NAME} está activo ✅".encode())
+    elif scope["path"] == WEBHOOK_PATH and scope["method"] == "POST":
+        await _webhook(scope, receive, send)
+    else:
+        await _responder(send, 404)
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=PORT)
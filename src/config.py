@@ -27,6 +27,10 @@ GROUP_ID = -1002348706229
 TOPIC_ID = 8183
 POST_CHANNEL_ID = -1002615396578
 WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+PORT = int(os.getenv("PORT", 10000))
+DATA_DIR = Path(os.getenv("DATA_DIR", Path(__file__).parent.parent / "data"))
 
 class BotMeta:
     NAME = "SoonBot"
@@ -69,10 +73,72 @@ class BotPersonality:
 class APIConfig:
     COINGECKO_URL = "https://api.coingecko.com/api/v3"
     COINGECKO_TIMEOUT = 30
+    COINGECKO_LIST_TIMEOUT = 60
+    COINGECKO_BATCH_WINDOW = 0.05
+    COINGECKO_BATCH_MAX = 50
+    PRICE_CACHE_MAX = 2000
+    PRICE_CACHE_TTL = 60
+    PRICE_CACHE_STALE_TTL = 600
+    PRICE_CACHE_LEASE = 10  # un solo proceso del host consulta cada id (el dueño renueva el lease); el resto espera como mucho esto
+    HOT_SET_SIZE = 25
+    DEMAND_HALF_LIFE = 3600
+    UPDATER_INTERVAL = 60
+    UPDATER_MIN_INTERVAL = 20
+    UPDATER_MAX_INTERVAL = 300
+    UPDATER_MAX_BACKOFF = 900
+    UPDATER_IDLE_AFTER = 900
+    UPDATER_VOLATILITY_PCT = 1.0
+    UPDATER_JITTER = 0.1
+    COINGECKO_LIST_TTL_HOURS = 24
+    COINGECKO_RANKING_TOP = 500  # monedas con ranking por capitalización (páginas de 250)
+    COINMARKETCAP_TIMEOUT = 10
+    HTTP_TIMEOUT = 15
+    HTTP_CONNECT_TIMEOUT = 5
+    HTTP_MAX_CONNECTIONS = 20
+    HTTP_MAX_KEEPALIVE = 10
+    WEB_MAX_BYTES = 2_000_000  # tope de descarga para /resumen_url
+    WEB_PARSE_WORKERS = 2
     REQUEST_HEADERS = {
         "User-Agent": "SoonBot/2.0",
         "Accept": "application/json"
     }
 
+class TelegramConfig:
+    MAX_CONCURRENT_UPDATES = int(os.getenv("MAX_CONCURRENT_UPDATES", 16))
+    # Carril caro (IA): nunca ocupa todos los huecos, las consultas de precio siempre tienen sitio
+    MAX_UPDATES_CAROS = int(os.getenv("MAX_UPDATES_CAROS", 8))
+    # Token buckets del carril caro: tokens por segundo y ráfaga máxima
+    ADMISION_TASA_USUARIO = float(os.getenv("ADMISION_TASA_USUARIO", 1 / 20))
+    ADMISION_RAFAGA_USUARIO = 3
+    ADMISION_TASA_CHAT = float(os.getenv("ADMISION_TASA_CHAT", 0.5))
+    ADMISION_RAFAGA_CHAT = 10
+    # Con más trabajo caro pendiente que esto se responde "ocupado" al momento
+    ADMISION_MAX_BACKLOG = int(os.getenv("ADMISION_MAX_BACKLOG", 8))
+    # Cola de salida: límites de envío de Telegram (global y por chat)
+    ENVIOS_POR_SEGUNDO = 30
+    ENVIOS_GRUPO_POR_MINUTO = 20
+    ENVIOS_PRIVADO_POR_SEGUNDO = 1
+    ENVIOS_RAFAGA_CHAT = 3
+    ENVIOS_MAX_REINTENTOS = 3
+    # Cada cuánto PTB entrega a la persistencia los user_data/chat_data modificados
+    PERSISTENCIA_INTERVALO = float(os.getenv("PERSISTENCIA_INTERVALO", 5))
+
+class OpenAIConfig:
+    MODEL = "gpt-4-turbo"
+    MAX_CONCURRENCIA = 4
+    TIMEOUT = 20          # por petición a la API
+    DEADLINE = 45         # total por llamada: cola + reintentos
+    MAX_REINTENTOS = 2
+    BACKOFF_BASE = 1.0
+    OPINION_CACHE_TTL = 300
+    OPINION_CACHE_MAX = 500
+    OPINION_PRICE_STEP = 0.005   # cubetas de precio del 0,5 %
+    OPINION_CHANGE_STEP = 1.0    # cubetas de cambio 24h de 1 punto
+    RESUMEN_TOKENS_TROZO = 2500      # tamaño de cada trozo en la fase map
+    RESUMEN_MAX_TROZOS = 12
+    RESUMEN_CONCURRENCIA = 3         # trozos en paralelo por resumen
+    RESUMEN_TOKENS_PARCIAL = 300
+    RESUMEN_TOKENS_FINAL = 700
+
 if not TELEGRAM_TOKEN:
     raise ValueError("TELEGRAM_TOKEN no está configurado en .env")
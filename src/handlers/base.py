@@ -1,10 +1,16 @@
+import time
 from telegram import Update
 from telegram.ext import ContextTypes, CommandHandler, MessageHandler, filters
-from src.config import logger
-from src.services.openai import generar_respuesta_ia
+from src.config import ADMIN_IDS, logger
+from src.services.openai import generar_respuesta_ia_stream, metricas as metricas_openai
+from src.services.opinion_cache import opinion_cache
 from src.services.coingecko import CoinGeckoAPI
+from src.services.crypto_mapper import crypto_mapper
+from src.services.price_cache import precio_cache
 from src.utils.personality import Personalidad
 from src.utils.filters import MentionedBotFilter, TopicFilter
+from src.utils.send_limiter import AGRUPABLE
+from src.utils.streaming import responder_en_streaming
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
@@ -26,56 +32,89 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     await update.message.reply_text(help_text, parse_mode="Markdown")
 
+def _formatear_stats(nombre: str, stats: dict) -> str:
+    return f"*{nombre}*\n" + "\n".join(f"• {k}: `{v}`" for k, v in stats.items())
+
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Métricas internas (solo administradores)"""
+    secciones = [
+        _formatear_stats("Caché de precios", precio_cache.stats()),
+        _formatear_stats("Caché de opiniones IA", opinion_cache.stats()),
+        _formatear_stats("OpenAI", metricas_openai.resumen()),
+    ]
+    procesador = context.application.update_processor
+    if hasattr(procesador, "stats"):
+        secciones.append(_formatear_stats("Updates", procesador.stats()))
+    limitador = getattr(context.bot, "rate_limiter", None)
+    if hasattr(limitador, "stats"):
+        secciones.append(_formatear_stats("Envíos", limitador.stats()))
+    persistencia = context.application.persistence
+    if hasattr(persistencia, "stats"):
+        secciones.append(_formatear_stats("Persistencia", persistencia.stats()))
+    await update.message.reply_text("📊 " + "\n\n".join(secciones), parse_mode="Markdown")
+
+MAX_CRIPTOS_CONTEXTO = 10
+
+def _recordar_cripto(ctx: dict, cripto_id: str) -> None:
+    """Guarda en el chat solo qué ids se consultaron (y cuándo), no los precios"""
+    ctx.pop(cripto_id, None)
+    ctx[cripto_id] = time.time()
+    while len(ctx) > MAX_CRIPTOS_CONTEXTO:
+        ctx.pop(next(iter(ctx)))
+
+def _contexto_precios(ctx: dict) -> dict:
+    """Arma el contexto para la IA leyendo los precios desde la caché única"""
+    contexto = {}
+    for cripto_id in ctx:
+        datos = precio_cache.peek(cripto_id)
+        if datos:
+            contexto[cripto_id] = datos
+    return contexto
+
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    # Verificación directa por texto, ignorando si no comienza con @
+    # Los filtros del handler ya garantizan que el mensaje empieza con la mención al bot
     if not update.message or not update.message.text:
         return
 
-    bot_username = (await context.bot.get_me()).username.lower()
-    if not update.message.text.strip().lower().startswith(f"@{bot_username}"):
-        return
-
     user_msg = update.message.text.lower()
     user_name = update.effective_user.first_name
-    ctx = context.chat_data.get("cripto_ctx", {})
-
-    if any(p in user_msg for p in ["precio", "a cuánto", "valor de"]):
-        cripto = next((c for c in ["btc", "eth", "sol", "bitcoin", "ethereum", "solana"] 
-                      if c in user_msg), None)
+    ctx = context.chat_data.setdefault("cripto_ctx", {})
 
-        if cripto:
-            try:
-                cripto_id = "bitcoin" if cripto in ["btc", "bitcoin"] else \
-                            "ethereum" if cripto in ["eth", "ethereum"] else \
-                            "solana" if cripto in ["sol", "solana"] else cripto
+    # El mismo criterio que usa el control de admisión para mandarlo al carril barato
+    mencionadas = crypto_mapper.monedas_consultadas(update.message.text)
+    if mencionadas:
+        cripto_id = mencionadas[0]
+        try:
+            datos = await CoinGeckoAPI.obtener_precio(cripto_id)
+            _recordar_cripto(ctx, cripto_id)
+            opinion = Personalidad.generar_opinion_cripto(cripto_id, datos)
 
-                datos = CoinGeckoAPI.obtener_precio(cripto_id)
-                ctx[cripto] = datos
-                opinion = Personalidad.generar_opinion_cripto(cripto_id, datos)
+            respuesta = (
+                f"📊 {datos['nombre']} ({datos['simbolo'].upper()})\n"
+                f"💵 Precio: ${datos['precio']:,.2f}\n"
+                f"📈 24h: {datos['cambio_24h']:+.2f}%\n\n"
+                f"{opinion}"
+            )
 
-                respuesta = (
-                    f"📊 {datos['nombre']} ({datos['simbolo'].upper()})\n"
-                    f"💵 Precio: ${datos['precio']:,.2f}\n"
-                    f"📈 24h: {datos['cambio_24h']:+.2f}%\n\n"
-                    f"{opinion}"
-                )
+        except Exception as e:
+            logger.error(f"Error al obtener precio: {str(e)}")
+            respuesta = Personalidad.generar_respuesta_error(user_name)
 
-            except Exception as e:
-                logger.error(f"Error al obtener precio: {str(e)}")
-                respuesta = Personalidad.generar_respuesta_error(user_name)
-
-            await update.message.reply_text(respuesta)
-            return
+        await update.message.reply_text(respuesta, rate_limit_args=AGRUPABLE)
+        return
 
     try:
-        respuesta = await generar_respuesta_ia(user_msg, user_name, ctx)
-        await update.message.reply_text(respuesta)
+        await responder_en_streaming(
+            update.message,
+            generar_respuesta_ia_stream(user_msg, user_name, _contexto_precios(ctx))
+        )
     except Exception as e:
         logger.error(f"Error en IA: {str(e)}")
         await update.message.reply_text(Personalidad.generar_respuesta_error(user_name))
 
 def setup_base_handlers(application):
-    filtro = MentionedBotFilter() & TopicFilter()
+    filtro = TopicFilter() & MentionedBotFilter()
     application.add_handler(CommandHandler("start", start, filters=filtro))
     application.add_handler(CommandHandler("help", help_command, filters=filtro))
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND & filtro, handle_message))
+    application.add_handler(CommandHandler("stats", stats_command, filters=filters.User(user_id=ADMIN_IDS)))
+    application.add_handler(MessageHandler(TopicFilter() & filters.TEXT & ~filters.COMMAND & MentionedBotFilter(), handle_message))
@@ -1,11 +1,30 @@
 from telegram import Update
 from telegram.ext import ContextTypes
-from src.services.price_updater import get_precio_desde_cache
 from src.services.coingecko import CoinGeckoAPI
 from src.services.coinmarketcap import CoinMarketCapAPI
-from src.services.openai import generar_respuesta_ia
+from src.services.openai import generar_respuesta_ia_stream
+from src.services.opinion_cache import clave_opinion, opinion_cache
 from src.services.crypto_mapper import crypto_mapper
 from src.config import logger
+from src.utils.admission import MENSAJES_RECHAZO
+from src.utils.send_limiter import AGRUPABLE
+from src.utils.streaming import responder_con_formato, responder_en_streaming
+from src.utils.update_processor import ChatUpdateProcessor
+
+async def _opinar(update: Update, prompt: str, contexto: dict, clave, disclaimer: str):
+    """Opinión de la IA en streaming; se guarda en caché para la misma cubeta de precio"""
+    try:
+        await responder_en_streaming(
+            update.message,
+            generar_respuesta_ia_stream(
+                prompt, "Usuario", contexto,
+                al_completar=lambda texto: opinion_cache.set(clave, texto)
+            ),
+            sufijo=disclaimer,
+            parse_mode="Markdown"
+        )
+    except Exception as e:
+        logger.error(f"Error generando la opinión de /precio: {e}")
 
 async def precio_cripto(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
@@ -13,7 +32,7 @@ async def precio_cripto(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await update.message.reply_text(
                 "💰 Usa `/precio <token>` para consultar, por ejemplo:\n"
                 "`/precio btc`, `/precio ethereum`, `/precio sol`",
-                parse_mode="Markdown"
+                parse_mode="Markdown", rate_limit_args=AGRUPABLE
             )
             return
 
@@ -24,41 +43,68 @@ async def precio_cripto(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await crypto_mapper.maybe_refresh_list()
         cripto_id = crypto_mapper.find_coin(user_input)
 
-        datos = get_precio_desde_cache(cripto_id) if cripto_id else None
+        # Ambos clientes leen a través de la caché única de precios
+        datos = None
+        if cripto_id:
+            try:
+                datos = await CoinGeckoAPI.obtener_precio(cripto_id)
+            except ValueError as e:
+                logger.warning(f"CoinGecko sin datos para {cripto_id}: {e}")
 
         if not datos:
-            datos = CoinMarketCapAPI.obtener_precio(user_input)
+            datos = await CoinMarketCapAPI.obtener_precio(user_input)
 
-        if not datos and cripto_id:
-            datos = CoinGeckoAPI.obtener_precio(cripto_id)
-            
         if datos:
             emoji_trend = "📈" if datos.get('cambio_24h', 0) >= 0 else "📉"
             respuesta = (
-                f"🔹 *{datos.get('nombre', 'Unknown')} ({datos.get('symbol', '??').upper()})*\n"
+                f"🔹 *{datos.get('nombre', 'Unknown')} ({(datos.get('simbolo') or datos.get('symbol') or '??').upper()})*\n"
                 f"💵 Precio: ${datos.get('precio', 0):,.2f} USD\n"
                 f"{emoji_trend} 24h: {datos.get('cambio_24h', 0):+.2f}%\n"
                 f"🔄 Actualizado: {datos.get('ultima_actualizacion', 'N/A')}"
             )
-            await update.message.reply_text(respuesta, parse_mode="Markdown")
-
-            contexto = f"Token consultado: {user_input}\n{respuesta}"
+            contexto = {cripto_id or user_input: datos}
             prompt = (
                 "Eres un analista de mercado cripto. Basado en los datos entregados, genera una breve "
                 "explicación en español sobre la situación actual del token consultado, con un estilo claro y profesional."
             )
-            opinion = await generar_respuesta_ia(prompt, update.effective_user.first_name, contexto)
-
             disclaimer = (
                 "\n\n⚠️ *Aviso rápido:* Este análisis es solo informativo y con un toque de humor. "
                 "¡No tomes decisiones de inversión solo por lo que diga un bot! 😉"
             )
 
-            await update.message.reply_text(opinion + disclaimer, parse_mode="Markdown")
+            # Misma pregunta, mismo token y precio en la misma cubeta: respuesta instantánea.
+            # Se pregunta como "Usuario" para que la opinión sirva a cualquiera.
+            clave = clave_opinion(prompt, cripto_id or user_input, datos)
+            opinion = opinion_cache.get(clave)
+            if opinion:
+                # Con la opinión ya en caché, precio y opinión van en un solo mensaje.
+                # Si el texto generado rompe el Markdown, sale sin formato (como en el streaming)
+                await responder_con_formato(
+                    update.message, respuesta + "\n\n" + opinion + disclaimer, "Markdown", rate_limit_args=AGRUPABLE
+                )
+            else:
+                # Sin caché la opinión es trabajo de IA: pasa por la admisión del carril caro
+                # y se genera fuera del carril barato, que solo espera a la línea del precio
+                procesador = context.application.update_processor
+                carril_caro = isinstance(procesador, ChatUpdateProcessor)
+                motivo = procesador.admitir_caro(update) if carril_caro else None
+                if motivo:
+                    await update.message.reply_text(
+                        respuesta + "\n\n" + MENSAJES_RECHAZO[motivo], parse_mode="Markdown", rate_limit_args=AGRUPABLE
+                    )
+                    return
+                await update.message.reply_text(respuesta, parse_mode="Markdown", rate_limit_args=AGRUPABLE)
+                opinar = _opinar(update, prompt, contexto, clave, disclaimer)
+                if carril_caro:
+                    procesador.lanzar_caro(opinar)
+                else:
+                    await opinar
 
         else:
             raise ValueError("No se encontraron datos disponibles")
 
     except Exception as e:
         logger.error(f"Error en /precio: {e}")
-        await update.message.reply_text("⚠️ No pude obtener el precio ahora. Intenta más tarde.")
+        await update.message.reply_text(
+            "⚠️ No pude obtener el precio ahora. Intenta más tarde.", rate_limit_args=AGRUPABLE
+        )
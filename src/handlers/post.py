@@ -1,6 +1,21 @@
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import ContextTypes
 from src.config import logger
+from src.utils.keyword_matcher import KeywordMatcher
+
+# Hashtags por categoría, en el orden en que se añaden al post
+_HASHTAGS = {
+    "cripto": ["#Cripto", "#Blockchain"],
+    "gamefi": ["#GameFi"],
+    "ia": ["#IA"],
+    "finanzas": ["#Finanzas"],
+}
+_matcher_hashtags = KeywordMatcher({
+    "cripto": ["bitcoin", "cripto", "criptos", "criptomoneda", "criptomonedas", "blockchain"],
+    "gamefi": ["juego", "juegos", "gaming", "nft", "nfts"],
+    "ia": ["ia", "inteligencia artificial", "modelo", "modelos"],
+    "finanzas": ["dinero", "finanzas", "inversión"],
+})
 
 class PostHandler:
     CHANNEL_ID = -1002348706229  # Canal de destino
@@ -83,14 +98,5 @@ class PostHandler:
             await query.edit_message_text("❌ Post cancelado.")
 
     def _generate_hashtags(self, text: str) -> str:
-        text = text.lower()
-        tags = []
-        if any(word in text for word in ["bitcoin", "cripto", "blockchain"]):
-            tags.extend(["#Cripto", "#Blockchain"])
-        if any(word in text for word in ["juego", "gaming", "nft"]):
-            tags.append("#GameFi")
-        if any(word in text for word in ["ia", "inteligencia artificial", "modelo"]):
-            tags.append("#IA")
-        if any(word in text for word in ["dinero", "finanzas", "inversión"]):
-            tags.append("#Finanzas")
-        return " ".join(tags)
+        encontradas = _matcher_hashtags.categorias(text)
+        return " ".join(tag for categoria, tags in _HASHTAGS.items() if categoria in encontradas for tag in tags)
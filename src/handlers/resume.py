@@ -1,11 +1,28 @@
+import asyncio
 import re
-import requests
-from bs4 import BeautifulSoup
+import time
+from functools import partial
 from telegram import Update
 from telegram.ext import CallbackContext
-from typing import Literal
+from typing import Literal, Optional
 from urllib.parse import urlparse
-from src.services.openai import generar_respuesta_ia
+from src.config import OpenAIConfig, logger
+from src.services.openai import completar_prompt, generar_respuesta_ia, generar_respuesta_ia_stream
+from src.services.web_fetcher import descargar_pagina, parsear_en_pool
+from src.services.summary_store import FRESCO_SEG, canonicalizar_url, hash_contenido, summary_store
+from src.utils.html_extractor import extraer_contenido
+from src.utils.keyword_matcher import KeywordMatcher
+from src.utils.send_limiter import AGRUPABLE
+from src.utils.tokens import contar_tokens, dividir_en_trozos
+from src.utils.streaming import dividir_mensaje, responder_con_formato, responder_en_streaming
+
+_TEMAS = {
+    'blockchain': ['blockchain', 'token', 'tokens', 'nft', 'nfts', 'web3', 'defi', 'staking',
+                   'smart contract', 'smart contracts', 'wallet', 'wallets'],
+    'finanzas': ['inversión', 'mercado', 'acciones', 'dividendos', 'bolsa', 'financiero', 'trading'],
+    'tecnología': ['IA', 'machine learning', 'cloud', 'software', 'hardware', 'algoritmo'],
+}
+_matcher_temas = KeywordMatcher(_TEMAS)
 
 class ResumeHandler:
     async def handle_resumen_texto(self, update: Update, context: CallbackContext) -> None:
@@ -23,9 +40,11 @@ class ResumeHandler:
 
         try:
             content_type = self._classify_content(original_text)
-            summary = await self._generate_openai_summary(original_text, content_type)
-            for chunk in self._split_message(summary):
-                await update.message.reply_text(chunk, parse_mode="Markdown")
+            await responder_en_streaming(
+                update.message,
+                self._stream_document_summary(original_text, content_type),
+                parse_mode="Markdown"
+            )
         except Exception as e:
             await update.message.reply_text(f"❌ Error al generar resumen: {str(e)}")
 
@@ -43,43 +62,117 @@ class ResumeHandler:
             return
 
         try:
-            title, clean_text = await self._fetch_web_content(url)
-            content_type = self._classify_content(clean_text)
-            summary = await self._generate_openai_summary(clean_text, content_type)
+            clave = canonicalizar_url(url)
             fuente = self._get_domain(url)
-            full_message = f"🔗 **Resumen de {title}**\n\n{summary}\n\n🌐 Fuente: {fuente}"
-            for chunk in self._split_message(full_message):
-                await update.message.reply_text(chunk, parse_mode="Markdown", disable_web_page_preview=True)
+            previo = await asyncio.to_thread(summary_store.obtener, clave)
+            if previo and time.time() - previo["checked_at"] < FRESCO_SEG:
+                await self._enviar_resumen_guardado(update, previo, fuente)
+                return
+
+            pagina = await self._fetch_web_content(url, previo)
+            if pagina is None:
+                # 304: la página no cambió desde el último resumen
+                await asyncio.to_thread(summary_store.revalidado, clave)
+                await self._enviar_resumen_guardado(update, previo, fuente)
+                return
+
+            title, clean_text, etag, last_modified = pagina
+            content_hash = hash_contenido(clean_text)
+            if previo and previo["content_hash"] == content_hash:
+                await asyncio.to_thread(summary_store.revalidado, clave, etag, last_modified)
+                await self._enviar_resumen_guardado(update, previo, fuente)
+                return
+
+            content_type = self._classify_content(clean_text)
+            completo = []  # solo se rellena si el modelo terminó sin errores
+            await responder_en_streaming(
+                update.message,
+                self._stream_document_summary(clean_text, content_type, al_completar=completo.append),
+                prefijo=f"🔗 **Resumen de {title}**\n\n",
+                sufijo=f"\n\n🌐 Fuente: {fuente}",
+                parse_mode="Markdown",
+                disable_web_page_preview=True
+            )
+            if completo:
+                await asyncio.to_thread(
+                    summary_store.guardar, clave, title, completo[0], content_hash, etag, last_modified
+                )
         except Exception as e:
             await update.message.reply_text(f"❌ Error al procesar URL: {str(e)}")
 
+    async def _enviar_resumen_guardado(self, update: Update, guardado: dict, fuente: str) -> None:
+        texto = f"🔗 **Resumen de {guardado['title']}**\n\n{guardado['summary']}\n\n🌐 Fuente: {fuente}"
+        # El resumen pudo guardarse tras caer a texto plano: el reenvío tiene el mismo respaldo
+        for parte in self._split_message(texto):
+            await responder_con_formato(
+                update.message, parte, "Markdown", disable_web_page_preview=True, rate_limit_args=AGRUPABLE
+            )
+
     def _split_message(self, text: str, limit: int = 4000) -> list[str]:
-        chunks = []
-        while len(text) > limit:
-            split_at = text.rfind('\n', 0, limit)
-            if split_at == -1:
-                split_at = limit
-            chunks.append(text[:split_at])
-            text = text[split_at:].lstrip()
-        chunks.append(text)
-        return chunks
+        return dividir_mensaje(text, limit)
 
     def _classify_content(self, text: str) -> Literal['blockchain', 'finanzas', 'tecnología', 'general']:
-        crypto_terms = ['blockchain', 'token', 'nft', 'web3', 'defi', 'staking', 'smart contract', 'wallet']
-        finance_terms = ['inversión', 'mercado', 'acciones', 'dividendos', 'bolsa', 'financiero', 'trading']
-        tech_terms = ['IA', 'machine learning', 'cloud', 'software', 'hardware', 'algoritmo']
+        return _matcher_temas.primera(text, prioridad=list(_TEMAS)) or 'general'
 
-        text_lower = text.lower()
+    async def _generate_openai_summary(self, text: str, tipo: str) -> str:
+        return await generar_respuesta_ia(self._summary_prompt(text, tipo), "Usuario")
 
-        if any(term in text_lower for term in crypto_terms):
-            return 'blockchain'
-        elif any(term in text_lower for term in finance_terms):
-            return 'finanzas'
-        elif any(term in text_lower for term in tech_terms):
-            return 'tecnología'
-        return 'general'
+    def _stream_openai_summary(self, text: str, tipo: str, al_completar=None,
+                               max_tokens: int = OpenAIConfig.RESUMEN_TOKENS_FINAL):
+        return generar_respuesta_ia_stream(
+            self._summary_prompt(text, tipo), "Usuario", max_tokens=max_tokens, al_completar=al_completar
+        )
 
-    async def _generate_openai_summary(self, text: str, tipo: str) -> str:
+    async def _stream_document_summary(self, text: str, tipo: str, al_completar=None):
+        """
+        Map-reduce: si el texto no cabe en un trozo, resume cada trozo en paralelo
+        (con concurrencia acotada) y transmite la combinación final con el formato temático
+        """
+        trozos = dividir_en_trozos(text, OpenAIConfig.RESUMEN_TOKENS_TROZO)
+        if len(trozos) <= 1:
+            async for fragmento in self._stream_openai_summary(text, tipo, al_completar):
+                yield fragmento
+            return
+
+        if len(trozos) > OpenAIConfig.RESUMEN_MAX_TROZOS:
+            logger.warning(f"Documento de {len(trozos)} trozos, se resumen los primeros {OpenAIConfig.RESUMEN_MAX_TROZOS}")
+            trozos = trozos[:OpenAIConfig.RESUMEN_MAX_TROZOS]
+
+        semaforo = asyncio.Semaphore(OpenAIConfig.RESUMEN_CONCURRENCIA)
+
+        async def resumir_trozo(i: int, trozo: str) -> str:
+            async with semaforo:
+                return await completar_prompt(self._chunk_prompt(trozo, i, len(trozos)), OpenAIConfig.RESUMEN_TOKENS_PARCIAL)
+
+        inicio = time.monotonic()
+        resultados = await asyncio.gather(
+            *(resumir_trozo(i, trozo) for i, trozo in enumerate(trozos, 1)), return_exceptions=True
+        )
+        parciales = [r for r in resultados if isinstance(r, str) and r.strip()]
+        fallidos = len(resultados) - len(parciales)
+        logger.info(
+            f"🧩 Map de {len(trozos)} trozos ({contar_tokens(text)} tokens) en {time.monotonic() - inicio:.1f}s"
+            + (f", {fallidos} fallidos" if fallidos else "")
+        )
+        if not parciales:
+            yield "⚠️ No se pudo generar el resumen. Por favor, intenta más tarde."
+            return
+
+        # Un resumen sin todos los trozos no se guarda: se serviría como completo hasta que cambie la página
+        async for fragmento in self._stream_openai_summary("\n\n".join(parciales), tipo, None if fallidos else al_completar):
+            yield fragmento
+        if fallidos:
+            yield f"\n\n⚠️ Resumen parcial: no se pudieron procesar {fallidos} de {len(resultados)} partes del documento."
+
+    def _chunk_prompt(self, text: str, parte: int, total: int) -> str:
+        return (
+            f"Este es el fragmento {parte} de {total} de un documento más largo. "
+            "Resume en español, en viñetas breves, los hechos, cifras, fechas y nombres relevantes. "
+            "No agregues introducciones ni opiniones.\n\n"
+            f"Fragmento:\n{text}"
+        )
+
+    def _summary_prompt(self, text: str, tipo: str) -> str:
         if tipo == 'blockchain':
             instrucciones = """🔹 Proyecto
 Breve descripción general del proyecto
@@ -124,7 +217,7 @@ Casos de uso o entornos donde se implementa"""
 Resumen general con ideas principales y conceptos destacados
 Usa viñetas y encabezados solo si es necesario"""
 
-        prompt = (
+        return (
             "Eres un asistente profesional que redacta resúmenes temáticos con formato visual estructurado. "
             "Tu respuesta debe estar en español y seguir exactamente este formato, usando encabezados con emojis. "
             "No agregues introducciones ni conclusiones. Si alguna sección no aplica, indica 'No especificado'. "
@@ -133,28 +226,27 @@ Usa viñetas y encabezados solo si es necesario"""
             "📌 Resumen generado automáticamente."
         )
 
-        return await generar_respuesta_ia(prompt, "Usuario")
-
-    async def _fetch_web_content(self, url: str) -> tuple:
-        headers = {
-            'User-Agent': 'Mozilla/5.0',
-            'Accept-Language': 'es-ES,es;q=0.9'
-        }
+    async def _fetch_web_content(self, url: str, previo: Optional[dict] = None) -> Optional[tuple]:
+        """Devuelve (título, texto, etag, last_modified), o None si el servidor responde 304"""
+        headers = {}
+        if previo:
+            if previo.get("etag"):
+                headers['If-None-Match'] = previo["etag"]
+            if previo.get("last_modified"):
+                headers['If-Modified-Since'] = previo["last_modified"]
         try:
-            response = requests.get(url, headers=headers, timeout=15)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-            for element in soup(['script', 'style', 'footer', 'nav', 'iframe', 'img']):
-                element.decompose()
-            title = soup.title.string if soup.title else "Contenido Web"
-            content_blocks = []
-            for tag in ['h1', 'h2', 'h3', 'p']:
-                elements = soup.find_all(tag)
-                for el in elements:
-                    text = el.get_text().strip()
-                    if len(text.split()) > 5:
-                        content_blocks.append(text)
-            return title, "\n".join(content_blocks[:30])
+            pagina = await descargar_pagina(url, headers)
+            if pagina.status == 304 and previo:
+                logger.info(f"♻️ {url} sin cambios (304), se reutiliza el resumen")
+                return None
+            extraer = partial(
+                extraer_contenido,
+                max_bloques=1000,
+                max_medida=OpenAIConfig.RESUMEN_TOKENS_TROZO * OpenAIConfig.RESUMEN_MAX_TROZOS,
+                medir=contar_tokens
+            )
+            title, text = await parsear_en_pool(extraer, pagina.html)
+            return title, text, pagina.etag, pagina.last_modified
         except Exception as e:
             raise Exception(f"No se pudo procesar la URL: {str(e)}")
 
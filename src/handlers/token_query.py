@@ -1,31 +1,36 @@
 from telegram import Update
 from telegram.ext import ContextTypes, MessageHandler, filters
-from src.services.price_updater import get_precio_desde_cache
 from src.services.coingecko import CoinGeckoAPI
 from src.services.coinmarketcap import CoinMarketCapAPI
 from src.services.crypto_mapper import crypto_mapper
 from src.config import logger
 from src.utils.filters import MentionedBotFilter, TopicFilter
+from src.utils.send_limiter import AGRUPABLE
 
 
 async def handle_consulta_token(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        query = update.message.text.lower()
+        # Sin pasar a minúsculas: un símbolo escrito en mayúsculas ("ONE") cuenta como mención
+        query = update.message.text
         posibles_monedas = crypto_mapper.extraer_tokens_mencionados(query)
 
         if not posibles_monedas:
-            await update.message.reply_text("❌ No identifiqué una criptomoneda en tu mensaje.")
+            await update.message.reply_text("❌ No identifiqué una criptomoneda en tu mensaje.", rate_limit_args=AGRUPABLE)
             return
 
-        token = posibles_monedas[0]
-        cripto_id = crypto_mapper.find_coin(token)
+        cripto_id = posibles_monedas[0]
+        token = crypto_mapper.get_coin_info(cripto_id)[1]
 
-        datos = get_precio_desde_cache(cripto_id) if cripto_id else None
-        if not datos and cripto_id:
-            datos = CoinGeckoAPI.obtener_precio(cripto_id)
+        # Ambos clientes leen a través de la caché única de precios
+        datos = None
+        if cripto_id:
+            try:
+                datos = await CoinGeckoAPI.obtener_precio(cripto_id)
+            except ValueError as e:
+                logger.warning(f"CoinGecko sin datos para {cripto_id}: {e}")
 
         if not datos:
-            datos = CoinMarketCapAPI.obtener_precio(token)
+            datos = await CoinMarketCapAPI.obtener_precio(token)
 
         if datos:
             nombre = datos.get('nombre', token.capitalize())
@@ -39,16 +44,16 @@ async def handle_consulta_token(update: Update, context: ContextTypes.DEFAULT_TY
                 f"💵 Precio: ${precio:.4f}\n"
                 f"{tendencia} Cambio 24h: {cambio:.2f}%"
             )
-            await update.message.reply_text(texto, parse_mode="Markdown")
+            await update.message.reply_text(texto, parse_mode="Markdown", rate_limit_args=AGRUPABLE)
         else:
-            await update.message.reply_text("⚠️ No pude obtener el precio actual.")
+            await update.message.reply_text("⚠️ No pude obtener el precio actual.", rate_limit_args=AGRUPABLE)
     except Exception as e:
         logger.exception("Error procesando consulta token")
-        await update.message.reply_text("⚠️ Ocurrió un error al procesar tu consulta.")
+        await update.message.reply_text("⚠️ Ocurrió un error al procesar tu consulta.", rate_limit_args=AGRUPABLE)
 
 
 def setup_token_query_handler(application):
     application.add_handler(MessageHandler(
-        filters.TEXT & ~filters.COMMAND & MentionedBotFilter() & TopicFilter(),
+        TopicFilter() & filters.TEXT & ~filters.COMMAND & MentionedBotFilter(),
         handle_consulta_token
     ))
@@ -1,92 +1,75 @@
-import requests
-import time
-from datetime import datetime, timedelta
+import httpx
+from typing import List
 from src.config import APIConfig, logger
 from src.services.crypto_mapper import crypto_mapper
-from src.services.price_updater import get_precio_desde_cache
+from src.services.http_client import coingecko_limiter, get_http_client
+from src.services.price_cache import construir_datos_precio, precio_cache
+from src.services.price_updater import registrar_demanda
+from src.utils.batcher import MicroBatcher
 
-class CoinGeckoAPI:
-    _BASE_DELAY = 12  
-    _MAX_DELAY = 60
-    _last_call_time = 0
-    _current_delay = _BASE_DELAY
+class CoinGeckoRateLimitError(ValueError):
+    """CoinGecko siguió respondiendo 429 tras el reintento"""
 
-    _PRICE_CACHE = {}
-    _PRICE_CACHE_TTL = timedelta(minutes=5)
+class CoinGeckoAPI:
+    # El mismo bucket que usa el actualizador en segundo plano
+    _rate_limiter = coingecko_limiter
+    # Los ids pedidos en la misma ventana viajan juntos en un solo /simple/price
+    _batcher = MicroBatcher(
+        lambda ids: CoinGeckoAPI._consultar_upstream(ids),
+        ventana=APIConfig.COINGECKO_BATCH_WINDOW,
+        max_lote=APIConfig.COINGECKO_BATCH_MAX
+    )
 
     @classmethod
-    def _enforce_rate_limit(cls):
-        elapsed = time.time() - cls._last_call_time
-        if elapsed < cls._current_delay:
-            time.sleep(cls._current_delay - elapsed)
-        cls._last_call_time = time.time()
+    async def _fetch_price(cls, cripto_ids: List[str]) -> dict:
+        await cls._rate_limiter.acquire()
+        response = await get_http_client().get(
+            f"{APIConfig.COINGECKO_URL}/simple/price",
+            params={"ids": ",".join(cripto_ids), "vs_currencies": "usd", "include_24hr_change": "true"},
+            timeout=APIConfig.COINGECKO_TIMEOUT
+        )
+        response.raise_for_status()
+        return response.json()
 
     @classmethod
-    def obtener_precio(cls, consulta: str) -> dict:
-        # ✅ Primero intentamos usar el caché compartido de price_updater
-        datos = get_precio_desde_cache(consulta)
-        if datos:
-            return datos
-
-        cache_key = consulta.lower()
-
-        # Luego el caché privado de esta clase
-        if cache_key in cls._PRICE_CACHE:
-            data, timestamp = cls._PRICE_CACHE[cache_key]
-            if datetime.now() - timestamp < cls._PRICE_CACHE_TTL:
-                return data
-
-        cripto_id = crypto_mapper.find_coin(consulta)
-        if not cripto_id:
-            raise ValueError(f"No se pudo reconocer la cripto '{consulta}'")
-
-        def fetch_price():
-            cls._enforce_rate_limit()
-            price_url = (
-                f"{APIConfig.COINGECKO_URL}/simple/price?"
-                f"ids={cripto_id}&vs_currencies=usd&include_24hr_change=true"
-            )
-            response = requests.get(
-                price_url,
-                timeout=APIConfig.COINGECKO_TIMEOUT,
-                headers=APIConfig.REQUEST_HEADERS
-            )
-            response.raise_for_status()
-            return response.json()
-
+    async def _consultar_upstream(cls, cripto_ids: List[str]) -> dict:
+        """Una consulta a /simple/price para todo el lote, con un reintento si hay 429"""
         try:
-            price_data = fetch_price()
-        except requests.exceptions.HTTPError as e:
+            price_data = await cls._fetch_price(cripto_ids)
+        except httpx.HTTPStatusError as e:
             if e.response.status_code == 429:
-                cls._current_delay = min(cls._MAX_DELAY, cls._current_delay * 2)
-                logger.warning(f"Rate limit alcanzado. Delay aumentado a {cls._current_delay}s")
-                time.sleep(cls._current_delay)
+                # El limitador espaciará el reintento (y los siguientes) sin bloquear el loop
+                cls._rate_limiter.penalizar()
+                logger.warning(f"Rate limit alcanzado. Delay aumentado a {1 / cls._rate_limiter.rate:.0f}s")
                 try:
-                    price_data = fetch_price()
-                except Exception as retry_error:
-                    if cache_key in cls._PRICE_CACHE:
-                        logger.warning("Usando precio en caché tras fallo 429")
-                        return cls._PRICE_CACHE[cache_key][0]
-                    raise ValueError("CoinGecko está limitando consultas. Intenta más tarde.")
+                    price_data = await cls._fetch_price(cripto_ids)
+                except Exception:
+                    raise CoinGeckoRateLimitError("CoinGecko está limitando consultas. Intenta más tarde.")
             else:
                 raise ValueError(f"Error de API: {str(e)}")
         except Exception as e:
             logger.error(f"Error inesperado: {str(e)}")
             raise ValueError("No se pudo obtener el precio actual.")
 
-        if cripto_id not in price_data:
-            raise ValueError("CoinGecko no devolvió datos para esta cripto.")
+        cls._rate_limiter.recuperar()
+        return price_data
 
-        resultado = {
-            "nombre": cripto_id.replace("-", " ").title(),
-            "simbolo": consulta.upper(),
-            "precio": float(price_data[cripto_id]["usd"]),
-            "cambio_24h": float(price_data[cripto_id].get("usd_24h_change", 0)),
-            "ultima_actualizacion": datetime.now().strftime("%d/%m/%Y %H:%M")
-        }
+    @classmethod
+    async def _consultar_precio(cls, cripto_id: str) -> dict:
+        precio = await cls._batcher.submit(cripto_id)
+        if not precio:
+            raise ValueError("CoinGecko no devolvió datos para esta cripto.")
+        return construir_datos_precio(cripto_id, precio)
 
-        cls._PRICE_CACHE[cache_key] = (resultado, datetime.now())
-        cls._current_delay = max(cls._BASE_DELAY, cls._current_delay * 0.9)
+    @classmethod
+    async def obtener_precio(cls, consulta: str) -> dict:
+        cripto_id = crypto_mapper.find_coin(consulta)
+        if not cripto_id:
+            raise ValueError(f"No se pudo reconocer la cripto '{consulta}'")
 
-        return resultado
+        registrar_demanda(cripto_id)
 
+        # Lectura a través de la caché única: un precio algo viejo se sirve al
+        # instante mientras se refresca en segundo plano, y las consultas
+        # concurrentes del mismo id comparten una sola petición en lote
+        return await precio_cache.get_or_fetch(cripto_id, lambda: cls._consultar_precio(cripto_id))
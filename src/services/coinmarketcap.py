@@ -1,16 +1,31 @@
-import requests
+import httpx
 import os
+from src.config import APIConfig
+from src.services.http_client import get_http_client
+from src.services.price_cache import clave_cmc, precio_cache
+from src.utils.rate_limiter import AsyncTokenBucket
 
 class CoinMarketCapAPI:
     BASE_URL = "https://pro-api.coinmarketcap.com/v1/cryptocurrency/quotes/latest"
     API_KEY = os.getenv("COINMARKETCAP_API_KEY")
+    # Plan básico: 30 llamadas/minuto
+    _rate_limiter = AsyncTokenBucket(rate=0.5, capacity=5)
 
     @staticmethod
-    def obtener_precio(nombre_token: str) -> dict | None:
+    async def obtener_precio(nombre_token: str) -> dict | None:
         """
         Consulta el precio y variación de un token desde CoinMarketCap.
         Devuelve un diccionario con: nombre, símbolo, precio y cambio 24h.
+        Lee a través de la caché única de precios, que además hace que las
+        consultas concurrentes del mismo símbolo compartan una sola petición.
         """
+        return await precio_cache.get_or_fetch(
+            clave_cmc(nombre_token),
+            lambda: CoinMarketCapAPI._consultar(nombre_token)
+        )
+
+    @staticmethod
+    async def _consultar(nombre_token: str) -> dict | None:
         if not CoinMarketCapAPI.API_KEY:
             print("❌ No se encontró la API KEY de CoinMarketCap.")
             return None
@@ -21,12 +36,18 @@ class CoinMarketCapAPI:
         }
 
         params = {
-            "symbol": nombre_token.upper(), 
+            "symbol": nombre_token.upper(),
             "convert": "USD"
         }
 
         try:
-            response = requests.get(CoinMarketCapAPI.BASE_URL, headers=headers, params=params, timeout=10)
+            await CoinMarketCapAPI._rate_limiter.acquire()
+            response = await get_http_client().get(
+                CoinMarketCapAPI.BASE_URL,
+                headers=headers,
+                params=params,
+                timeout=APIConfig.COINMARKETCAP_TIMEOUT
+            )
             response.raise_for_status()
             data = response.json()
 
@@ -41,7 +62,7 @@ class CoinMarketCapAPI:
                     "cambio_24h": round(quote["percent_change_24h"], 2)
                 }
 
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             print(f"❌ Error al consultar CoinMarketCap: {e}")
         except Exception as e:
             print(f"❌ Error inesperado: {e}")
@@ -1,15 +1,110 @@
+import asyncio
+import gzip
+import os
+import pickle
+import re
 from datetime import datetime, timedelta
-import requests
-from typing import Dict, Optional
-from difflib import get_close_matches
-from src.config import logger
+from typing import Dict, Iterable, List, Optional, Tuple
+from src.config import APIConfig, DATA_DIR, logger
+from src.services.http_client import coingecko_limiter, get_http_client
+from src.utils.classifier import CryptoIntentClassifier
+from src.utils.fuzzy_index import TrigramIndex
+from src.utils.keyword_matcher import KeywordMatcher, tokenizar
+
+# Palabras corrientes que también son símbolos o nombres de alguna moneda:
+# solo cuentan como mención si se escriben en mayúsculas ("ONE", "HOY")
+PALABRAS_COMUNES = frozenset("""
+a al algo ahora asi como con cual cuando de del dia donde el ella en era es esa ese eso esta este
+esto fue ha hay hoy la las le lo los mas me mi mucho muy no nos o para pero poco por porque que se si
+sin sobre solo su sus te tiene todo tu un una uno unos y ya yo bien mal nuevo precio valor vale cuanto
+moneda monedas token tokens cripto criptos coin coins crypto dinero mercado compra venta subir bajar
+the and or of to in on for is it at by be are was as an this that with from you your my we our all
+any can do get go has have how if just like more new not now one out so up what when who why will
+buy sell price hot real gold moon pump safe bot bots hola gracias favor ok usd
+""".split())
+
+_MENCION_USUARIO = re.compile(r"@\w+")
+
+def _termino_valido(termino: str) -> bool:
+    return len(termino) >= 2 and not termino.isdigit()
+
+class CoinIndex:
+    """Índices de búsqueda construidos una sola vez a partir de /coins/list"""
+    def __init__(self, coins: List[Dict], aliases: Optional[Dict[str, str]] = None,
+                 ranking: Optional[Dict[str, int]] = None):
+        ranking = ranking or {}
+        # Ante símbolos o nombres repetidos gana la moneda con mayor capitalización
+        coins = sorted(coins, key=lambda c: ranking.get(c['id'], float('inf')))
+        self.by_id: Dict[str, str] = {}
+        self.by_symbol: Dict[str, str] = {}
+        self.by_name: Dict[str, str] = {}
+        self.info: Dict[str, Tuple[str, str]] = {}
+        for coin in coins:
+            coin_id = coin['id']
+            self.info.setdefault(coin_id, (coin.get('name') or coin_id, coin.get('symbol') or ''))
+            self.by_id.setdefault(coin_id.lower(), coin_id)
+            if coin.get('symbol'):
+                self.by_symbol.setdefault(coin['symbol'].lower(), coin_id)
+            if coin.get('name'):
+                self.by_name.setdefault(coin['name'].lower(), coin_id)
+
+        # Los términos difusos siempre apuntan a un id canónico, nunca a un símbolo
+        self.fuzzy = TrigramIndex(self._fuzzy_terms(aliases or {}))
+        self.menciones = self._construir_menciones(aliases or {})
+
+    def _construir_menciones(self, aliases: Dict[str, str]) -> KeywordMatcher:
+        """Autómata sobre palabras con cada id, símbolo, nombre y alias -> un único id"""
+        destino: Dict[str, str] = {}
+        for tabla in (self.by_symbol, self.by_name, self.by_id, aliases):
+            # Orden de menor a mayor prioridad: los alias mandan, luego id, nombre y símbolo
+            for termino, coin_id in tabla.items():
+                clave = " ".join(tokenizar(termino))
+                if _termino_valido(clave):
+                    destino[clave] = coin_id
+        por_id: Dict[str, List[str]] = {}
+        for termino, coin_id in destino.items():
+            por_id.setdefault(coin_id, []).append(termino)
+        return KeywordMatcher(por_id)
+
+    def extraer_menciones(self, texto: str) -> List[str]:
+        """Ids mencionados en el texto, en orden de aparición y sin repetir"""
+        originales = tokenizar(texto, conservar_mayusculas=True)
+        encontrados: List[str] = []
+        for inicio, coin_id, termino in self.menciones.coincidencias_maximas(texto):
+            if termino in PALABRAS_COMUNES and not originales[inicio].isupper():
+                continue
+            if coin_id not in encontrados:
+                encontrados.append(coin_id)
+        return encontrados
+
+    def _fuzzy_terms(self, aliases: Dict[str, str]) -> Iterable:
+        yield from aliases.items()
+        yield from self.by_id.items()
+        yield from self.by_symbol.items()
+        yield from self.by_name.items()
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def resolve(self, term: str) -> Optional[str]:
+        """Búsqueda exacta O(1) por id, símbolo o nombre"""
+        return self.by_id.get(term) or self.by_symbol.get(term) or self.by_name.get(term)
 
 class CryptoMapper:
     """Clase para mapeo dinámico de criptomonedas"""
-    def __init__(self):
+    SNAPSHOT_VERSION = 3
+
+    def __init__(self, snapshot_path=DATA_DIR / "coins_snapshot.pkl.gz"):
         self._mapping = self._load_base_mapping()
         self._coingecko_list = None
+        self._index = CoinIndex([], self._mapping)
+        self._ranking: Dict[str, int] = {}
         self._last_update = None
+        self._etag = None
+        self._last_modified = None
+        self._snapshot_path = snapshot_path
+        self._snapshot_loaded = False
+        self._refresh_task: Optional[asyncio.Task] = None
     
     def _load_base_mapping(self) -> Dict[str, str]:
         """Mapeo base con las principales criptomonedas"""
@@ -27,22 +122,139 @@ class CryptoMapper:
             'bitcoin cash': 'bitcoin-cash', 'bch': 'bitcoin-cash',
         }
     
+    def load_snapshot(self) -> bool:
+        """Carga la lista e índices guardados en disco (arranque en milisegundos)"""
+        self._snapshot_loaded = True
+        try:
+            with gzip.open(self._snapshot_path, "rb") as f:
+                snapshot = pickle.load(f)
+            if snapshot.get("version") != self.SNAPSHOT_VERSION:
+                return False
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning(f"Snapshot de monedas inválido, se ignora: {e}")
+            return False
+
+        self._swap(snapshot["coins"], snapshot["index"], snapshot["etag"], snapshot["last_modified"])
+        self._ranking = snapshot["ranking"]
+        self._last_update = snapshot["fetched_at"]
+        logger.info(f"Snapshot de monedas cargado ({len(self._index)} monedas)")
+        return True
+
+    def _save_snapshot(self, coins, index, etag, last_modified, fetched_at):
+        snapshot = {
+            "version": self.SNAPSHOT_VERSION,
+            "coins": coins,
+            "index": index,
+            "ranking": self._ranking,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": fetched_at,
+        }
+        self._snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._snapshot_path.with_suffix(".tmp")
+        with gzip.open(tmp_path, "wb", compresslevel=5) as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._snapshot_path)
+
+    def _swap(self, coins, index, etag, last_modified):
+        # Una sola asignación por atributo y sin awaits de por medio: las
+        # búsquedas concurrentes ven el índice viejo o el nuevo, nunca uno a medias
+        self._coingecko_list = coins
+        self._index = index
+        self._etag = etag
+        self._last_modified = last_modified
+
+    async def _fetch_ranking(self) -> Optional[Dict[str, int]]:
+        """Posición por capitalización de las monedas principales, para desempatar símbolos"""
+        ranking: Dict[str, int] = {}
+        try:
+            for pagina in range(1, APIConfig.COINGECKO_RANKING_TOP // 250 + 1):
+                # Cada página gasta del mismo presupuesto que las consultas de precio
+                await coingecko_limiter.acquire()
+                response = await get_http_client().get(
+                    f"{APIConfig.COINGECKO_URL}/coins/markets",
+                    params={"vs_currency": "usd", "order": "market_cap_desc", "per_page": 250, "page": pagina}
+                )
+                if response.status_code == 429:
+                    coingecko_limiter.penalizar()
+                response.raise_for_status()
+                coingecko_limiter.recuperar()
+                for coin in response.json():
+                    if coin.get("market_cap_rank"):
+                        ranking[coin["id"]] = coin["market_cap_rank"]
+        except Exception as e:
+            logger.warning(f"No se pudo obtener el ranking por capitalización: {e}")
+            return None
+        return ranking
+
     async def fetch_coingecko_list(self):
-        """Actualiza la lista desde CoinGecko"""
+        """Actualiza la lista desde CoinGecko con petición condicional"""
+        headers = {}
+        if self._etag:
+            headers["If-None-Match"] = self._etag
+        if self._last_modified:
+            headers["If-Modified-Since"] = self._last_modified
+
         try:
-            response = requests.get('https://api.coingecko.com/api/v3/coins/list')
+            response, ranking = await asyncio.gather(
+                get_http_client().get(
+                    f"{APIConfig.COINGECKO_URL}/coins/list",
+                    headers=headers,
+                    timeout=APIConfig.COINGECKO_LIST_TIMEOUT
+                ),
+                self._fetch_ranking()
+            )
+            fetched_at = datetime.now()
+            ranking_nuevo = ranking is not None and ranking != self._ranking
+            if ranking_nuevo:
+                self._ranking = ranking
+
+            if response.status_code == 304:
+                self._last_update = fetched_at
+                if self._coingecko_list is not None:
+                    index = self._index
+                    if ranking_nuevo:
+                        index = await asyncio.to_thread(CoinIndex, self._coingecko_list, self._mapping, self._ranking)
+                        self._index = index
+                    await asyncio.to_thread(
+                        self._save_snapshot, self._coingecko_list, index,
+                        self._etag, self._last_modified, fetched_at
+                    )
+                logger.info("Lista de CoinGecko sin cambios (304)")
+                return
+
             response.raise_for_status()
-            self._coingecko_list = response.json()
-            self._last_update = datetime.now()
+            coins = response.json()
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+
+            # Construir el índice fuera del event loop y publicarlo de golpe
+            index = await asyncio.to_thread(CoinIndex, coins, self._mapping, self._ranking)
+            self._swap(coins, index, etag, last_modified)
+            self._last_update = fetched_at
+            await asyncio.to_thread(self._save_snapshot, coins, index, etag, last_modified, fetched_at)
+            logger.info(f"Lista de CoinGecko actualizada ({len(index)} monedas)")
         except Exception as e:
             logger.error(f"Error al obtener lista de CoinGecko: {e}")
-    
+
+    def _is_stale(self) -> bool:
+        return (not self._last_update or
+                (datetime.now() - self._last_update) > timedelta(hours=APIConfig.COINGECKO_LIST_TTL_HOURS))
+
     async def maybe_refresh_list(self):
-        """Actualiza la lista si es necesario"""
-        if (not self._last_update or 
-            (datetime.now() - self._last_update) > timedelta(hours=24)):
-            await self.fetch_coingecko_list()
-    
+        """Actualiza la lista si es necesario, sin hacer esperar a quien consulta"""
+        if not self._snapshot_loaded:
+            self.load_snapshot()
+        if self._is_stale() and (self._refresh_task is None or self._refresh_task.done()):
+            self._refresh_task = asyncio.create_task(self.fetch_coingecko_list())
+
+    def get_coin_info(self, coin_id: str) -> Tuple[str, str]:
+        """Nombre y símbolo de un id canónico (con valores razonables si no está en la lista)"""
+        nombre, simbolo = self._index.info.get(coin_id, (None, None))
+        return nombre or coin_id.replace("-", " ").title(), (simbolo or coin_id[:4]).upper()
+
     def find_coin(self, user_input: str) -> Optional[str]:
         """Busca la criptomoneda en todas las variantes"""
         user_input = user_input.lower().strip()
@@ -51,22 +263,33 @@ class CryptoMapper:
         if user_input in self._mapping:
             return self._mapping[user_input]
         
-        # 2. Buscar en lista de CoinGecko
-        if self._coingecko_list:
-            for coin in self._coingecko_list:
-                if (user_input == coin['id'].lower() or 
-                    user_input == coin['symbol'].lower()):
-                    return coin['id']
-        
+        # 2. Buscar en los índices exactos (id, símbolo, nombre)
+        index = self._index
+        coin_id = index.resolve(user_input)
+        if coin_id:
+            return coin_id
+
         # 3. Búsqueda aproximada
-        if self._coingecko_list:
-            all_terms = [c['id'].lower() for c in self._coingecko_list] + \
-                       [c['symbol'].lower() for c in self._coingecko_list]
-            matches = get_close_matches(user_input, all_terms, n=1, cutoff=0.6)
-            if matches:
-                return matches[0]
-        
-        return None
+        return index.fuzzy.buscar(user_input, cutoff=0.6)
+
+    def extraer_tokens_mencionados(self, texto: str) -> List[str]:
+        """
+        Todas las monedas mencionadas en un texto libre (ids canónicos, en orden
+        de aparición), en una sola pasada sobre el diccionario completo
+        """
+        # Las menciones a usuarios (@SoonBot) no son monedas
+        return self._index.extraer_menciones(_MENCION_USUARIO.sub(" ", texto))
+
+    def monedas_consultadas(self, texto: str) -> List[str]:
+        """
+        Monedas cuyo precio se pide: hace falta intención de precio y al menos una
+        mención. Es el criterio del handler para responder desde la caché y el
+        del control de admisión para el carril barato; si no, el mensaje va a la IA.
+        """
+        if "precio" not in CryptoIntentClassifier.intenciones(texto):
+            return []
+        # Sobre el texto original: los símbolos escritos en mayúsculas cuentan como mención
+        return self.extraer_tokens_mencionados(texto)
 
 # Instancia global del mapeador
 crypto_mapper = CryptoMapper()
\ No newline at end of file
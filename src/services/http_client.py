@@ -0,0 +1,33 @@
+import httpx
+from typing import Optional
+from src.config import APIConfig
+from src.utils.rate_limiter import AsyncTokenBucket
+
+_client: Optional[httpx.AsyncClient] = None
+
+# Presupuesto único de CoinGecko: lo comparten el actualizador, las consultas bajo
+# demanda (CoinGeckoAPI) y el ranking del mapper, así un 429 visto por uno frena a todos
+coingecko_limiter = AsyncTokenBucket(rate=1 / 12, min_rate=1 / 60)
+
+def get_http_client() -> httpx.AsyncClient:
+    """Devuelve la sesión HTTP compartida (pool keep-alive) creándola si hace falta"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            headers=APIConfig.REQUEST_HEADERS,
+            timeout=httpx.Timeout(APIConfig.HTTP_TIMEOUT, connect=APIConfig.HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=APIConfig.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=APIConfig.HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=30
+            ),
+            follow_redirects=True
+        )
+    return _client
+
+async def cerrar_http_client():
+    """Cierra la sesión compartida (llamar al apagar la aplicación)"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
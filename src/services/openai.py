@@ -1,21 +1,182 @@
+import asyncio
+import random
+import time
 import openai
-from typing import Optional, Dict
-from src.config import OPENAI_API_KEY, logger
+from typing import AsyncIterator, Callable, Optional, Dict
+from src.config import OPENAI_API_KEY, OpenAIConfig, logger
 from src.utils.personality import Personalidad
+from src.utils.tokens import contar_tokens
+
+_client: Optional[openai.AsyncOpenAI] = None
+_semaforo = asyncio.Semaphore(OpenAIConfig.MAX_CONCURRENCIA)
+
+_ERRORES_REINTENTABLES = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+)
+
+class MetricasOpenAI:
+    """Tiempos de espera en cola y latencia del modelo, medidos por separado"""
+    def __init__(self):
+        self.llamadas = 0
+        self.errores = 0
+        self.reintentos = 0
+        self.en_cola = 0
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+        self.latencia_total = 0.0
+        self.latencia_max = 0.0
+        self.streams = 0
+        self.primer_token_total = 0.0
+        self.prompts = 0
+        self.tokens_prompt_total = 0
+        self.tokens_prompt_max = 0
+        self.contexto_descartado = 0
+
+    def registrar_primer_token(self, segundos: float):
+        self.streams += 1
+        self.primer_token_total += segundos
+
+    def registrar_prompt(self, tokens: int, descartadas: int = 0):
+        self.prompts += 1
+        self.tokens_prompt_total += tokens
+        self.tokens_prompt_max = max(self.tokens_prompt_max, tokens)
+        self.contexto_descartado += descartadas
+
+    def registrar(self, espera: float, latencia: float):
+        self.llamadas += 1
+        self.espera_total += espera
+        self.espera_max = max(self.espera_max, espera)
+        self.latencia_total += latencia
+        self.latencia_max = max(self.latencia_max, latencia)
+
+    def resumen(self) -> Dict:
+        n = self.llamadas or 1
+        return {
+            "llamadas": self.llamadas,
+            "errores": self.errores,
+            "reintentos": self.reintentos,
+            "en_cola": self.en_cola,
+            "espera_media_s": round(self.espera_total / n, 3),
+            "espera_max_s": round(self.espera_max, 3),
+            "latencia_media_s": round(self.latencia_total / n, 3),
+            "latencia_max_s": round(self.latencia_max, 3),
+            "primer_token_medio_s": round(self.primer_token_total / (self.streams or 1), 3),
+            "tokens_prompt_medio": round(self.tokens_prompt_total / (self.prompts or 1)),
+            "tokens_prompt_max": self.tokens_prompt_max,
+            "contexto_descartado": self.contexto_descartado,
+        }
+
+metricas = MetricasOpenAI()
+
+def _get_client() -> openai.AsyncOpenAI:
+    """Cliente único de larga vida: reutiliza el pool de conexiones y TLS"""
+    global _client
+    if _client is None:
+        _client = openai.AsyncOpenAI(
+            api_key=OPENAI_API_KEY,
+            timeout=OpenAIConfig.TIMEOUT,
+            max_retries=0  # los reintentos los gestionamos nosotros, dentro del semáforo
+        )
+    return _client
+
+async def cerrar_cliente_openai():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+def _espera_reintento(error: Exception, intento: int) -> float:
+    espera = OpenAIConfig.BACKOFF_BASE * 2 ** intento
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            espera = max(espera, float(retry_after))
+        except ValueError:
+            pass
+    return espera + random.uniform(0, OpenAIConfig.BACKOFF_BASE)
+
+async def _crear_con_reintentos(**kwargs):
+    """Llama a la API reintentando ante 429/5xx/timeouts (debe ejecutarse con el semáforo tomado)"""
+    for intento in range(OpenAIConfig.MAX_REINTENTOS + 1):
+        try:
+            return await _get_client().chat.completions.create(
+                model=OpenAIConfig.MODEL,
+                temperature=0.7,  # Balance entre creatividad y precisión
+                top_p=0.9,
+                **kwargs
+            )
+        except _ERRORES_REINTENTABLES as e:
+            if intento == OpenAIConfig.MAX_REINTENTOS:
+                raise
+            metricas.reintentos += 1
+            pausa = _espera_reintento(e, intento)
+            logger.warning(f"OpenAI {type(e).__name__}, reintento en {pausa:.1f}s")
+            await asyncio.sleep(pausa)
+
+class _TurnoOpenAI:
+    """Toma el semáforo global y mide cuánto se esperó en cola"""
+    async def __aenter__(self):
+        inicio = time.monotonic()
+        metricas.en_cola += 1
+        try:
+            await _semaforo.acquire()
+        finally:
+            # También si se cancela (p. ej. por el deadline) mientras esperaba turno
+            metricas.en_cola -= 1
+        self.espera = time.monotonic() - inicio
+        return self
+
+    async def __aexit__(self, *exc):
+        _semaforo.release()
+
+async def _completar(messages: list, max_tokens: int) -> str:
+    """Una completion limitada por el semáforo global, con reintentos ante 429/5xx"""
+    async with _TurnoOpenAI() as turno:
+        inicio_modelo = time.monotonic()
+        response = await _crear_con_reintentos(messages=messages, max_tokens=max_tokens)
+        latencia = time.monotonic() - inicio_modelo
+        metricas.registrar(turno.espera, latencia)
+        logger.debug(f"OpenAI: cola {turno.espera:.2f}s, modelo {latencia:.2f}s")
+        return response.choices[0].message.content
+
+def _armar_mensajes(mensaje: str, nombre_usuario: str, contexto: Optional[Dict]) -> list:
+    instrucciones = Personalidad.construir_instrucciones(contexto, mensaje)
+    pregunta = f"{nombre_usuario} pregunta: {mensaje}"
+    tokens = instrucciones.tokens + contar_tokens(pregunta)
+    metricas.registrar_prompt(tokens, instrucciones.descartadas)
+    logger.debug(
+        f"Prompt: {tokens} tokens ({instrucciones.tokens_contexto} de contexto, "
+        f"{instrucciones.incluidas} entradas, {instrucciones.descartadas} descartadas)"
+    )
+    return [{
+        "role": "system",
+        "content": instrucciones.texto
+    }, {
+        "role": "user",
+        "content": pregunta
+    }]
 
 async def generar_respuesta_ia(
     mensaje: str,
     nombre_usuario: str,
-    contexto: Optional[Dict] = None
+    contexto: Optional[Dict] = None,
+    max_tokens: int = 200,
+    deadline: float = OpenAIConfig.DEADLINE
 ) -> str:
     """
     Genera respuestas usando OpenAI con el estilo de SoonBot.
-    
+
     Args:
         mensaje: Texto del usuario
         nombre_usuario: Nombre para personalización
         contexto: Diccionario con datos relevantes (ej: {'bitcoin': {'precio': 50000}})
-    
+        max_tokens: Límite de tokens de la respuesta
+        deadline: Tiempo máximo total en segundos (cola + reintentos)
+
     Returns:
         str: Respuesta generada con personalidad
     """
@@ -24,29 +185,86 @@ async def generar_respuesta_ia(
         return Personalidad.generar_respuesta_error(nombre_usuario)
 
     try:
-        client = openai.AsyncOpenAI(api_key=OPENAI_API_KEY)
-        
-        messages = [{
-            "role": "system",
-            "content": Personalidad.get_instructions(contexto)
-        }, {
-            "role": "user",
-            "content": f"{nombre_usuario} pregunta: {mensaje}"
-        }]
-
-        response = await client.chat.completions.create(
-            model="gpt-4-turbo",
-            messages=messages,
-            temperature=0.7,  # Balance entre creatividad y precisión
-            max_tokens=200,
-            top_p=0.9
-        )
-        
-        return response.choices[0].message.content
-        
+        messages = _armar_mensajes(mensaje, nombre_usuario, contexto)
+        return await asyncio.wait_for(_completar(messages, max_tokens), timeout=deadline)
+
+    except asyncio.TimeoutError:
+        metricas.errores += 1
+        logger.error(f"OpenAI superó el deadline de {deadline}s")
+        return "⏳ La IA está tardando demasiado. Por favor, intenta más tarde."
     except openai.APIConnectionError as e:
+        metricas.errores += 1
         logger.error(f"Error de conexión: {e}")
         return "🔌 Problema de conexión. Por favor, intenta más tarde."
     except Exception as e:
+        metricas.errores += 1
         logger.error(f"Error en OpenAI: {e}")
-        return Personalidad.generar_respuesta_error(nombre_usuario)
\ No newline at end of file
+        return Personalidad.generar_respuesta_error(nombre_usuario)
+
+async def completar_prompt(prompt: str, max_tokens: int, deadline: float = OpenAIConfig.DEADLINE) -> str:
+    """
+    Completion de un prompt suelto, sin la personalidad del bot. A diferencia
+    de `generar_respuesta_ia`, los errores se propagan al llamador.
+    """
+    if not OPENAI_API_KEY:
+        raise RuntimeError("OPENAI_API_KEY no configurada")
+    try:
+        messages = [{"role": "user", "content": prompt}]
+        metricas.registrar_prompt(contar_tokens(prompt))
+        return await asyncio.wait_for(_completar(messages, max_tokens), timeout=deadline)
+    except Exception:
+        metricas.errores += 1
+        raise
+
+async def generar_respuesta_ia_stream(
+    mensaje: str,
+    nombre_usuario: str,
+    contexto: Optional[Dict] = None,
+    max_tokens: int = 200,
+    al_completar: Optional[Callable[[str], None]] = None
+) -> AsyncIterator[str]:
+    """
+    Igual que `generar_respuesta_ia`, pero va entregando el texto a medida que
+    llega del modelo. Si algo falla, el error se entrega como último fragmento.
+    `al_completar` recibe el texto completo solo si la respuesta terminó bien.
+    """
+    if not OPENAI_API_KEY:
+        logger.error("OPENAI_API_KEY no configurada")
+        yield Personalidad.generar_respuesta_error(nombre_usuario)
+        return
+
+    messages = _armar_mensajes(mensaje, nombre_usuario, contexto)
+    emitido = False
+    partes = []
+    try:
+        async with _TurnoOpenAI() as turno:
+            inicio_modelo = time.monotonic()
+            stream = await asyncio.wait_for(
+                _crear_con_reintentos(messages=messages, max_tokens=max_tokens, stream=True),
+                timeout=OpenAIConfig.DEADLINE
+            )
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                if not emitido:
+                    metricas.registrar_primer_token(time.monotonic() - inicio_modelo)
+                    emitido = True
+                partes.append(delta)
+                yield delta
+            metricas.registrar(turno.espera, time.monotonic() - inicio_modelo)
+        if al_completar and partes:
+            al_completar("".join(partes))
+    except asyncio.TimeoutError:
+        metricas.errores += 1
+        logger.error("OpenAI superó el deadline en modo streaming")
+        yield "\n\n⏳ La IA está tardando demasiado." if emitido else "⏳ La IA está tardando demasiado. Por favor, intenta más tarde."
+    except openai.APIConnectionError as e:
+        metricas.errores += 1
+        logger.error(f"Error de conexión: {e}")
+        yield "\n\n🔌 Se cortó la conexión." if emitido else "🔌 Problema de conexión. Por favor, intenta más tarde."
+    except Exception as e:
+        metricas.errores += 1
+        logger.error(f"Error en OpenAI (stream): {e}")
+        if not emitido:
+            yield Personalidad.generar_respuesta_error(nombre_usuario)
@@ -0,0 +1,23 @@
+import hashlib
+import math
+from src.config import OpenAIConfig
+from src.utils.cache import LRUCache
+
+# Opiniones de la IA ya generadas: mientras el precio no salga de su cubeta,
+# la misma pregunta sobre el mismo token se responde al instante y sin tokens
+opinion_cache = LRUCache(max_size=OpenAIConfig.OPINION_CACHE_MAX, ttl=OpenAIConfig.OPINION_CACHE_TTL)
+
+def _cubeta_precio(precio: float) -> int:
+    if precio <= 0:
+        return 0
+    return round(math.log(precio) / math.log1p(OpenAIConfig.OPINION_PRICE_STEP))
+
+def clave_opinion(prompt: str, cripto_id: str, datos: dict) -> tuple:
+    """Clave por prompt normalizado, id del token y cubetas de precio y cambio 24h"""
+    prompt_normalizado = " ".join(prompt.lower().split())
+    return (
+        hashlib.sha1(prompt_normalizado.encode("utf-8")).hexdigest(),
+        cripto_id.lower(),
+        _cubeta_precio(float(datos.get("precio") or 0)),
+        round(float(datos.get("cambio_24h") or 0) / OpenAIConfig.OPINION_CHANGE_STEP),
+    )
@@ -0,0 +1,258 @@
+import asyncio
+import json
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from telegram.ext import BasePersistence, PersistenceInput
+from src.config import DATA_DIR, logger
+
+_SIN_CAMBIOS = object()
+
+Clave = Tuple[str, str]
+
+class SQLitePersistence(BasePersistence[Dict, Dict, Dict]):
+    """
+    user_data, chat_data y bot_data de PTB guardados en SQLite (WAL).
+
+    Nada toca el disco durante un update: los datos modificados se serializan
+    en memoria y se vuelcan en una sola transacción por lote desde un hilo
+    (write-behind). Si otro proceso comparte el archivo, sus cambios se leen
+    desde un hilo, como mucho una vez cada `intervalo_sincronizacion` segundos
+    (una vez por update aunque PTB refresque user, chat y bot data), y solo se
+    consultan las filas cuando `PRAGMA data_version` indica commits ajenos.
+    """
+
+    def __init__(self, path: Path = DATA_DIR / "persistencia.db", update_interval: float = 5,
+                 retraso_escritura: float = 0.05, intervalo_sincronizacion: float = 0.25,
+                 store_data: Optional[PersistenceInput] = None):
+        super().__init__(store_data=store_data, update_interval=update_interval)
+        self._path = path
+        self.retraso_escritura = retraso_escritura
+        self.intervalo_sincronizacion = intervalo_sincronizacion
+        self._origen = uuid.uuid4().hex
+        self._lectura: Optional[sqlite3.Connection] = None
+        self._escritura: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        # (tipo, clave) -> pickle, o None para borrar
+        self._pendientes: Dict[Clave, Optional[bytes]] = {}
+        self._en_vuelo: Dict[Clave, Optional[bytes]] = {}
+        # Cambios ajenos ya deserializados (None = borrado), pendientes de aplicar
+        self._remotos: Dict[Clave, Any] = {}
+        self._tarea: Optional[asyncio.Task] = None
+        self._escribiendo: Optional[asyncio.Future] = None
+        self._sincronizando: Optional[asyncio.Future] = None
+        self._ultima_sincronizacion = float("-inf")
+        self.sincronizaciones = 0
+        self._version = None
+        self._seq = 0
+        self.lotes_escritos = 0
+        self.filas_escritas = 0
+
+    def _conectar(self) -> sqlite3.Connection:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        # Transacciones explícitas: BEGIN IMMEDIATE evita choques entre procesos escritores
+        conn = sqlite3.connect(self._path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS datos ("
+            " tipo TEXT NOT NULL, clave TEXT NOT NULL, valor BLOB,"
+            " seq INTEGER NOT NULL, origen TEXT NOT NULL, PRIMARY KEY (tipo, clave))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS datos_seq ON datos (seq)")
+        return conn
+
+    def _conexion_lectura(self) -> sqlite3.Connection:
+        if self._lectura is None:
+            self._lectura = self._conectar()
+            self._version = self._lectura.execute("PRAGMA data_version").fetchone()[0]
+            self._seq = self._lectura.execute("SELECT COALESCE(MAX(seq), 0) FROM datos").fetchone()[0]
+        return self._lectura
+
+    def _cargar(self, tipo: str) -> Dict[str, bytes]:
+        filas = self._conexion_lectura().execute(
+            "SELECT clave, valor FROM datos WHERE tipo = ? AND valor IS NOT NULL", (tipo,)
+        )
+        return dict(filas)
+
+    # --- Escritura diferida ---
+
+    def _marcar(self, tipo: str, clave: str, valor) -> None:
+        # Se serializa ya: el dict de PTB seguirá cambiando mientras espera el volcado
+        clave_completa = (tipo, clave)
+        self._pendientes[clave_completa] = None if valor is None else pickle.dumps(valor, pickle.HIGHEST_PROTOCOL)
+        self._remotos.pop(clave_completa, None)
+        if self._tarea is None or self._tarea.done():
+            self._tarea = asyncio.create_task(self._volcar_tras_retraso())
+
+    async def _volcar_tras_retraso(self) -> None:
+        # PTB actualiza todos los ids modificados de una vez: el retraso los junta en un lote.
+        # Lo que se marque mientras se escribe sale en el lote siguiente.
+        while self._pendientes:
+            await asyncio.sleep(self.retraso_escritura)
+            if not await self._volcar():
+                return
+
+    async def _volcar(self) -> bool:
+        lote, self._pendientes = self._pendientes, {}
+        if not lote:
+            return True
+        self._en_vuelo = lote
+        self._escribiendo = asyncio.ensure_future(asyncio.to_thread(self._escribir, lote))
+        try:
+            # Si cancelan la espera, la transacción sigue hasta el final en su hilo
+            await asyncio.shield(self._escribiendo)
+            self.lotes_escritos += 1
+            self.filas_escritas += len(lote)
+            return True
+        except Exception as e:
+            logger.error(f"❌ Error guardando persistencia ({len(lote)} claves): {e}")
+            # Se reintenta en el próximo volcado, salvo lo que ya tenga un valor más nuevo
+            for clave, valor in lote.items():
+                self._pendientes.setdefault(clave, valor)
+            return False
+        finally:
+            self._en_vuelo = {}
+
+    def _escribir(self, lote: Dict[Clave, Optional[bytes]]) -> None:
+        with self._lock:
+            if self._escritura is None:
+                self._escritura = self._conectar()
+            conn = self._escritura
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM datos").fetchone()[0]
+                # Los borrados quedan como valor NULL para que los demás procesos también los vean
+                conn.executemany(
+                    "INSERT OR REPLACE INTO datos VALUES (?, ?, ?, ?, ?)",
+                    [(tipo, clave, valor, seq + i, self._origen) for i, ((tipo, clave), valor) in enumerate(lote.items(), 1)]
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    # --- Cambios de otros procesos ---
+
+    def _leer_cambios(self) -> List[Tuple[Clave, Any]]:
+        """Cambios de otros procesos desde la última lectura; se ejecuta en un hilo"""
+        conn = self._conexion_lectura()
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._version:
+            return []
+        self._version = version
+        filas = conn.execute(
+            "SELECT tipo, clave, valor, seq, origen FROM datos WHERE seq > ? ORDER BY seq", (self._seq,)
+        ).fetchall()
+        cambios = []
+        for tipo, clave, valor, seq, origen in filas:
+            self._seq = max(self._seq, seq)
+            if origen != self._origen:
+                cambios.append(((tipo, clave), None if valor is None else pickle.loads(valor)))
+        return cambios
+
+    async def _traer_cambios(self) -> None:
+        try:
+            cambios = await asyncio.to_thread(self._leer_cambios)
+        except Exception as e:
+            logger.error(f"❌ Error leyendo cambios de persistencia: {e}")
+            return
+        self.sincronizaciones += 1
+        self._remotos.update(cambios)
+
+    async def _sincronizar(self) -> None:
+        # PTB refresca user, chat y bot data en cada update: la lectura se comparte
+        if self._sincronizando is None or self._sincronizando.done():
+            ahora = time.monotonic()
+            if ahora - self._ultima_sincronizacion < self.intervalo_sincronizacion:
+                return
+            self._ultima_sincronizacion = ahora
+            self._sincronizando = asyncio.ensure_future(self._traer_cambios())
+        await asyncio.shield(self._sincronizando)
+
+    async def _refrescar(self, tipo: str, clave: str, destino: Dict) -> None:
+        await self._sincronizar()
+        clave_completa = (tipo, clave)
+        valor = self._remotos.pop(clave_completa, _SIN_CAMBIOS)
+        if valor is _SIN_CAMBIOS or clave_completa in self._pendientes or clave_completa in self._en_vuelo:
+            return
+        destino.clear()
+        if valor is not None:
+            destino.update(valor)
+
+    # --- Interfaz de BasePersistence ---
+
+    async def get_user_data(self) -> Dict[int, Dict]:
+        return {int(clave): pickle.loads(valor) for clave, valor in self._cargar("user").items()}
+
+    async def get_chat_data(self) -> Dict[int, Dict]:
+        return {int(clave): pickle.loads(valor) for clave, valor in self._cargar("chat").items()}
+
+    async def get_bot_data(self) -> Dict:
+        valor = self._cargar("bot").get("")
+        return pickle.loads(valor) if valor else {}
+
+    async def get_callback_data(self) -> Optional[Tuple]:
+        valor = self._cargar("callback").get("")
+        return pickle.loads(valor) if valor else None
+
+    async def get_conversations(self, name: str) -> Dict[Tuple, object]:
+        return {tuple(json.loads(clave)): pickle.loads(valor) for clave, valor in self._cargar(f"conv:{name}").items()}
+
+    async def update_conversation(self, name: str, key: Tuple, new_state: Optional[object]) -> None:
+        self._marcar(f"conv:{name}", json.dumps(list(key)), new_state)
+
+    async def update_user_data(self, user_id: int, data: Dict) -> None:
+        self._marcar("user", str(user_id), data)
+
+    async def update_chat_data(self, chat_id: int, data: Dict) -> None:
+        self._marcar("chat", str(chat_id), data)
+
+    async def update_bot_data(self, data: Dict) -> None:
+        self._marcar("bot", "", data)
+
+    async def update_callback_data(self, data: Tuple) -> None:
+        self._marcar("callback", "", data)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._marcar("user", str(user_id), None)
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self._marcar("chat", str(chat_id), None)
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict) -> None:
+        await self._refrescar("user", str(user_id), user_data)
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict) -> None:
+        await self._refrescar("chat", str(chat_id), chat_data)
+
+    async def refresh_bot_data(self, bot_data: Dict) -> None:
+        await self._refrescar("bot", "", bot_data)
+
+    async def flush(self) -> None:
+        # El volcado diferido se adelanta: no hace falta esperar al retraso
+        if self._tarea and not self._tarea.done():
+            self._tarea.cancel()
+            await asyncio.gather(self._tarea, return_exceptions=True)
+        if self._escribiendo:
+            await asyncio.gather(self._escribiendo, return_exceptions=True)
+        if self._sincronizando:
+            await asyncio.gather(self._sincronizando, return_exceptions=True)
+        await self._volcar()
+        for conn in (self._lectura, self._escritura):
+            if conn is not None:
+                conn.close()
+        self._lectura = self._escritura = None
+
+    def stats(self) -> Dict:
+        return {
+            "pendientes": len(self._pendientes),
+            "sincronizaciones": self.sincronizaciones,
+            "lotes_escritos": self.lotes_escritos,
+            "filas_escritas": self.filas_escritas,
+            "media_filas_lote": round(self.filas_escritas / (self.lotes_escritos or 1), 1),
+        }
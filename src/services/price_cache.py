@@ -0,0 +1,30 @@
+from datetime import datetime
+from src.config import APIConfig, DATA_DIR
+from src.services.crypto_mapper import crypto_mapper
+from src.services.shared_price_cache import SharedPriceCache
+
+# Caché única de precios para todo el bot: la llenan el actualizador en
+# segundo plano y las consultas bajo demanda, y la leen todos los handlers.
+# Claves: id de CoinGecko (p. ej. "bitcoin") o "cmc:<SÍMBOLO>" para CoinMarketCap.
+# Con varios workers en el host, todos comparten el nivel L2 en SQLite.
+precio_cache = SharedPriceCache(
+    DATA_DIR / "precios.db",
+    max_size=APIConfig.PRICE_CACHE_MAX,
+    ttl=APIConfig.PRICE_CACHE_TTL,
+    stale_ttl=APIConfig.PRICE_CACHE_STALE_TTL,
+    lease_seg=APIConfig.PRICE_CACHE_LEASE
+)
+
+def clave_cmc(symbol: str) -> str:
+    return f"cmc:{symbol.upper()}"
+
+def construir_datos_precio(cripto_id: str, precio: dict) -> dict:
+    """Formato común de una entrada de precio a partir de la respuesta de /simple/price"""
+    nombre, simbolo = crypto_mapper.get_coin_info(cripto_id)
+    return {
+        "nombre": nombre,
+        "simbolo": simbolo,
+        "precio": float(precio["usd"]),
+        "cambio_24h": float(precio.get("usd_24h_change") or 0),
+        "ultima_actualizacion": datetime.now().strftime("%d/%m/%Y %H:%M")
+    }
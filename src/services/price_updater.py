@@ -1,10 +1,14 @@
 # src/services/price_updater.py
 
-import threading
+import random
 import time
-from datetime import datetime
-import requests
-from src.config import APIConfig, logger
+import httpx
+from typing import Dict, Optional
+from src.config import APIConfig, DATA_DIR, logger
+from src.services.http_client import coingecko_limiter, get_http_client
+from src.services.price_cache import construir_datos_precio, precio_cache
+from src.utils.decay_counter import DecayingCounter
+from src.utils.host_lock import HostLock
 
 TOKEN_ALIASES = {
     "btc": "bitcoin",
@@ -31,7 +35,18 @@ TOKEN_ALIASES = {
 
 TOKENS_PRINCIPALES = list(set(TOKEN_ALIASES.values()))
 
-_precio_cache = {}
+# Frecuencia de consultas por id, para pre-calentar lo que la gente pide de verdad
+_demanda = DecayingCounter(vida_media=APIConfig.DEMAND_HALF_LIFE)
+_ultima_consulta = time.monotonic()
+
+# Con varios workers en el host solo el líder consulta CoinGecko; los demás leen
+# lo que publica en la caché compartida y toman el relevo si el líder muere
+lider_actualizador = HostLock(DATA_DIR / "actualizador.lock")
+
+# Estado del job periódico
+_job = None
+_fallos_429 = 0
+_ultimos_precios: Dict[str, float] = {}
 
 def normalizar_token_id(user_input: str) -> str:
     """Devuelve el ID oficial del token según alias."""
@@ -40,42 +55,114 @@ def normalizar_token_id(user_input: str) -> str:
 def get_precio_desde_cache(token_input: str) -> dict:
     """Devuelve el precio en caché si está disponible"""
     token_id = normalizar_token_id(token_input)
-    if token_id and token_id in _precio_cache:
-        return _precio_cache[token_id]
-    return None
-
-def actualizar_precios():
-    """Consulta periódicamente CoinGecko para los tokens principales"""
-    while True:
-        try:
-            ids_str = ",".join(TOKENS_PRINCIPALES)
-            url = f"{APIConfig.COINGECKO_URL}/simple/price?ids={ids_str}&vs_currencies=usd&include_24hr_change=true"
-            response = requests.get(
-                url,
-                timeout=APIConfig.COINGECKO_TIMEOUT,
-                headers=APIConfig.REQUEST_HEADERS
-            )
-            response.raise_for_status()
-            data = response.json()
-            now = datetime.now().strftime("%d/%m/%Y %H:%M")
-
-            for token_id in TOKENS_PRINCIPALES:
-                if token_id in data:
-                    _precio_cache[token_id] = {
-                        "nombre": token_id.replace("-", " ").title(),
-                        "simbolo": token_id[:4].upper(),
-                        "precio": float(data[token_id]["usd"]),
-                        "cambio_24h": float(data[token_id].get("usd_24h_change", 0)),
-                        "ultima_actualizacion": now
-                    }
-            logger.info("✅ Precios actualizados desde CoinGecko")
-
-        except Exception as e:
+    return precio_cache.get(token_id) if token_id else None
+
+def registrar_demanda(cripto_id: str):
+    """Anota una consulta de precio para el conjunto caliente del actualizador"""
+    global _ultima_consulta
+    _demanda.registrar(cripto_id)
+    _ultima_consulta = time.monotonic()
+
+def tokens_a_actualizar() -> list:
+    """Tokens principales más los ids con más demanda reciente"""
+    ids = list(TOKENS_PRINCIPALES)
+    vistos = set(ids)
+    for cripto_id in _demanda.top(APIConfig.HOT_SET_SIZE):
+        if cripto_id not in vistos:
+            ids.append(cripto_id)
+            vistos.add(cripto_id)
+    return ids
+
+async def actualizar_precios() -> float:
+    """Actualiza en un solo /simple/price los tokens principales y el conjunto caliente.
+
+    Devuelve la mayor variación (en %) observada desde la ronda anterior.
+    Solo consulta en el proceso líder del host; en los demás no hace nada.
+    """
+    global _ultimos_precios
+    if not lider_actualizador.intentar():
+        return 0.0
+    # Los ids que otro proceso está consultando bajo demanda se saltan: los publicará él
+    async with precio_cache.reservar(tokens_a_actualizar()) as tokens:
+        if not tokens:
+            return 0.0
+        await coingecko_limiter.acquire()
+        response = await get_http_client().get(
+            f"{APIConfig.COINGECKO_URL}/simple/price",
+            params={"ids": ",".join(tokens), "vs_currencies": "usd", "include_24hr_change": "true"},
+            timeout=APIConfig.COINGECKO_TIMEOUT
+        )
+        if response.status_code == 429:
+            coingecko_limiter.penalizar()
+        response.raise_for_status()
+        coingecko_limiter.recuperar()
+        data = response.json()
+
+        volatilidad = 0.0
+        precios = {}
+        nuevos = {}
+        for token_id in tokens:
+            if token_id in data:
+                datos = nuevos[token_id] = construir_datos_precio(token_id, data[token_id])
+                anterior = _ultimos_precios.get(token_id)
+                if anterior:
+                    volatilidad = max(volatilidad, abs(datos["precio"] - anterior) / anterior * 100)
+                precios[token_id] = datos["precio"]
+        _ultimos_precios = precios
+        await precio_cache.publicar(nuevos)
+    logger.info(f"✅ Precios actualizados desde CoinGecko ({len(tokens)} tokens)")
+    return volatilidad
+
+def siguiente_intervalo(volatilidad: float, segundos_sin_consultas: float) -> float:
+    """Intervalo adaptativo con jitter: rápido si el mercado se mueve, lento si nadie pregunta"""
+    if volatilidad >= APIConfig.UPDATER_VOLATILITY_PCT:
+        intervalo = APIConfig.UPDATER_MIN_INTERVAL
+    elif segundos_sin_consultas >= APIConfig.UPDATER_IDLE_AFTER:
+        intervalo = APIConfig.UPDATER_MAX_INTERVAL
+    else:
+        intervalo = APIConfig.UPDATER_INTERVAL
+    return intervalo * random.uniform(1 - APIConfig.UPDATER_JITTER, 1 + APIConfig.UPDATER_JITTER)
+
+def _intervalo_backoff(retry_after: Optional[str]) -> float:
+    espera = APIConfig.UPDATER_INTERVAL * 2 ** _fallos_429
+    if retry_after and retry_after.isdigit():
+        espera = max(espera, int(retry_after))
+    return min(APIConfig.UPDATER_MAX_BACKOFF, espera) * random.uniform(1, 1 + APIConfig.UPDATER_JITTER)
+
+async def _tick(context):
+    """Job del JobQueue: una ronda de actualización y reprogramación de la siguiente"""
+    global _job, _fallos_429
+    intervalo = APIConfig.UPDATER_INTERVAL
+    try:
+        volatilidad = await actualizar_precios()
+        _fallos_429 = 0
+        intervalo = siguiente_intervalo(volatilidad, time.monotonic() - _ultima_consulta)
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 429:
+            intervalo = _intervalo_backoff(e.response.headers.get("Retry-After"))
+            _fallos_429 += 1
+            logger.warning(f"⏳ CoinGecko limitó el actualizador (429). Reintento en {intervalo:.0f}s")
+        else:
             logger.error(f"❌ Error actualizando precios desde CoinGecko: {e}")
+    except Exception as e:
+        logger.error(f"❌ Error actualizando precios desde CoinGecko: {e}")
 
-        time.sleep(60)
+    if _job is not None:
+        _job = context.job_queue.run_once(_tick, when=intervalo, name="actualizador_precios")
 
-def iniciar_actualizador():
-    thread = threading.Thread(target=actualizar_precios, daemon=True)
-    thread.start()
+def iniciar_actualizador(application):
+    """Programa el actualizador en el JobQueue de la aplicación"""
+    global _job
+    if application.job_queue is None:
+        logger.warning("JobQueue no disponible: instala python-telegram-bot[job-queue]")
+        return
+    if _job is None:
+        _job = application.job_queue.run_once(_tick, when=1, name="actualizador_precios")
 
+def detener_actualizador():
+    """Cancela la próxima ronda programada"""
+    global _job
+    if _job is not None:
+        _job.schedule_removal()
+        _job = None
+    lider_actualizador.soltar()
@@ -0,0 +1,207 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+from src.config import logger
+from src.utils.cache import LRUCache
+
+# Cada cuánto mira un proceso si el que tiene el lease ya publicó el precio:
+# empieza en SONDEO_SEG y se duplica en cada vuelta hasta SONDEO_MAX_SEG
+SONDEO_SEG = 0.05
+SONDEO_MAX_SEG = 0.5
+
+class SharedPriceCache(LRUCache):
+    """
+    Caché de precios en dos niveles: L1 en memoria (la LRUCache de siempre,
+    sin locks) y L2 en SQLite compartido por todos los procesos del host.
+
+    Un fallo de L1 lee L2 (una consulta por clave primaria, menos de 1 ms);
+    solo si allí tampoco está fresco se va al upstream, y antes se toma un
+    lease por clave en L2: los demás procesos esperan a que el dueño publique
+    en vez de repetir la consulta. El dueño renueva el lease mientras consulta,
+    así que solo vence si el proceso muere o se cuelga.
+    """
+
+    def __init__(self, path: Path, max_size: int = 1000, ttl: float = 60,
+                 stale_ttl: float = 0, lease_seg: float = 10):
+        super().__init__(max_size=max_size, ttl=ttl, stale_ttl=stale_ttl)
+        self._path = path
+        self.lease_seg = lease_seg
+        self._dueño = uuid.uuid4().hex
+        self._lectura: Optional[sqlite3.Connection] = None
+        self._escritura: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.l2_hits = 0
+        self.upstream = 0
+        self.esperas_lease = 0
+
+    def _conectar(self) -> sqlite3.Connection:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self._path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute("CREATE TABLE IF NOT EXISTS precios (clave TEXT PRIMARY KEY, valor TEXT NOT NULL, guardado REAL NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS leases (clave TEXT PRIMARY KEY, dueño TEXT NOT NULL, hasta REAL NOT NULL)")
+        return conn
+
+    # --- L2 ---
+
+    def _leer_l2(self, clave: str) -> Optional[Tuple[Any, float]]:
+        """(valor, edad en segundos) desde L2; se lee en el loop: es una búsqueda por clave primaria"""
+        if self._lectura is None:
+            self._lectura = self._conectar()
+            # En el loop nunca se espera un lock: si la base está ocupada (checkpoint,
+            # recuperación) la lectura cuenta como fallo de L2
+            self._lectura.execute("PRAGMA busy_timeout=0")
+        try:
+            fila = self._lectura.execute("SELECT valor, guardado FROM precios WHERE clave = ?", (clave,)).fetchone()
+        except sqlite3.OperationalError as e:
+            logger.debug(f"L2 ocupada leyendo {clave}: {e}")
+            return None
+        if fila is None:
+            return None
+        return json.loads(fila[0]), max(0.0, time.time() - fila[1])
+
+    def _en_transaccion(self, operacion: Callable[[sqlite3.Connection], Any]) -> Any:
+        with self._lock:
+            if self._escritura is None:
+                self._escritura = self._conectar()
+            conn = self._escritura
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                resultado = operacion(conn)
+                conn.execute("COMMIT")
+                return resultado
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _escribir_l2(self, valores: Dict[str, Any]) -> None:
+        ahora = time.time()
+        self._en_transaccion(lambda conn: conn.executemany(
+            "INSERT OR REPLACE INTO precios VALUES (?, ?, ?)",
+            [(clave, json.dumps(valor), ahora) for clave, valor in valores.items()]
+        ))
+
+    def _tomar_leases(self, claves: Iterable[str]) -> List[str]:
+        """Toma en una transacción el lease de las claves libres y devuelve cuáles consiguió"""
+        def tomar(conn: sqlite3.Connection) -> List[str]:
+            ahora = time.time()
+            propias = []
+            for clave in claves:
+                # Un lease vencido es de un proceso que murió o se colgó: se puede reclamar
+                conn.execute("DELETE FROM leases WHERE clave = ? AND hasta < ?", (clave, ahora))
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO leases VALUES (?, ?, ?)", (clave, self._dueño, ahora + self.lease_seg)
+                )
+                if cursor.rowcount == 1:
+                    propias.append(clave)
+            return propias
+        return self._en_transaccion(tomar)
+
+    def _tomar_lease(self, clave: str) -> bool:
+        return bool(self._tomar_leases([clave]))
+
+    def _renovar_leases(self, claves: List[str]) -> None:
+        hasta = time.time() + self.lease_seg
+        self._en_transaccion(lambda conn: conn.executemany(
+            "UPDATE leases SET hasta = ? WHERE clave = ? AND dueño = ?",
+            [(hasta, clave, self._dueño) for clave in claves]
+        ))
+
+    def _soltar_leases(self, claves: List[str]) -> None:
+        self._en_transaccion(lambda conn: conn.executemany(
+            "DELETE FROM leases WHERE clave = ? AND dueño = ?", [(clave, self._dueño) for clave in claves]
+        ))
+
+    async def _latido(self, claves: List[str]) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seg / 2)
+            try:
+                await asyncio.to_thread(self._renovar_leases, claves)
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ No se pudo renovar el lease de {len(claves)} precios: {e}")
+
+    @asynccontextmanager
+    async def reservar(self, claves: Iterable[str]) -> AsyncIterator[List[str]]:
+        """
+        Toma el lease de las claves que nadie más está consultando y lo renueva
+        mientras dure el bloque; devuelve esas claves. Las que tiene otro
+        proceso se dejan: ya las publicará él.
+        """
+        propias = await asyncio.to_thread(self._tomar_leases, list(claves))
+        latido = asyncio.create_task(self._latido(propias)) if propias else None
+        try:
+            yield propias
+        finally:
+            if latido:
+                latido.cancel()
+                await asyncio.gather(latido, return_exceptions=True)
+            if propias:
+                await asyncio.to_thread(self._soltar_leases, propias)
+
+    # --- Lectura a través de L2 ---
+
+    async def _fetch_and_store(self, key: Hashable, fetch: Callable[[], Awaitable[Any]], ttl: Optional[float]) -> Any:
+        ttl = self.ttl if ttl is None else ttl
+        value, restante = await self._obtener_compartido(str(key), fetch, ttl)
+        if value is not None:
+            # L1 caduca a la vez que la copia de L2 de la que sale
+            self.set(key, value, restante)
+        return value
+
+    async def _obtener_compartido(self, clave: str, fetch: Callable[[], Awaitable[Any]], ttl: float) -> Tuple[Any, float]:
+        limite = time.monotonic() + self.lease_seg
+        sondeo = SONDEO_SEG
+        while True:
+            encontrado = self._leer_l2(clave)
+            if encontrado and encontrado[1] < ttl:
+                self.l2_hits += 1
+                return encontrado[0], ttl - encontrado[1]
+
+            async with self.reservar([clave]) as propias:
+                if propias:
+                    self.upstream += 1
+                    value = await fetch()
+                    if value is not None:
+                        await asyncio.to_thread(self._escribir_l2, {clave: value})
+                    return value, ttl
+
+            # Otro proceso está consultando este id: se espera a que lo publique, o a que
+            # su lease venza sin renovarse (murió) y se reclame, pero como mucho lease_seg
+            self.esperas_lease += 1
+            if time.monotonic() >= limite:
+                if encontrado and encontrado[1] < ttl + self.stale_ttl:
+                    return encontrado[0], 0
+                logger.warning(f"⚠️ Sin precio compartido para {clave}: otro proceso sigue consultándolo")
+                return None, 0
+            await asyncio.sleep(sondeo)
+            sondeo = min(sondeo * 2, SONDEO_MAX_SEG)
+
+    async def publicar(self, valores: Dict[str, Any]) -> None:
+        """Guarda un lote de precios en L1 y, en una sola transacción, en L2"""
+        for clave, valor in valores.items():
+            self.set(clave, valor)
+        if valores:
+            await asyncio.to_thread(self._escribir_l2, valores)
+
+    def cerrar(self) -> None:
+        with self._lock:
+            for conn in (self._lectura, self._escritura):
+                if conn is not None:
+                    conn.close()
+            self._lectura = self._escritura = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **super().stats(),
+            "l2_hits": self.l2_hits,
+            "upstream": self.upstream,
+            "esperas_lease": self.esperas_lease,
+        }
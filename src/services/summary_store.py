@@ -0,0 +1,89 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from src.config import DATA_DIR
+
+# Durante este tiempo un resumen guardado se sirve sin volver a consultar la página
+FRESCO_SEG = 900
+
+# Parámetros que solo rastrean campañas y no cambian el contenido
+_PARAMS_RASTREO = {"fbclid", "gclid", "igshid", "mc_cid", "mc_eid", "ref", "ref_src"}
+
+def canonicalizar_url(url: str) -> str:
+    """Normaliza una URL para que variantes triviales compartan la misma entrada"""
+    partes = urlsplit(url.strip())
+    esquema = (partes.scheme or "https").lower()
+    host = (partes.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if partes.port and (esquema, partes.port) not in {("http", 80), ("https", 443)}:
+        host = f"{host}:{partes.port}"
+    ruta = partes.path.rstrip("/") or "/"
+    query = sorted(
+        (k, v) for k, v in parse_qsl(partes.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in _PARAMS_RASTREO
+    )
+    return urlunsplit((esquema, host, ruta, urlencode(query), ""))
+
+def hash_contenido(texto: str) -> str:
+    return hashlib.sha256(" ".join(texto.split()).encode("utf-8")).hexdigest()
+
+class SummaryStore:
+    """Resúmenes de URLs persistidos en SQLite, con validadores HTTP y hash del texto"""
+
+    _CAMPOS = ("url", "title", "summary", "content_hash", "etag", "last_modified", "checked_at")
+
+    def __init__(self, path: Path = DATA_DIR / "resumenes.db"):
+        self._path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _conexion(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self._path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS resumenes ("
+                " url TEXT PRIMARY KEY, title TEXT, summary TEXT NOT NULL,"
+                " content_hash TEXT NOT NULL, etag TEXT, last_modified TEXT,"
+                " checked_at REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def obtener(self, url: str) -> Optional[Dict]:
+        with self._lock:
+            fila = self._conexion().execute(
+                f"SELECT {', '.join(self._CAMPOS)} FROM resumenes WHERE url = ?", (url,)
+            ).fetchone()
+        return dict(zip(self._CAMPOS, fila)) if fila else None
+
+    def guardar(self, url: str, title: str, summary: str, content_hash: str,
+                etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        with self._lock, self._conexion() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO resumenes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, title, summary, content_hash, etag, last_modified, time.time())
+            )
+
+    def revalidado(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        """Marca la entrada como vigente tras un 304 o un contenido con el mismo hash"""
+        with self._lock, self._conexion() as conn:
+            conn.execute(
+                "UPDATE resumenes SET checked_at = ?, etag = COALESCE(?, etag),"
+                " last_modified = COALESCE(?, last_modified) WHERE url = ?",
+                (time.time(), etag, last_modified, url)
+            )
+
+    def cerrar(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+summary_store = SummaryStore()
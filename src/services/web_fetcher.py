@@ -0,0 +1,82 @@
+import asyncio
+import httpx
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, NamedTuple, Optional, TypeVar
+from src.config import APIConfig, logger
+from src.services.http_client import get_http_client
+
+T = TypeVar("T")
+
+TIPOS_HTML = ("text/html", "application/xhtml+xml")
+HEADERS_WEB = {
+    "User-Agent": "Mozilla/5.0",
+    "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.1",
+    "Accept-Language": "es-ES,es;q=0.9"
+}
+
+# Pool propio para el parseo: no compite con el executor por defecto del loop
+_executor: Optional[ThreadPoolExecutor] = None
+
+class WebFetchError(Exception):
+    pass
+
+class PaginaDescargada(NamedTuple):
+    status: int
+    html: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    truncada: bool = False
+
+async def descargar_pagina(
+    url: str,
+    headers: Optional[dict] = None,
+    max_bytes: int = APIConfig.WEB_MAX_BYTES
+) -> PaginaDescargada:
+    """
+    Descarga una página HTML en streaming. Corta antes de leer el cuerpo si el
+    tipo no es HTML o el Content-Length supera `max_bytes`; si el servidor no
+    lo declara, deja de leer al llegar al tope y se queda con lo recibido.
+    """
+    try:
+        async with get_http_client().stream("GET", url, headers={**HEADERS_WEB, **(headers or {})}) as response:
+            etag = response.headers.get("etag")
+            last_modified = response.headers.get("last-modified")
+            if response.status_code == 304:
+                return PaginaDescargada(304, "", etag, last_modified)
+            response.raise_for_status()
+
+            tipo = response.headers.get("content-type", "").split(";")[0].strip().lower()
+            if tipo and tipo not in TIPOS_HTML:
+                raise WebFetchError(f"el contenido no es HTML ({tipo})")
+            declarado = response.headers.get("content-length")
+            if declarado and declarado.isdigit() and int(declarado) > max_bytes:
+                raise WebFetchError(f"la página pesa {int(declarado) // 1024} KB (máximo {max_bytes // 1024} KB)")
+
+            cuerpo = bytearray()
+            truncada = False
+            async for bloque in response.aiter_bytes():
+                cuerpo += bloque
+                if len(cuerpo) >= max_bytes:
+                    del cuerpo[max_bytes:]
+                    truncada = True
+                    logger.info(f"✂️ {url} supera {max_bytes} bytes, se resume solo el inicio")
+                    break
+            html = bytes(cuerpo).decode(response.encoding or "utf-8", errors="replace")
+            return PaginaDescargada(response.status_code, html, etag, last_modified, truncada)
+    except httpx.HTTPStatusError as e:
+        raise WebFetchError(f"el servidor respondió {e.response.status_code}") from e
+    except httpx.HTTPError as e:
+        raise WebFetchError(f"error de red: {e}") from e
+
+async def parsear_en_pool(funcion: Callable[[str], T], html: str) -> T:
+    """Ejecuta el parseo del HTML fuera del event loop"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=APIConfig.WEB_PARSE_WORKERS, thread_name_prefix="html")
+    return await asyncio.get_running_loop().run_in_executor(_executor, funcion, html)
+
+def cerrar_web_fetcher():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
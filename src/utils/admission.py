@@ -0,0 +1,89 @@
+from typing import Callable, Dict, Optional
+from telegram import Update
+from telegram.ext import filters
+from src.config import logger
+from src.services.crypto_mapper import crypto_mapper
+from src.utils.cache import LRUCache
+from src.utils.filters import MentionedBotFilter, TopicFilter
+from src.utils.rate_limiter import AsyncTokenBucket
+
+BARATA = "barata"
+CARA = "cara"
+
+# Comandos que siempre acaban en una llamada larga al LLM
+COMANDOS_CAROS = frozenset({"resumen_url", "resumen_texto"})
+
+# Solo cuenta lo que de verdad llega a un handler del bot; el resto del grupo no cuesta nada
+_DIRIGIDO = TopicFilter() & filters.TEXT & MentionedBotFilter()
+
+MENSAJES_RECHAZO = {
+    "ocupado": "⏳ Estoy atendiendo muchas consultas ahora mismo. Intenta de nuevo en un minuto.",
+    "usuario": "⏳ Vas muy rápido: espera un poco antes de pedirme otro resumen o análisis.",
+    "chat": "⏳ Hay demasiadas consultas en este chat. Intenta de nuevo en un rato.",
+}
+
+def clasificar_update(update: object) -> str:
+    """Carril del update: los que acaban en el LLM van por el carril caro"""
+    if not isinstance(update, Update) or not _DIRIGIDO.check_update(update):
+        return BARATA
+    texto = update.message.text
+    if texto.startswith("/"):
+        comando = texto[1:].split(maxsplit=1)[0].split("@")[0].lower()
+        return CARA if comando in COMANDOS_CAROS else BARATA
+    # Solo las consultas de precio con una moneda reconocible se responden desde la caché;
+    # "cómo está el mercado" sin moneda acaba en la IA igual que cualquier otra mención
+    return BARATA if crypto_mapper.monedas_consultadas(texto) else CARA
+
+class ControlAdmision:
+    """
+    Decide si se acepta trabajo caro: token bucket por usuario y por chat, y
+    rechazo inmediato cuando hay más de `max_backlog` tareas de IA pendientes
+    (las del carril caro más las que ya esperan turno en el cliente de OpenAI).
+    """
+
+    def __init__(self, tasa_usuario: float, rafaga_usuario: float, tasa_chat: float, rafaga_chat: float,
+                 max_backlog: int, backlog_externo: Callable[[], int] = lambda: 0, max_claves: int = 10000):
+        self.tasa_usuario = tasa_usuario
+        self.rafaga_usuario = rafaga_usuario
+        self.tasa_chat = tasa_chat
+        self.rafaga_chat = rafaga_chat
+        self.max_backlog = max_backlog
+        self.backlog_externo = backlog_externo
+        # Un bucket inactivo más tiempo del que tarda en llenarse equivale a uno nuevo
+        ttl = max(rafaga_usuario / tasa_usuario, rafaga_chat / tasa_chat)
+        self._buckets = LRUCache(max_size=max_claves, ttl=ttl)
+        self.rechazos: Dict[str, int] = {motivo: 0 for motivo in MENSAJES_RECHAZO}
+
+    clasificar = staticmethod(clasificar_update)
+
+    def _bucket(self, clave, tasa: float, rafaga: float) -> AsyncTokenBucket:
+        bucket = self._buckets.peek(clave)
+        if bucket is None:
+            bucket = AsyncTokenBucket(tasa, rafaga)
+        # set() renueva el TTL: el bucket vive mientras haya actividad
+        self._buckets.set(clave, bucket)
+        return bucket
+
+    def admitir(self, update: Update, pendientes: int = 0) -> Optional[str]:
+        """None si se acepta; si no, el motivo del rechazo ("ocupado", "usuario" o "chat")"""
+        motivo = None
+        if pendientes + self.backlog_externo() >= self.max_backlog:
+            motivo = "ocupado"
+        elif update.effective_user and not self._bucket(
+                ("u", update.effective_user.id), self.tasa_usuario, self.rafaga_usuario).try_acquire():
+            motivo = "usuario"
+        elif update.effective_chat and not self._bucket(
+                ("c", update.effective_chat.id), self.tasa_chat, self.rafaga_chat).try_acquire():
+            motivo = "chat"
+        if motivo:
+            self.rechazos[motivo] += 1
+        return motivo
+
+async def responder_rechazo(update: object, motivo: str) -> None:
+    """Respuesta inmediata al update descartado: sin IA y sin pasar por los handlers"""
+    if not isinstance(update, Update) or not update.effective_message:
+        return
+    try:
+        await update.effective_message.reply_text(MENSAJES_RECHAZO[motivo])
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo avisar del rechazo ({motivo}): {e}")
@@ -0,0 +1,67 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+
+class MicroBatcher:
+    """Agrupa las claves pedidas dentro de una ventana corta en una sola llamada.
+
+    `fetch_many` recibe la lista de claves del lote y devuelve un dict
+    clave -> valor. Las claves ausentes en la respuesta se resuelven con None;
+    si `fetch_many` lanza una excepción, todos los llamadores del lote la reciben.
+    """
+
+    def __init__(
+        self,
+        fetch_many: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]],
+        ventana: float = 0.05,
+        max_lote: int = 50
+    ):
+        self._fetch_many = fetch_many
+        self.ventana = ventana
+        self.max_lote = max_lote
+        self._pendientes: Dict[Hashable, asyncio.Future] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tareas = set()
+        self.lotes_enviados = 0
+        self.claves_resueltas = 0
+
+    async def submit(self, key: Hashable) -> Any:
+        fut = self._pendientes.get(key)
+        if fut is None:
+            loop = asyncio.get_running_loop()
+            fut = loop.create_future()
+            self._pendientes[key] = fut
+            if len(self._pendientes) >= self.max_lote:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.ventana, self._flush)
+        return await asyncio.shield(fut)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pendientes:
+            return
+        lote, self._pendientes = self._pendientes, {}
+        tarea = asyncio.ensure_future(self._ejecutar(lote))
+        self._tareas.add(tarea)
+        tarea.add_done_callback(self._tareas.discard)
+
+    async def _ejecutar(self, lote: Dict[Hashable, asyncio.Future]) -> None:
+        self.lotes_enviados += 1
+        self.claves_resueltas += len(lote)
+        try:
+            resultados = await self._fetch_many(list(lote))
+        except asyncio.CancelledError:
+            for fut in lote.values():
+                fut.cancel()
+            raise
+        except Exception as e:
+            for fut in lote.values():
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for key, fut in lote.items():
+            if not fut.done():
+                fut.set_result(resultados.get(key))
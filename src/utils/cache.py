@@ -0,0 +1,122 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from src.utils.singleflight import SingleFlight
+
+
+class LRUCache:
+    """Caché en memoria acotada (LRU) con TTL por entrada y stale-while-revalidate.
+
+    Cada entrada es fresca durante `ttl` segundos y después sigue sirviéndose
+    como "stale" durante `stale_ttl` segundos más mientras se refresca en
+    segundo plano. Pasado ese margen se considera ausente.
+    """
+
+    def __init__(self, max_size: int = 1000, ttl: float = 60, stale_ttl: float = 0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        # clave -> (valor, fresco_hasta, stale_hasta)
+        self._data: "OrderedDict[Hashable, Tuple[Any, float, float]]" = OrderedDict()
+        self._singleflight = SingleFlight()
+        self._refrescos = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._lookup(key) is not None
+
+    def _lookup(self, key: Hashable) -> Optional[Tuple[Any, bool]]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, fresh_until, stale_until = entry
+        now = time.monotonic()
+        if now >= stale_until:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value, now < fresh_until
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Devuelve el valor solo si está fresco"""
+        found = self._lookup(key)
+        if found is None or not found[1]:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return found[0]
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Devuelve el valor aunque esté stale, sin contar en las estadísticas"""
+        found = self._lookup(key)
+        return default if found is None else found[0]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, stale_ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        stale_ttl = self.stale_ttl if stale_ttl is None else stale_ttl
+        now = time.monotonic()
+        self._data[key] = (value, now + ttl, now + ttl + stale_ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    async def _fetch_and_store(self, key: Hashable, fetch: Callable[[], Awaitable[Any]], ttl: Optional[float]) -> Any:
+        value = await fetch()
+        if value is not None:
+            self.set(key, value, ttl)
+        return value
+
+    def _refrescar_en_segundo_plano(self, key, fetch, ttl) -> None:
+        async def refrescar():
+            try:
+                await self._singleflight.do(key, lambda: self._fetch_and_store(key, fetch, ttl))
+            except Exception:
+                # Seguimos sirviendo el valor stale; el siguiente acceso lo reintentará
+                pass
+
+        tarea = asyncio.ensure_future(refrescar())
+        self._refrescos.add(tarea)
+        tarea.add_done_callback(self._refrescos.discard)
+
+    async def get_or_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]], ttl: Optional[float] = None) -> Any:
+        """Lectura a través de la caché.
+
+        Fresco: se devuelve al instante. Stale: se devuelve al instante y se
+        lanza un refresco en segundo plano. Ausente: se espera a `fetch()`,
+        compartiendo la petición con otros llamadores concurrentes.
+        """
+        found = self._lookup(key)
+        if found is not None:
+            value, fresh = found
+            if fresh:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+                self._refrescar_en_segundo_plano(key, fetch, ttl)
+            return value
+
+        self.misses += 1
+        return await self._singleflight.do(key, lambda: self._fetch_and_store(key, fetch, ttl))
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.stale_hits + self.misses
+        return {
+            "entradas": len(self._data),
+            "max": self.max_size,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.stale_hits) / total, 3) if total else 0.0,
+        }
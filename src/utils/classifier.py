@@ -1,7 +1,8 @@
 """
 Clasificador de Intenciones para Mensajes de Usuario
 """
-from typing import Optional, Dict, List, Literal
+from typing import Optional, Dict, List, Literal, Set
+from src.utils.keyword_matcher import KeywordMatcher
 
 IntentType = Literal[
     "saludo", 
@@ -13,59 +14,40 @@ IntentType = Literal[
     "otro"
 ]
 
+# Orden de prioridad: si el mensaje encaja en varias intenciones, gana la primera
+_INTENCIONES: Dict[str, List[str]] = {
+    "saludo": ["hola", "buenas", "hi", "hello", "saludos"],
+    "precio": ["precio", "precios", "valor", "cotización", "cuánto está", "a cuánto", "cómo está", "price"],
+    "inversion": ["invertir", "comprar", "vender", "inversión", "trading"],
+    "mercado": ["mercado", "tendencia", "análisis", "predicción", "cómo va"],
+    "ayuda": ["ayuda", "help", "comandos", "qué puedes hacer"],
+    "resumen": ["resumen", "resumir", "sumarizar", "summary"],
+}
+
+# Alias comunes de criptomonedas -> id de CoinGecko
+_ALIAS_CRIPTOS: Dict[str, List[str]] = {
+    "bitcoin": ["btc", "bitcoin"],
+    "ethereum": ["eth", "ethereum"],
+    "binancecoin": ["bnb"],
+    "solana": ["sol", "solana"],
+    "cardano": ["ada", "cardano"],
+}
+
+_matcher_intenciones = KeywordMatcher(_INTENCIONES)
+_matcher_criptos = KeywordMatcher(_ALIAS_CRIPTOS)
+
 class CryptoIntentClassifier:
     @staticmethod
     def classify_intent(text: str) -> IntentType:
         """Clasifica la intención del mensaje del usuario"""
-        text = text.lower()
-
-        # Detección de saludos
-        if any(greeting in text for greeting in ["hola", "buenas", "hi", "hello", "saludos"]):
-            return "saludo"
-
-        # Detección de consultas de precio
-        price_terms = ["precio", "valor", "cotización", "cuánto está", "cómo está", "price"]
-        if any(term in text for term in price_terms):
-            return "precio"
-
-        # Detección de consultas de inversión
-        investment_terms = ["invertir", "comprar", "vender", "inversión", "trading"]
-        if any(term in text for term in investment_terms):
-            return "inversion"
+        return _matcher_intenciones.primera(text, prioridad=list(_INTENCIONES)) or "otro"
 
-        # Detección de consultas de mercado
-        market_terms = ["mercado", "tendencia", "análisis", "predicción", "cómo va"]
-        if any(term in text for term in market_terms):
-            return "mercado"
-
-        # Detección de solicitudes de ayuda
-        help_terms = ["ayuda", "help", "comandos", "qué puedes hacer"]
-        if any(term in text for term in help_terms):
-            return "ayuda"
-
-        # Detección de solicitudes de resumen
-        summary_terms = ["resumen", "resumir", "sumarizar", "summary"]
-        if any(term in text for term in summary_terms):
-            return "resumen"
-
-        return "otro"
+    @staticmethod
+    def intenciones(text: str) -> Set[str]:
+        """Todas las intenciones presentes en el mensaje, sin aplicar prioridad"""
+        return _matcher_intenciones.categorias(text)
 
     @staticmethod
     def detectar_cripto(text: str) -> Optional[str]:
         """Detecta menciones de criptomonedas comunes con alias"""
-        # Diccionario de alias comunes
-        alias_criptos = {
-            "btc": "bitcoin",
-            "bitcoin": "bitcoin",
-            "eth": "ethereum",
-            "ethereum": "ethereum",
-            "bnb": "binancecoin",
-            "sol": "solana",
-            "ada": "cardano"
-        }
-        
-        text = text.lower()
-        for alias, cripto in alias_criptos.items():
-            if alias in text:
-                return cripto
-        return None
\ No newline at end of file
+        return _matcher_criptos.primera(text)
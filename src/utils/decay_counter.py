@@ -0,0 +1,52 @@
+import heapq
+import math
+import time
+from typing import Dict, Hashable, List
+
+
+class DecayingCounter:
+    """Contador de frecuencia con decaimiento exponencial.
+
+    Cada evento suma 1 y su peso se reduce a la mitad cada `vida_media`
+    segundos. Para no recorrer todas las claves en cada evento, los
+    incrementos se guardan escalados respecto a un instante de referencia
+    que se reajusta cuando el factor de escala crece demasiado.
+    """
+
+    _MAX_EXPONENTE = 50
+
+    def __init__(self, vida_media: float = 3600, max_claves: int = 5000):
+        self._decay = math.log(2) / vida_media
+        self.max_claves = max_claves
+        self._referencia = time.monotonic()
+        self._scores: Dict[Hashable, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def _exponente(self, now: float) -> float:
+        return (now - self._referencia) * self._decay
+
+    def _reajustar(self, now: float) -> None:
+        factor = math.exp(-self._exponente(now))
+        self._scores = {k: v * factor for k, v in self._scores.items() if v * factor > 1e-3}
+        self._referencia = now
+
+    def registrar(self, key: Hashable, peso: float = 1.0) -> None:
+        now = time.monotonic()
+        if self._exponente(now) > self._MAX_EXPONENTE:
+            self._reajustar(now)
+        self._scores[key] = self._scores.get(key, 0.0) + peso * math.exp(self._exponente(now))
+        if len(self._scores) > self.max_claves:
+            # Se descarta la mitad menos demandada para acotar memoria
+            self._reajustar(now)
+            conservar = heapq.nlargest(self.max_claves // 2, self._scores.items(), key=lambda kv: kv[1])
+            self._scores = dict(conservar)
+
+    def valor(self, key: Hashable) -> float:
+        return self._scores.get(key, 0.0) * math.exp(-self._exponente(time.monotonic()))
+
+    def top(self, n: int) -> List[Hashable]:
+        """Las `n` claves más demandadas, de mayor a menor"""
+        # Todas las puntuaciones comparten la misma escala, así que basta compararlas tal cual
+        return [k for k, _ in heapq.nlargest(n, list(self._scores.items()), key=lambda kv: kv[1])]
@@ -0,0 +1,25 @@
+from collections import OrderedDict
+from typing import Hashable
+
+class SeenSet:
+    """Conjunto acotado de claves ya vistas: al llenarse olvida las más antiguas"""
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._vistos: "OrderedDict[Hashable, None]" = OrderedDict()
+        self.duplicados = 0
+
+    def add(self, clave: Hashable) -> bool:
+        """Registra la clave; devuelve False si ya se había visto"""
+        if clave in self._vistos:
+            self.duplicados += 1
+            return False
+        self._vistos[clave] = None
+        if len(self._vistos) > self.max_size:
+            self._vistos.popitem(last=False)
+        return True
+
+    def __contains__(self, clave: Hashable) -> bool:
+        return clave in self._vistos
+
+    def __len__(self) -> int:
+        return len(self._vistos)
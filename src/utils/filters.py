@@ -1,22 +1,33 @@
-
-from telegram import Message, Update
-from telegram.ext.filters import BaseFilter
+from typing import Optional
+from telegram import Message, MessageEntity
+from telegram.ext.filters import MessageFilter
 from src.config import GROUP_ID, TOPIC_ID
 
-class MentionedBotFilter(BaseFilter):
+# Al combinarlos, TopicFilter va primero: dos comparaciones de enteros
+# descartan el tráfico de otros chats antes de mirar el texto.
+
+class TopicFilter(MessageFilter):
     def filter(self, message: Message) -> bool:
-        if not message.text:
-            return False
-        bot_username = message.bot.username.lower()
-        return message.text.strip().lower().startswith(f"@{bot_username}")
+        return message.chat.id == GROUP_ID and message.message_thread_id == TOPIC_ID
 
-    def __call__(self, update: Update) -> bool:
-        return update.message is not None and self.filter(update.message)
 
+class MentionedBotFilter(MessageFilter):
+    """Mensajes dirigidos al bot: empiezan con @bot o con un comando (PTB valida el /cmd@bot)"""
+    def __init__(self):
+        super().__init__()
+        self._usuario: Optional[str] = None
 
-class TopicFilter(BaseFilter):
     def filter(self, message: Message) -> bool:
-        return message.chat.id == GROUP_ID and message.message_thread_id == TOPIC_ID
-
-    def __call__(self, update: Update) -> bool:
-        return update.message is not None and self.filter(update.message)
+        entidades = message.entities
+        if not entidades or entidades[0].offset != 0:
+            return False
+        entidad = entidades[0]
+        if entidad.type == MessageEntity.BOT_COMMAND:
+            return True
+        if entidad.type != MessageEntity.MENTION:
+            return False
+        if self._usuario is None:
+            # El bot ya se identificó con getMe al arrancar (Application.initialize)
+            self._usuario = message.get_bot().username.lower()
+        # En el offset 0 un @usuario es ASCII: las unidades UTF-16 coinciden con los caracteres
+        return entidad.length == len(self._usuario) + 1 and message.text[1:entidad.length].lower() == self._usuario
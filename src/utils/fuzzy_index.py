@@ -0,0 +1,76 @@
+import heapq
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def trigramas(texto: str) -> List[str]:
+    """Trigramas de caracteres con relleno para que cuenten inicio y fin"""
+    padded = f"  {texto} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+class TrigramIndex:
+    """Índice aproximado de términos basado en postings de trigramas.
+
+    Se construye una vez y responde consultas difusas mirando solo los términos
+    que comparten trigramas con la consulta, en lugar de recorrer el diccionario
+    completo como hace `difflib.get_close_matches`.
+    """
+
+    MAX_CANDIDATOS = 12
+    # Trigramas presentes en demasiados términos apenas discriminan
+    MAX_POSTINGS = 3000
+
+    def __init__(self, terminos: Iterable[Tuple[str, str]]):
+        self._terminos: List[str] = []
+        self._valores: List[str] = []
+        self._tamanos: List[int] = []
+        self._postings: Dict[str, List[int]] = {}
+
+        vistos = set()
+        for termino, valor in terminos:
+            if not termino or termino in vistos:
+                continue
+            vistos.add(termino)
+            idx = len(self._terminos)
+            self._terminos.append(termino)
+            self._valores.append(valor)
+            grams = set(trigramas(termino))
+            self._tamanos.append(len(grams))
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(idx)
+
+    def __len__(self) -> int:
+        return len(self._terminos)
+
+    def buscar(self, consulta: str, cutoff: float = 0.6) -> Optional[str]:
+        """Devuelve el valor del término más parecido (ratio >= cutoff) o None"""
+        grams = set(trigramas(consulta))
+        postings = [self._postings[g] for g in grams if g in self._postings]
+        selectivos = [p for p in postings if len(p) <= self.MAX_POSTINGS]
+        comunes = Counter()
+        for posting in selectivos or postings:
+            comunes.update(posting)
+        if not comunes:
+            return None
+
+        # Preselección por coeficiente de Dice y verificación fina con difflib
+        total = len(grams)
+        candidatos = heapq.nlargest(
+            self.MAX_CANDIDATOS,
+            comunes.items(),
+            key=lambda item: 2 * item[1] / (total + self._tamanos[item[0]])
+        )
+
+        mejor, mejor_ratio = None, cutoff
+        matcher = SequenceMatcher()
+        matcher.set_seq2(consulta)
+        for idx, _ in candidatos:
+            matcher.set_seq1(self._terminos[idx])
+            if matcher.real_quick_ratio() < mejor_ratio or matcher.quick_ratio() < mejor_ratio:
+                continue
+            ratio = matcher.ratio()
+            if ratio >= mejor_ratio and (mejor is None or ratio > mejor_ratio):
+                mejor, mejor_ratio = idx, ratio
+        return self._valores[mejor] if mejor is not None else None
@@ -0,0 +1,45 @@
+import os
+from pathlib import Path
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: un solo proceso, siempre es el líder
+    fcntl = None
+
+class HostLock:
+    """
+    Elección de líder entre los procesos de un mismo host con `flock`: el
+    primero que toma el archivo lo conserva mientras viva, y si muere el
+    sistema libera el lock y otro proceso lo toma en su siguiente intento.
+    """
+
+    def __init__(self, path: Path):
+        self._path = path
+        self._fd: Optional[int] = None
+
+    @property
+    def es_lider(self) -> bool:
+        return self._fd is not None or fcntl is None
+
+    def intentar(self) -> bool:
+        """Toma el lock si está libre (sin bloquear); True si este proceso es el líder"""
+        if self.es_lider:
+            return True
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        return True
+
+    def soltar(self) -> None:
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
@@ -0,0 +1,150 @@
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Etiquetas cuyo contenido se descarta por completo
+IGNORADAS = frozenset({"script", "style", "footer", "nav", "iframe", "noscript", "svg"})
+# Bloques de texto que se extraen, en el orden en que aparecen en el documento
+BLOQUES = frozenset({"h1", "h2", "h3", "p"})
+MIN_PALABRAS = 6
+TITULO_POR_DEFECTO = "Contenido Web"
+
+Extraccion = Tuple[str, str]
+Backend = Callable[[str, "Presupuesto"], Extraccion]
+
+class Presupuesto:
+    """Acumula bloques hasta agotar el número de bloques o la medida de texto (caracteres por defecto)"""
+    def __init__(self, max_bloques: int = 30, max_medida: int = 12000, medir: Callable[[str], int] = len):
+        self.max_bloques = max_bloques
+        self.max_medida = max_medida
+        self.medir = medir
+        self.bloques: List[str] = []
+        self.usado = 0
+
+    @property
+    def agotado(self) -> bool:
+        return len(self.bloques) >= self.max_bloques or self.usado >= self.max_medida
+
+    def agregar(self, texto: str) -> bool:
+        """Añade un bloque si es relevante; devuelve True cuando ya no caben más"""
+        texto = " ".join(texto.split())
+        if len(texto.split(" ")) < MIN_PALABRAS:
+            return self.agotado
+        self.bloques.append(texto)
+        self.usado += self.medir(texto) + 1
+        return self.agotado
+
+    def texto(self) -> str:
+        return "\n".join(self.bloques)
+
+
+class _Completo(Exception):
+    pass
+
+class _ExtractorStdlib(HTMLParser):
+    def __init__(self, presupuesto: Presupuesto):
+        super().__init__(convert_charrefs=True)
+        self.presupuesto = presupuesto
+        self.ignorando = 0
+        self.en_titulo = False
+        self.titulo: List[str] = []
+        self.bloque: Optional[str] = None
+        self.partes: List[str] = []
+
+    def _cerrar_bloque(self):
+        if self.bloque is not None:
+            self.bloque = None
+            if self.presupuesto.agregar("".join(self.partes)):
+                raise _Completo
+            self.partes = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in IGNORADAS:
+            self.ignorando += 1
+        elif tag == "title" and not self.titulo:
+            self.en_titulo = True
+        elif tag in BLOQUES and not self.ignorando:
+            # Un <p> sin cerrar termina cuando empieza el siguiente bloque
+            self._cerrar_bloque()
+            self.bloque = tag
+
+    def handle_endtag(self, tag):
+        if tag in IGNORADAS:
+            self.ignorando = max(0, self.ignorando - 1)
+        elif tag == "title":
+            self.en_titulo = False
+        elif tag == self.bloque:
+            self._cerrar_bloque()
+
+    def handle_data(self, data):
+        if self.en_titulo:
+            self.titulo.append(data)
+        elif self.bloque is not None and not self.ignorando:
+            self.partes.append(data)
+
+def _extraer_stdlib(html: str, presupuesto: Presupuesto) -> Extraccion:
+    """Una sola pasada sin construir árbol; se detiene en cuanto se agota el presupuesto"""
+    parser = _ExtractorStdlib(presupuesto)
+    try:
+        parser.feed(html)
+        parser.close()
+        parser._cerrar_bloque()
+    except _Completo:
+        pass
+    titulo = " ".join("".join(parser.titulo).split())
+    return titulo or TITULO_POR_DEFECTO, presupuesto.texto()
+
+def _extraer_bs4(html: str, presupuesto: Presupuesto) -> Extraccion:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    for element in soup(list(IGNORADAS)):
+        element.decompose()
+    titulo = soup.title.get_text() if soup.title else ""
+    for el in soup.find_all(list(BLOQUES)):
+        # html.parser anida los <p> sin cerrar: cada bloque se queda solo con su propio texto
+        propio = (s for s in el.find_all(string=True) if s.find_parent(list(BLOQUES)) is el)
+        if presupuesto.agregar("".join(propio)):
+            break
+    return " ".join(titulo.split()) or TITULO_POR_DEFECTO, presupuesto.texto()
+
+def _extraer_lxml(html: str, presupuesto: Presupuesto) -> Extraccion:
+    import lxml.html
+
+    raiz = lxml.html.fromstring(html)
+    for el in list(raiz.iter(*IGNORADAS)):
+        el.drop_tree()
+    titulo = raiz.findtext(".//title") or ""
+    for el in raiz.iter(*BLOQUES):
+        if presupuesto.agregar(el.text_content()):
+            break
+    return " ".join(titulo.split()) or TITULO_POR_DEFECTO, presupuesto.texto()
+
+BACKENDS: Dict[str, Backend] = {
+    "stdlib": _extraer_stdlib,
+    "bs4": _extraer_bs4,
+}
+try:
+    import lxml.html  # noqa: F401
+    BACKENDS["lxml"] = _extraer_lxml
+except ImportError:
+    pass
+
+BACKEND_POR_DEFECTO = "stdlib"
+
+def registrar_backend(nombre: str, backend: Backend) -> None:
+    BACKENDS[nombre] = backend
+
+def extraer_contenido(
+    html: str,
+    max_bloques: int = 30,
+    max_medida: int = 12000,
+    medir: Callable[[str], int] = len,
+    backend: Optional[str] = None
+) -> Extraccion:
+    """
+    Devuelve (título, texto) con los encabezados y párrafos de la página en
+    orden de aparición, hasta `max_bloques` bloques o `max_medida` unidades
+    según `medir` (caracteres, o tokens si se pasa un contador).
+    """
+    presupuesto = Presupuesto(max_bloques, max_medida, medir)
+    return BACKENDS[backend or BACKEND_POR_DEFECTO](html, presupuesto)
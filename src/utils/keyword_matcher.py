@@ -0,0 +1,100 @@
+import re
+import unicodedata
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+_PALABRA = re.compile(r"\w+")
+
+def normalizar(texto: str, conservar_mayusculas: bool = False) -> str:
+    """Minúsculas y sin tildes: 'Cotización' -> 'cotizacion'"""
+    texto = unicodedata.normalize("NFKD", texto if conservar_mayusculas else texto.lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+def tokenizar(texto: str, conservar_mayusculas: bool = False) -> List[str]:
+    return _PALABRA.findall(normalizar(texto, conservar_mayusculas))
+
+# (posición de la primera palabra, categoría, término)
+Coincidencia = Tuple[int, str, str]
+
+class KeywordMatcher:
+    """
+    Autómata de Aho-Corasick sobre palabras (no caracteres): encuentra todos los
+    términos de todas las categorías en una sola pasada, solo como palabras o
+    frases completas ("sol" no coincide con "solo"), sin distinguir tildes.
+    """
+
+    def __init__(self, categorias: Dict[str, Iterable[str]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fallo: List[int] = [0]
+        self._salida: List[List[Tuple[str, str, int]]] = [[]]
+        for categoria, terminos in categorias.items():
+            for termino in terminos:
+                self._insertar(categoria, termino)
+        self._enlazar()
+
+    def _insertar(self, categoria: str, termino: str):
+        palabras = tokenizar(termino)
+        if not palabras:
+            return
+        nodo = 0
+        for palabra in palabras:
+            siguiente = self._goto[nodo].get(palabra)
+            if siguiente is None:
+                siguiente = len(self._goto)
+                self._goto[nodo][palabra] = siguiente
+                self._goto.append({})
+                self._fallo.append(0)
+                self._salida.append([])
+            nodo = siguiente
+        self._salida[nodo].append((categoria, termino, len(palabras)))
+
+    def _enlazar(self):
+        cola = deque(self._goto[0].values())
+        while cola:
+            nodo = cola.popleft()
+            for palabra, hijo in self._goto[nodo].items():
+                cola.append(hijo)
+                fallo = self._fallo[nodo]
+                while fallo and palabra not in self._goto[fallo]:
+                    fallo = self._fallo[fallo]
+                self._fallo[hijo] = self._goto[fallo].get(palabra, 0)
+                self._salida[hijo] = self._salida[hijo] + self._salida[self._fallo[hijo]]
+
+    def coincidencias(self, texto: str) -> List[Coincidencia]:
+        """Todas las apariciones, incluidas las solapadas, en orden de aparición del final"""
+        encontradas = []
+        nodo = 0
+        for i, palabra in enumerate(tokenizar(texto)):
+            while nodo and palabra not in self._goto[nodo]:
+                nodo = self._fallo[nodo]
+            nodo = self._goto[nodo].get(palabra, 0)
+            for categoria, termino, largo in self._salida[nodo]:
+                encontradas.append((i - largo + 1, categoria, termino))
+        return encontradas
+
+    def coincidencias_maximas(self, texto: str) -> List[Coincidencia]:
+        """Sin solapes: en cada posición gana el término más largo ("bitcoin cash" frente a "bitcoin")"""
+        ordenadas = sorted(self.coincidencias(texto), key=lambda c: (c[0], -self._largo(c[2])))
+        elegidas, libre_desde = [], 0
+        for coincidencia in ordenadas:
+            if coincidencia[0] >= libre_desde:
+                elegidas.append(coincidencia)
+                libre_desde = coincidencia[0] + self._largo(coincidencia[2])
+        return elegidas
+
+    @staticmethod
+    def _largo(termino: str) -> int:
+        return len(tokenizar(termino))
+
+    def categorias(self, texto: str) -> Set[str]:
+        return {categoria for _, categoria, _ in self.coincidencias(texto)}
+
+    def primera(self, texto: str, prioridad: Optional[Sequence[str]] = None) -> Optional[str]:
+        """La categoría de mayor prioridad presente o, sin prioridad, la que aparece antes en el texto"""
+        encontradas = self.coincidencias(texto)
+        if not encontradas:
+            return None
+        if prioridad:
+            presentes = {categoria for _, categoria, _ in encontradas}
+            return next((c for c in prioridad if c in presentes), None)
+        return min(encontradas, key=lambda c: c[0])[1]
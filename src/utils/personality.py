@@ -1,5 +1,6 @@
 from typing import Dict, Optional
 import random
+from src.utils.prompt_builder import Contexto, PromptConstruido, construir_prompt
 
 class Personalidad:
     """Define la personalidad y respuestas de SoonBot"""
@@ -26,19 +27,25 @@ class Personalidad:
         ]
         return random.choice(errores)
 
+    # Tokens máximos del contexto que se añade a las instrucciones
+    PRESUPUESTO_CONTEXTO = 300
+
+    INSTRUCCIONES = (
+        "Eres SoonBot, experto en criptomonedas con un tono profesional pero cercano. "
+        "Características:\n"
+        "- Usa emojis relevantes (🚀 para oportunidades, ⚠️ para riesgos)\n"
+        "- Sé conciso (máximo 2-3 frases)\n"
+        "- Proporciona análisis útiles pero simples\n"
+        "- Mantén un estilo conversacional"
+    )
+
+    @staticmethod
+    def construir_instrucciones(contexto: Contexto = None, consulta: Optional[str] = None) -> PromptConstruido:
+        return construir_prompt(Personalidad.INSTRUCCIONES, contexto, consulta, Personalidad.PRESUPUESTO_CONTEXTO)
+
     @staticmethod
-    def get_instructions(contexto: Optional[Dict] = None) -> str:
-        base = (
-            "Eres SoonBot, experto en criptomonedas con un tono profesional pero cercano. "
-            "Características:\n"
-            "- Usa emojis relevantes (🚀 para oportunidades, ⚠️ para riesgos)\n"
-            "- Sé conciso (máximo 2-3 frases)\n"
-            "- Proporciona análisis útiles pero simples\n"
-            "- Mantén un estilo conversacional"
-        )
-        if contexto:
-            return f"{base}\n\nContexto actual:\n{str(contexto)}"
-        return base
+    def get_instructions(contexto: Contexto = None, consulta: Optional[str] = None) -> str:
+        return Personalidad.construir_instrucciones(contexto, consulta).texto
 
     @staticmethod
     def generar_opinion_cripto(moneda: str, datos: Dict) -> str:
@@ -0,0 +1,88 @@
+import re
+from typing import Dict, List, NamedTuple, Optional, Union
+from src.utils.keyword_matcher import normalizar
+from src.utils.tokens import contar_tokens
+
+Contexto = Union[Dict, str, None]
+
+class PromptConstruido(NamedTuple):
+    texto: str
+    tokens: int
+    tokens_contexto: int
+    incluidas: int
+    descartadas: int
+
+def _formatear_numero(valor: float) -> str:
+    if abs(valor) >= 1:
+        return f"{valor:,.2f}"
+    return f"{valor:.8f}".rstrip("0").rstrip(".")
+
+def serializar_entrada(clave: str, valor) -> str:
+    """Una línea compacta por entrada: 'BTC (Bitcoin) 67,123.45 USD +1.20% 24h @15/05 10:30'"""
+    if isinstance(valor, dict) and "precio" in valor:
+        simbolo = (valor.get("simbolo") or valor.get("symbol") or clave).upper()
+        nombre = valor.get("nombre")
+        partes = [f"{simbolo} ({nombre})" if nombre and nombre.upper() != simbolo else simbolo]
+        partes.append(f"{_formatear_numero(float(valor['precio']))} USD")
+        if valor.get("cambio_24h") is not None:
+            partes.append(f"{float(valor['cambio_24h']):+.2f}% 24h")
+        if valor.get("ultima_actualizacion"):
+            partes.append(f"@{valor['ultima_actualizacion']}")
+        return " ".join(partes)
+    if isinstance(valor, dict):
+        campos = "; ".join(f"{k}={v}" for k, v in valor.items() if v not in (None, "", [], {}))
+        return f"{clave}: {campos}"
+    return f"{clave}: {valor}"
+
+def _recortar(texto: str, max_tokens: int) -> str:
+    tokens = contar_tokens(texto)
+    if tokens <= max_tokens:
+        return texto
+    return texto[:max(0, len(texto) * max_tokens // tokens - 1)].rstrip() + "…"
+
+def _terminos(clave: str, valor) -> List[str]:
+    terminos = [clave]
+    if isinstance(valor, dict):
+        terminos += [str(valor[k]) for k in ("simbolo", "symbol", "nombre") if valor.get(k)]
+    return [normalizar(t) for t in terminos]
+
+def construir_prompt(
+    base: str,
+    contexto: Contexto = None,
+    consulta: Optional[str] = None,
+    presupuesto: int = 300
+) -> PromptConstruido:
+    """
+    Añade al prompt base el contexto serializado en líneas compactas, sin
+    pasar de `presupuesto` tokens. Primero van las entradas que la consulta
+    menciona y después las más recientes (las últimas del diccionario).
+    """
+    if not contexto:
+        return PromptConstruido(base, contar_tokens(base), 0, 0, 0)
+
+    if isinstance(contexto, str):
+        lineas = [_recortar(contexto.strip(), presupuesto)]
+        descartadas = 0
+    else:
+        consulta_norm = normalizar(consulta or "")
+        palabras = set(re.findall(r"\w+", consulta_norm))
+
+        def mencionada(entrada) -> bool:
+            return any(t in palabras or (" " in t and t in consulta_norm) for t in _terminos(*entrada))
+
+        entradas = list(contexto.items())
+        # (mencionada, posición): las mencionadas primero, luego de la más nueva a la más vieja
+        orden = sorted(range(len(entradas)), key=lambda i: (mencionada(entradas[i]), i), reverse=True)
+        lineas, usados = [], 0
+        for i in orden:
+            linea = "- " + serializar_entrada(*entradas[i])
+            coste = contar_tokens(linea) + 1
+            if usados + coste > presupuesto:
+                continue
+            lineas.append(linea)
+            usados += coste
+        descartadas = len(entradas) - len(lineas)
+
+    bloque = "\n".join(lineas)
+    texto = f"{base}\n\nContexto actual:\n{bloque}" if bloque else base
+    return PromptConstruido(texto, contar_tokens(texto), contar_tokens(bloque), len(lineas), descartadas)
@@ -0,0 +1,57 @@
+import asyncio
+import time
+from typing import Optional
+
+
+class AsyncTokenBucket:
+    """Limitador token-bucket awaitable, pensado para el event loop de asyncio.
+
+    Cada `acquire()` consume un token; si no hay, el llamador queda en espera
+    (con `asyncio.sleep`, sin bloquear el loop) hasta que le toque su turno.
+    Los turnos se reservan en orden de llegada, así que no hace falta un lock.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1, min_rate: Optional[float] = None):
+        self._base_rate = rate
+        self._min_rate = min_rate if min_rate is not None else rate
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """Consume tokens solo si están disponibles ahora mismo"""
+        self._refill()
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return True
+        return False
+
+    async def acquire(self, tokens: float = 1) -> None:
+        """Espera hasta que haya tokens disponibles y los consume"""
+        self._refill()
+        self._tokens -= tokens
+        if self._tokens >= 0:
+            return
+        try:
+            await asyncio.sleep(-self._tokens / self.rate)
+        except asyncio.CancelledError:
+            # Devolvemos el turno reservado para no penalizar a los demás
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + tokens)
+            raise
+
+    def penalizar(self, factor: float = 2) -> None:
+        """Reduce la tasa tras un 429 (backoff exponencial hasta `min_rate`)"""
+        self._refill()
+        self.rate = max(self._min_rate, self.rate / factor)
+
+    def recuperar(self, factor: float = 0.9) -> None:
+        """Recupera gradualmente la tasa base tras respuestas correctas"""
+        self._refill()
+        self.rate = min(self._base_rate, self.rate / factor)
@@ -0,0 +1,200 @@
+import asyncio
+import math
+import time
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Union
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+from src.config import logger
+from src.utils.cache import LRUCache
+from src.utils.rate_limiter import AsyncTokenBucket
+
+# rate_limit_args para los envíos: los mensajes agrupables pueden salir unidos a
+# otros del mismo chat. Las ediciones intermedias del streaming nunca hacen cola:
+# si el chat no tiene un token libre ahora mismo (o Telegram pide esperar) reciben
+# RetryAfter y se saltan ese fotograma, sin retrasar las respuestas nuevas
+AGRUPABLE = {"agrupable": True}
+EDICION_INTERMEDIA = {"reintentos": 0, "sin_espera": True}
+
+SEPARADOR = "\n\n"
+LIMITE_AGRUPADO = 4000
+# Endpoints que Telegram cuenta contra el límite de cada chat
+_POR_CHAT = ("send", "edit", "copyMessage", "forwardMessage")
+_SIN_LIMITE_CHAT = {"sendChatAction"}
+
+JSON = Union[bool, Dict[str, Any], List[Dict[str, Any]]]
+
+class _Chat:
+    __slots__ = ("bucket", "pausa_hasta")
+
+    def __init__(self, bucket: AsyncTokenBucket):
+        self.bucket = bucket
+        self.pausa_hasta = 0.0
+
+class _Lote:
+    """Mensajes agrupables que esperan el mismo turno del chat"""
+    __slots__ = ("firma", "textos", "tarea")
+
+    def __init__(self, firma: str, texto: str):
+        self.firma = firma
+        self.textos = [texto]
+        self.tarea: Optional[asyncio.Task] = None
+
+    def admite(self, firma: str, texto: str) -> bool:
+        largo = sum(len(t) for t in self.textos) + len(SEPARADOR) * len(self.textos) + len(texto)
+        return firma == self.firma and largo <= LIMITE_AGRUPADO
+
+class LimitadorEnvios(BaseRateLimiter[Dict[str, Any]]):
+    """
+    Cola de salida hacia Telegram (se engancha con `Application.builder().rate_limiter`):
+    token bucket global y otro por chat (más estricto en grupos), espera
+    automática ante RetryAfter y unión de mensajes agrupables que coinciden
+    en la cola del mismo chat con los mismos parámetros.
+    """
+
+    def __init__(self, por_segundo: float = 30, grupo_por_minuto: float = 20,
+                 privado_por_segundo: float = 1, rafaga_chat: int = 3,
+                 max_reintentos: int = 3, max_chats: int = 10000):
+        self._global = AsyncTokenBucket(por_segundo, capacity=por_segundo)
+        self.tasa_grupo = grupo_por_minuto / 60
+        self.tasa_privado = privado_por_segundo
+        self.rafaga_chat = rafaga_chat
+        self.max_reintentos = max_reintentos
+        # Un chat inactivo más tiempo del que tarda en llenar su bucket equivale a uno nuevo
+        self._chats = LRUCache(max_size=max_chats, ttl=rafaga_chat / min(self.tasa_grupo, self.tasa_privado))
+        self._lotes: Dict[Any, _Lote] = {}
+        self._pausa_global = 0.0
+        self.enviados = 0
+        self.agrupados = 0
+        self.flood_waits = 0
+        self.en_espera = 0
+        self.saltados = 0
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    @staticmethod
+    def _es_grupo(chat_id) -> bool:
+        # Los grupos y canales tienen id negativo; "@canal" también cuenta como grupo
+        return not isinstance(chat_id, int) or chat_id < 0
+
+    def _chat(self, chat_id) -> _Chat:
+        chat = self._chats.peek(chat_id)
+        if chat is None:
+            tasa = self.tasa_grupo if self._es_grupo(chat_id) else self.tasa_privado
+            chat = _Chat(AsyncTokenBucket(tasa, capacity=self.rafaga_chat))
+        self._chats.set(chat_id, chat)
+        return chat
+
+    async def _turno(self, chat: Optional[_Chat]) -> None:
+        """Espera las pausas por flood control y consume un token del chat y otro global"""
+        self.en_espera += 1
+        try:
+            while True:
+                pausa = max(self._pausa_global, chat.pausa_hasta if chat else 0.0) - time.monotonic()
+                if pausa <= 0:
+                    break
+                await asyncio.sleep(pausa)
+            if chat:
+                await chat.bucket.acquire()
+            await self._global.acquire()
+        finally:
+            self.en_espera -= 1
+
+    def _turno_inmediato(self, chat: Optional[_Chat]) -> None:
+        """Como `_turno` pero sin esperar el token del chat: si no hay, RetryAfter"""
+        pausa = max(self._pausa_global, chat.pausa_hasta if chat else 0.0) - time.monotonic()
+        if pausa > 0:
+            raise RetryAfter(math.ceil(pausa))
+        if chat and not chat.bucket.try_acquire():
+            self.saltados += 1
+            raise RetryAfter(math.ceil(1 / chat.bucket.rate))
+
+    async def _enviar(self, callback: Callable[..., Coroutine[Any, Any, JSON]], args: Any,
+                      kwargs: Dict[str, Any], chat: Optional[_Chat], reintentos: int,
+                      con_turno: bool = False) -> JSON:
+        intento = 0
+        while True:
+            if not con_turno:
+                await self._turno(chat)
+            con_turno = False
+            try:
+                resultado = await callback(*args, **kwargs)
+                self.enviados += 1
+                return resultado
+            except RetryAfter as e:
+                self.flood_waits += 1
+                # Telegram indica a quién frenar: el chat si lo hay; si no, todo el bot
+                hasta = time.monotonic() + e.retry_after
+                if chat:
+                    chat.pausa_hasta = max(chat.pausa_hasta, hasta)
+                else:
+                    self._pausa_global = max(self._pausa_global, hasta)
+                if intento >= reintentos:
+                    raise
+                intento += 1
+                logger.warning(f"⏳ Flood control de Telegram: reintento {intento} en {e.retry_after}s")
+
+    async def _enviar_lote(self, lote: _Lote, chat_id, callback, args, kwargs, chat: _Chat, reintentos: int) -> JSON:
+        try:
+            await self._turno(chat)
+        finally:
+            # El lote se cierra al conseguir turno: lo que llegue después va en otro mensaje
+            if self._lotes.get(chat_id) is lote:
+                del self._lotes[chat_id]
+        args[1]["text"] = SEPARADOR.join(lote.textos)
+        return await self._enviar(callback, args, kwargs, chat, reintentos, con_turno=True)
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, JSON]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[Dict[str, Any]],
+    ) -> JSON:
+        opciones = rate_limit_args or {}
+        reintentos = opciones.get("reintentos", self.max_reintentos)
+        chat_id = data.get("chat_id")
+        por_chat = chat_id is not None and endpoint.startswith(_POR_CHAT) and endpoint not in _SIN_LIMITE_CHAT
+        chat = self._chat(chat_id) if por_chat else None
+
+        if opciones.get("sin_espera"):
+            self._turno_inmediato(chat)
+            # El token global se espera: se recarga a 30/s y nunca acumula cola larga
+            await self._global.acquire()
+            return await self._enviar(callback, args, kwargs, chat, reintentos, con_turno=True)
+
+        texto = data.get("text")
+        if not (chat and opciones.get("agrupable") and endpoint == "sendMessage"
+                and isinstance(texto, str) and "reply_markup" not in data and "entities" not in data):
+            if chat:
+                # Cualquier otro envío al chat cierra el lote abierto para no alterar el orden
+                self._lotes.pop(chat_id, None)
+            return await self._enviar(callback, args, kwargs, chat, reintentos)
+
+        firma = repr(sorted((k, v) for k, v in data.items() if k != "text"))
+        lote = self._lotes.get(chat_id)
+        if lote is not None and lote.admite(firma, texto):
+            lote.textos.append(texto)
+            self.agrupados += 1
+        else:
+            lote = self._lotes[chat_id] = _Lote(firma, texto)
+            lote.tarea = asyncio.create_task(
+                self._enviar_lote(lote, chat_id, callback, args, kwargs, chat, reintentos)
+            )
+        # Todos los participantes reciben el mismo mensaje; cancelar a uno no cancela el envío
+        return await asyncio.shield(lote.tarea)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enviados": self.enviados,
+            "agrupados": self.agrupados,
+            "flood_waits": self.flood_waits,
+            "en_espera": self.en_espera,
+            "ediciones_saltadas": self.saltados,
+            "chats_activos": len(self._chats),
+        }
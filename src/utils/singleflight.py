@@ -0,0 +1,34 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Coalesce llamadas concurrentes con la misma clave en una sola ejecución.
+
+    Mientras haya una petición en vuelo para `key`, los demás llamadores
+    esperan ese mismo resultado (o reciben la misma excepción) en lugar de
+    lanzar su propia petición upstream.
+    """
+
+    def __init__(self):
+        self._en_vuelo: Dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._en_vuelo)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._en_vuelo.get(key)
+        # Una tarea ya terminada cuyo callback de limpieza aún no corrió no cuenta como en vuelo
+        if task is None or task.done():
+            task = asyncio.ensure_future(fn())
+            self._en_vuelo[key] = task
+            task.add_done_callback(lambda t, key=key: self._liberar(key, t))
+        # shield: si un llamador se cancela, la petición compartida sigue para el resto
+        return await asyncio.shield(task)
+
+    def _liberar(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._en_vuelo.get(key) is task:
+            del self._en_vuelo[key]
+        if not task.cancelled():
+            # Evita el aviso "exception was never retrieved" si nadie la esperó
+            task.exception()
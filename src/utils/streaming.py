@@ -0,0 +1,109 @@
+import asyncio
+import time
+from typing import AsyncIterator, Optional
+from telegram import Message
+from telegram.constants import ChatType
+from telegram.error import BadRequest, RetryAfter
+from src.config import logger
+from src.utils.send_limiter import AGRUPABLE, EDICION_INTERMEDIA
+
+PLACEHOLDER = "✍️ ..."
+CURSOR = " ▌"
+LIMITE_MENSAJE = 4000
+# Telegram tolera ~1 edición/s en privado; en grupos el límite es ~20 mensajes/min
+INTERVALO_PRIVADO = 1.0
+INTERVALO_GRUPO = 3.0
+
+
+def dividir_mensaje(text: str, limit: int = LIMITE_MENSAJE) -> list:
+    """Parte un texto largo en trozos de hasta `limit` caracteres, preferiblemente en saltos de línea"""
+    chunks = []
+    while len(text) > limit:
+        split_at = text.rfind('\n', 0, limit)
+        if split_at == -1:
+            split_at = limit
+        chunks.append(text[:split_at])
+        text = text[split_at:].lstrip()
+    chunks.append(text)
+    return chunks
+
+async def _editar(mensaje: Message, texto: str, parse_mode: Optional[str] = None, **kwargs) -> None:
+    try:
+        await mensaje.edit_text(texto, parse_mode=parse_mode, **kwargs)
+    except BadRequest as e:
+        if "not modified" in str(e).lower():
+            return
+        if parse_mode:
+            # Markdown inválido (habitual en texto generado): se reintenta como texto plano
+            await mensaje.edit_text(texto, **kwargs)
+        else:
+            raise
+
+async def responder_con_formato(message: Message, texto: str, parse_mode: Optional[str] = None, **kwargs) -> Message:
+    """reply_text con `parse_mode` y, si Telegram rechaza el formato, el mismo texto sin formato"""
+    try:
+        return await message.reply_text(texto, parse_mode=parse_mode, **kwargs)
+    except BadRequest:
+        if not parse_mode:
+            raise
+        return await message.reply_text(texto, **kwargs)
+
+async def responder_en_streaming(
+    message: Message,
+    fragmentos: AsyncIterator[str],
+    prefijo: str = "",
+    sufijo: str = "",
+    parse_mode: Optional[str] = None,
+    **kwargs
+) -> str:
+    """
+    Publica un mensaje provisional y lo va editando con el texto que llega.
+
+    Las ediciones intermedias van sin formato y espaciadas según el tipo de
+    chat; la edición final aplica `parse_mode` y, si el texto no cabe en un
+    mensaje, el resto se envía en mensajes adicionales. Devuelve el texto
+    generado (sin prefijo ni sufijo).
+    """
+    placeholder = await message.reply_text(prefijo + PLACEHOLDER, **kwargs)
+    intervalo = INTERVALO_GRUPO if message.chat.type in (ChatType.GROUP, ChatType.SUPERGROUP) else INTERVALO_PRIVADO
+
+    generado = ""
+    mostrado = ""
+    proxima_edicion = 0.0  # la primera edición sale en cuanto llega el primer fragmento
+    try:
+        async for fragmento in fragmentos:
+            generado += fragmento
+            texto = prefijo + generado
+            if len(texto) > LIMITE_MENSAJE or time.monotonic() < proxima_edicion or texto == mostrado:
+                continue
+            try:
+                # Sin hueco en el límite del chat (o si Telegram pide esperar) esta edición
+                # se salta: ya llegará la siguiente, y las respuestas nuevas no esperan detrás
+                await _editar(placeholder, texto + CURSOR, rate_limit_args=EDICION_INTERMEDIA, **kwargs)
+                mostrado = texto
+                proxima_edicion = time.monotonic() + intervalo
+            except RetryAfter as e:
+                proxima_edicion = time.monotonic() + e.retry_after
+            except BadRequest as e:
+                logger.warning(f"No se pudo editar el mensaje en streaming: {e}")
+                proxima_edicion = time.monotonic() + intervalo
+    finally:
+        # Si algo falla a mitad, el generador se cierra ya y libera su turno de OpenAI
+        # (equivale a contextlib.aclosing, que no existe en Python 3.9)
+        aclose = getattr(fragmentos, "aclose", None)
+        if aclose:
+            await aclose()
+
+    final = prefijo + generado + sufijo or "⚠️ Sin respuesta."
+    partes = dividir_mensaje(final)
+    for intento in range(2):
+        try:
+            await _editar(placeholder, partes[0], parse_mode=parse_mode, **kwargs)
+            break
+        except RetryAfter as e:
+            if intento:
+                raise
+            await asyncio.sleep(e.retry_after)
+    for parte in partes[1:]:
+        await responder_con_formato(message, parte, parse_mode, rate_limit_args=AGRUPABLE, **kwargs)
+    return generado
@@ -0,0 +1,48 @@
+import re
+from typing import List
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken es opcional
+    _encoding = None
+
+_ORACIONES = re.compile(r"(?<=[.!?¿¡])\s+")
+
+def contar_tokens(texto: str) -> int:
+    """Tokens según tiktoken si está instalado; si no, una estimación conservadora"""
+    if _encoding is not None:
+        return len(_encoding.encode(texto))
+    # ~4 caracteres por token en inglés, algo menos en español: se toma el mayor de ambos criterios
+    return max(len(texto) // 4, int(len(texto.split()) * 1.4))
+
+def _piezas(texto: str, max_tokens: int) -> List[str]:
+    """Párrafos, y si alguno no cabe, sus oraciones o, en último caso, grupos de palabras"""
+    piezas = []
+    for parrafo in filter(None, (p.strip() for p in texto.split("\n"))):
+        if contar_tokens(parrafo) <= max_tokens:
+            piezas.append(parrafo)
+            continue
+        for oracion in _ORACIONES.split(parrafo):
+            if contar_tokens(oracion) <= max_tokens:
+                piezas.append(oracion)
+                continue
+            palabras = oracion.split()
+            # Grupos de palabras proporcionales a la densidad de tokens de la oración, con margen
+            paso = max(1, int(0.9 * max_tokens * len(palabras) / contar_tokens(oracion)))
+            piezas.extend(" ".join(palabras[i:i + paso]) for i in range(0, len(palabras), paso))
+    return piezas
+
+def dividir_en_trozos(texto: str, max_tokens: int) -> List[str]:
+    """Agrupa el texto en trozos de hasta `max_tokens`, cortando por párrafos u oraciones"""
+    trozos, actual, usados = [], [], 0
+    for pieza in _piezas(texto, max_tokens):
+        n = contar_tokens(pieza) + 1
+        if actual and usados + n > max_tokens:
+            trozos.append("\n".join(actual))
+            actual, usados = [], 0
+        actual.append(pieza)
+        usados += n
+    if actual:
+        trozos.append("\n".join(actual))
+    return trozos
@@ -0,0 +1,181 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Set
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+from src.config import logger
+from src.utils.admission import CARA, ControlAdmision
+
+class _Carril:
+    __slots__ = ("lock", "pendientes")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.pendientes = 0
+
+class ChatUpdateProcessor(BaseUpdateProcessor):
+    """
+    Procesa updates en paralelo entre conversaciones y en orden dentro de cada
+    una. La clave es (chat, usuario): en el grupo cada usuario avanza a su ritmo
+    y flujos como /post -> confirmar nunca se adelantan.
+
+    El semáforo de PTB envuelve todo `do_process_update`, así que un update que
+    espera su turno en el carril ocuparía un hueco global. Por eso a PTB se le
+    pasa un tope alto y el límite real (`limite`) se toma ya dentro del carril.
+
+    Con `admision`, los updates que acaban en la IA van además por un carril
+    caro con su propio tope (`limite_caro` < `limite`), de modo que las
+    consultas baratas siempre tienen hueco, y se descartan al llegar si la
+    admisión los rechaza (`al_rechazar` envía la respuesta de "ocupado").
+    El trabajo de IA que surge dentro de un handler barato (la opinión de
+    /precio sin caché) pasa por `admitir_caro` y se ejecuta con `lanzar_caro`
+    fuera del carril barato.
+    """
+
+    def __init__(self, limite: int = 16, limite_caro: Optional[int] = None,
+                 admision: Optional[ControlAdmision] = None,
+                 al_rechazar: Optional[Callable[[object, str], Awaitable]] = None):
+        super().__init__(max_concurrent_updates=2 ** 16)
+        self.limite = limite
+        self.limite_caro = limite_caro or max(1, limite // 2)
+        self.admision = admision
+        self.al_rechazar = al_rechazar
+        self._global = asyncio.BoundedSemaphore(limite)
+        self._caro = asyncio.BoundedSemaphore(self.limite_caro)
+        self.caros_pendientes = 0
+        self.rechazados = 0
+        self._en_segundo_plano: Set[asyncio.Task] = set()
+        self._carriles: Dict[Hashable, _Carril] = {}
+        self.en_cola = 0
+        self.en_proceso = 0
+        self.procesados = 0
+        self.max_en_cola = 0
+        self.espera_total = 0.0
+
+    @staticmethod
+    def clave(update: object) -> Optional[Hashable]:
+        if not isinstance(update, Update):
+            return None
+        chat = update.effective_chat.id if update.effective_chat else None
+        usuario = update.effective_user.id if update.effective_user else None
+        if chat is None and usuario is None:
+            return None
+        return (chat, usuario)
+
+    async def do_process_update(self, update: object, coroutine: Awaitable) -> None:
+        caro = self.admision is not None and self.admision.clasificar(update) == CARA
+        if caro:
+            motivo = self.admision.admitir(update, self.caros_pendientes)
+            if motivo:
+                # Se decide al llegar, antes de hacer cola: el rechazo es inmediato
+                coroutine.close()
+                self.rechazados += 1
+                if self.al_rechazar:
+                    await self.al_rechazar(update, motivo)
+                return
+            self.caros_pendientes += 1
+        await self._procesar(update, coroutine, caro)
+
+    async def _procesar(self, update: object, coroutine: Awaitable, caro: bool) -> None:
+        clave = self.clave(update)
+        carril = None
+        if clave is not None:
+            carril = self._carriles.get(clave)
+            if carril is None:
+                carril = self._carriles[clave] = _Carril()
+            carril.pendientes += 1
+
+        inicio = time.monotonic()
+        self.en_cola += 1
+        self.max_en_cola = max(self.max_en_cola, self.en_cola)
+        iniciado = False
+        try:
+            if carril is not None:
+                await carril.lock.acquire()
+            try:
+                if caro:
+                    await self._caro.acquire()
+                try:
+                    async with self._global:
+                        self.en_cola -= 1
+                        iniciado = True
+                        self.espera_total += time.monotonic() - inicio
+                        self.en_proceso += 1
+                        try:
+                            await coroutine
+                        finally:
+                            self.en_proceso -= 1
+                            self.procesados += 1
+                finally:
+                    if caro:
+                        self._caro.release()
+            finally:
+                if carril is not None:
+                    carril.lock.release()
+        finally:
+            if caro:
+                self.caros_pendientes -= 1
+            if not iniciado:
+                # Cancelado mientras esperaba turno: la corrutina nunca llegó a ejecutarse
+                self.en_cola -= 1
+                coroutine.close()
+            if carril is not None:
+                carril.pendientes -= 1
+                if carril.pendientes == 0:
+                    del self._carriles[clave]
+
+    def admitir_caro(self, update: object) -> Optional[str]:
+        """Admisión para trabajo de IA que surge dentro de un handler barato: None si se acepta"""
+        if self.admision is None:
+            return None
+        motivo = self.admision.admitir(update, self.caros_pendientes)
+        if motivo:
+            self.rechazados += 1
+        return motivo
+
+    def lanzar_caro(self, coroutine: Awaitable) -> asyncio.Task:
+        """
+        Ejecuta en segundo plano, con el tope del carril caro, trabajo ya admitido
+        con `admitir_caro`: el handler barato termina y libera su hueco sin esperarlo.
+        """
+        self.caros_pendientes += 1
+        tarea = asyncio.create_task(self._caro_en_segundo_plano(coroutine))
+        self._en_segundo_plano.add(tarea)
+        tarea.add_done_callback(self._en_segundo_plano.discard)
+        return tarea
+
+    async def _caro_en_segundo_plano(self, coroutine: Awaitable) -> None:
+        iniciado = False
+        try:
+            async with self._caro:
+                iniciado = True
+                await coroutine
+        except Exception as e:
+            logger.error(f"❌ Error en tarea de IA en segundo plano: {e}")
+        finally:
+            self.caros_pendientes -= 1
+            if not iniciado:
+                coroutine.close()
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        for tarea in list(self._en_segundo_plano):
+            tarea.cancel()
+        await asyncio.gather(*self._en_segundo_plano, return_exceptions=True)
+
+    def stats(self) -> Dict:
+        return {
+            "limite": self.limite,
+            "en_proceso": self.en_proceso,
+            "en_cola": self.en_cola,
+            "max_en_cola": self.max_en_cola,
+            "conversaciones_activas": len(self._carriles),
+            "procesados": self.procesados,
+            "espera_media_s": round(self.espera_total / (self.procesados or 1), 3),
+            "limite_caro": self.limite_caro,
+            "caros_pendientes": self.caros_pendientes,
+            "rechazados": self.rechazados,
+            **({f"rechazos_{m}": n for m, n in self.admision.rechazos.items()} if self.admision else {}),
+        }
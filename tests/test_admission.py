@@ -0,0 +1,153 @@
+import asyncio
+import pytest
+from datetime import datetime
+from types import SimpleNamespace
+from telegram import Chat, Message, MessageEntity, Update, User
+from src.config import GROUP_ID, TOPIC_ID
+from src.utils.admission import BARATA, CARA, ControlAdmision, clasificar_update
+from src.utils.update_processor import ChatUpdateProcessor
+
+
+def update(texto, user_id=10, update_id=1, chat_id=GROUP_ID):
+    if texto.startswith("/"):
+        entidad = MessageEntity(MessageEntity.BOT_COMMAND, 0, len(texto.split()[0]))
+    elif texto.startswith("@soonbot"):
+        entidad = MessageEntity(MessageEntity.MENTION, 0, len("@soonbot"))
+    entidades = [entidad] if texto[0] in "/@" else []
+    msg = Message(
+        message_id=update_id, date=datetime.now(), chat=Chat(chat_id, Chat.SUPERGROUP),
+        from_user=User(user_id, "u", False), text=texto, entities=entidades, message_thread_id=TOPIC_ID
+    )
+    msg.set_bot(SimpleNamespace(username="SoonBot"))
+    return Update(update_id=update_id, message=msg)
+
+def control(**kwargs):
+    opciones = dict(tasa_usuario=0.001, rafaga_usuario=2, tasa_chat=0.001, rafaga_chat=100, max_backlog=100)
+    opciones.update(kwargs)
+    return ControlAdmision(**opciones)
+
+@pytest.mark.parametrize("texto,carril", [
+    ("/precio btc", BARATA),
+    ("/resumen_url https://ejemplo.com", CARA),
+    ("/resumen_texto@SoonBot hola", CARA),
+    ("@soonbot a cuánto está el btc", BARATA),
+    ("@soonbot qué opinas del mercado", CARA),
+    # Intención de precio sin moneda: el handler no encuentra qué cotizar y pregunta a la IA
+    ("@soonbot cómo está el mercado hoy, qué opinas del halving?", CARA),
+    ("@soonbot qué valor aporta la IA a las finanzas", CARA),
+    ("charla del grupo sin mención", BARATA),
+])
+def test_clasificacion(texto, carril):
+    assert clasificar_update(update(texto)) == carril
+
+def test_otros_chats_no_cuentan_como_caros():
+    assert clasificar_update(update("/resumen_url https://ejemplo.com", chat_id=GROUP_ID - 1)) == BARATA
+
+def test_buckets_por_usuario_y_por_chat():
+    admision = control(rafaga_chat=3)
+
+    assert admision.admitir(update("@soonbot hola", user_id=1)) is None
+    assert admision.admitir(update("@soonbot hola", user_id=1)) is None
+    assert admision.admitir(update("@soonbot hola", user_id=1)) == "usuario"
+    # Otro usuario tiene su propio bucket, pero el chat ya está al límite
+    assert admision.admitir(update("@soonbot hola", user_id=2)) is None
+    assert admision.admitir(update("@soonbot hola", user_id=3)) == "chat"
+    assert admision.rechazos == {"ocupado": 0, "usuario": 1, "chat": 1}
+
+def test_backlog_de_ia_rechaza_al_momento():
+    en_cola = 0
+    admision = control(max_backlog=3, backlog_externo=lambda: en_cola)
+
+    assert admision.admitir(update("@soonbot hola"), pendientes=2) is None
+    en_cola = 1
+    assert admision.admitir(update("@soonbot hola", user_id=2), pendientes=2) == "ocupado"
+
+@pytest.mark.asyncio
+async def test_carril_caro_no_bloquea_consultas_de_precio():
+    rechazos = []
+
+    async def al_rechazar(upd, motivo):
+        rechazos.append((upd.update_id, motivo))
+
+    procesador = ChatUpdateProcessor(
+        limite=3, limite_caro=1, admision=control(max_backlog=2, rafaga_usuario=5), al_rechazar=al_rechazar
+    )
+    liberar = asyncio.Event()
+    atendidos = []
+
+    async def manejar(nombre, esperar=False):
+        atendidos.append(nombre)
+        if esperar:
+            await liberar.wait()
+
+    caros = [
+        asyncio.create_task(procesador.process_update(
+            update("@soonbot analiza el mercado", user_id=i, update_id=i), manejar(f"ia{i}", esperar=True)))
+        for i in range(3)
+    ]
+    await asyncio.sleep(0.01)
+    # Un caro en proceso y otro en cola: el tercero supera el backlog y se rechaza sin esperar
+    assert atendidos == ["ia0"]
+    assert rechazos == [(2, "ocupado")]
+
+    # Una consulta de precio pasa aunque el carril caro esté lleno
+    await procesador.process_update(update("@soonbot precio btc", user_id=9, update_id=9), manejar("precio"))
+    assert atendidos == ["ia0", "precio"]
+
+    liberar.set()
+    await asyncio.gather(*caros)
+    assert atendidos == ["ia0", "precio", "ia1"]
+    stats = procesador.stats()
+    assert stats["rechazados"] == 1 and stats["rechazos_ocupado"] == 1 and stats["caros_pendientes"] == 0
+
+@pytest.mark.asyncio
+async def test_opinion_de_precio_sin_cache_pasa_por_la_admision(monkeypatch):
+    from unittest.mock import AsyncMock, MagicMock
+    from src.handlers import crypto
+
+    monkeypatch.setattr(crypto.crypto_mapper, "maybe_refresh_list", AsyncMock())
+    monkeypatch.setattr(crypto.crypto_mapper, "find_coin", lambda texto: "bitcoin")
+    monkeypatch.setattr(crypto.CoinGeckoAPI, "obtener_precio", AsyncMock(return_value={
+        "nombre": "Bitcoin", "simbolo": "btc", "precio": 65000.0, "cambio_24h": 1.5,
+    }))
+    monkeypatch.setattr(crypto.opinion_cache, "get", lambda clave: None)
+
+    def sin_ia(*args, **kwargs):
+        raise AssertionError("la opinión no admitida no debe llegar a la IA")
+    monkeypatch.setattr(crypto, "generar_respuesta_ia_stream", sin_ia)
+
+    procesador = ChatUpdateProcessor(limite=4, admision=control(max_backlog=0))
+    mensaje = MagicMock()
+    mensaje.reply_text = AsyncMock()
+    upd = SimpleNamespace(message=mensaje, effective_chat=SimpleNamespace(id=GROUP_ID),
+                          effective_user=SimpleNamespace(id=10))
+    context = SimpleNamespace(
+        args=["btc"], bot=SimpleNamespace(send_chat_action=AsyncMock()),
+        application=SimpleNamespace(update_processor=procesador)
+    )
+
+    await crypto.precio_cripto(upd, context)
+
+    # Con el backlog lleno sale el precio con el aviso de "ocupado", sin tarea de IA
+    texto = mensaje.reply_text.call_args.args[0]
+    assert "65,000.00" in texto and "atendiendo muchas consultas" in texto
+    assert procesador.stats()["rechazos_ocupado"] == 1
+    assert procesador.caros_pendientes == 0
+
+@pytest.mark.asyncio
+async def test_trabajo_caro_lanzado_desde_un_handler_respeta_su_tope():
+    procesador = ChatUpdateProcessor(limite=4, limite_caro=1)
+    liberar = asyncio.Event()
+    atendidos = []
+
+    async def opinar(nombre):
+        atendidos.append(nombre)
+        await liberar.wait()
+
+    tareas = [procesador.lanzar_caro(opinar(f"ia{i}")) for i in range(2)]
+    await asyncio.sleep(0.01)
+    assert atendidos == ["ia0"] and procesador.caros_pendientes == 2
+
+    liberar.set()
+    await asyncio.gather(*tareas)
+    assert atendidos == ["ia0", "ia1"] and procesador.caros_pendientes == 0
@@ -0,0 +1,45 @@
+import asyncio
+import pytest
+from src.utils.batcher import MicroBatcher
+
+
+@pytest.mark.asyncio
+async def test_ids_de_la_misma_ventana_van_en_un_solo_lote():
+    lotes = []
+
+    async def fetch_many(ids):
+        lotes.append(sorted(ids))
+        return {i: {"usd": len(i)} for i in ids if i != "desconocido"}
+
+    batcher = MicroBatcher(fetch_many, ventana=0.01, max_lote=50)
+    ids = ["bitcoin", "pepe", "bitcoin", "solana", "desconocido"]
+    resultados = await asyncio.gather(*(batcher.submit(i) for i in ids))
+
+    assert lotes == [["bitcoin", "desconocido", "pepe", "solana"]]
+    assert resultados == [{"usd": 7}, {"usd": 4}, {"usd": 7}, {"usd": 6}, None]
+
+@pytest.mark.asyncio
+async def test_lote_lleno_se_envia_sin_esperar_la_ventana():
+    lotes = []
+
+    async def fetch_many(ids):
+        lotes.append(len(ids))
+        return {i: i for i in ids}
+
+    batcher = MicroBatcher(fetch_many, ventana=10, max_lote=3)
+    resultados = await asyncio.wait_for(
+        asyncio.gather(*(batcher.submit(i) for i in range(3))), timeout=1
+    )
+
+    assert lotes == [3]
+    assert resultados == [0, 1, 2]
+
+@pytest.mark.asyncio
+async def test_error_del_lote_llega_a_todos():
+    async def fetch_many(ids):
+        raise ValueError("429")
+
+    batcher = MicroBatcher(fetch_many, ventana=0.01)
+    resultados = await asyncio.gather(batcher.submit("a"), batcher.submit("b"), return_exceptions=True)
+
+    assert all(isinstance(r, ValueError) for r in resultados)
@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+from src.utils import cache as cache_module
+from src.utils.cache import LRUCache
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def __call__(self):
+        return self.ahora
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = Reloj()
+    monkeypatch.setattr(cache_module, "time", SimpleNamespace(monotonic=reloj))
+    return reloj
+
+def test_lru_expulsa_la_entrada_menos_usada(reloj):
+    cache = LRUCache(max_size=2, ttl=60)
+    cache.set("bitcoin", 1)
+    cache.set("ethereum", 2)
+    cache.get("bitcoin")
+    cache.set("solana", 3)
+
+    assert "ethereum" not in cache
+    assert cache.get("bitcoin") == 1
+    assert cache.get("solana") == 3
+
+def test_ttl_por_entrada(reloj):
+    cache = LRUCache(ttl=60, stale_ttl=0)
+    cache.set("bitcoin", 1)
+    cache.set("pepe", 2, ttl=5)
+    reloj.ahora += 10
+
+    assert cache.get("bitcoin") == 1
+    assert cache.get("pepe") is None
+    assert len(cache) == 1
+
+@pytest.mark.asyncio
+async def test_stale_while_revalidate(reloj):
+    cache = LRUCache(ttl=60, stale_ttl=600)
+    llamadas = 0
+
+    async def fetch():
+        nonlocal llamadas
+        llamadas += 1
+        return llamadas
+
+    assert await cache.get_or_fetch("bitcoin", fetch) == 1
+    assert await cache.get_or_fetch("bitcoin", fetch) == 1
+
+    # Vencido pero dentro del margen stale: se sirve al instante y se refresca detrás
+    reloj.ahora += 120
+    assert await cache.get_or_fetch("bitcoin", fetch) == 1
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert cache.get("bitcoin") == 2
+
+    # Fuera del margen stale: se espera al upstream
+    reloj.ahora += 1000
+    assert await cache.get_or_fetch("bitcoin", fetch) == 3
+    assert cache.stats()["stale_hits"] == 1
+
+def test_clave_opinion_agrupa_precios_cercanos():
+    from src.services.opinion_cache import clave_opinion
+
+    prompt = "Eres un analista de mercado cripto."
+    base = clave_opinion(prompt, "bitcoin", {"precio": 67000, "cambio_24h": 1.2})
+
+    assert clave_opinion("  eres un ANALISTA de mercado cripto. ", "Bitcoin", {"precio": 67100, "cambio_24h": 1.4}) == base
+    assert clave_opinion(prompt, "bitcoin", {"precio": 68000, "cambio_24h": 1.2}) != base
+    assert clave_opinion(prompt, "bitcoin", {"precio": 67000, "cambio_24h": -3.0}) != base
+    assert clave_opinion(prompt, "ethereum", {"precio": 67000, "cambio_24h": 1.2}) != base
@@ -0,0 +1,119 @@
+import httpx
+import pytest
+from src.services.crypto_mapper import CoinIndex, CryptoMapper
+from src.utils.rate_limiter import AsyncTokenBucket
+
+COINS = [
+    {"id": "bitcoin", "symbol": "btc", "name": "Bitcoin"},
+    {"id": "pepe", "symbol": "pepe", "name": "Pepe"},
+    {"id": "dogwifcoin", "symbol": "wif", "name": "dogwifhat"},
+    {"id": "the-open-network", "symbol": "ton", "name": "Toncoin"},
+    {"id": "render-token", "symbol": "render", "name": "Render"},
+]
+
+
+@pytest.fixture
+def mapper():
+    mapper = CryptoMapper()
+    mapper._coingecko_list = COINS
+    mapper._index = CoinIndex(COINS, mapper._mapping)
+    return mapper
+
+@pytest.mark.parametrize("entrada,esperado", [
+    ("BTC", "bitcoin"),
+    ("the-open-network", "the-open-network"),
+    ("ton", "the-open-network"),
+    ("Toncoin", "the-open-network"),
+    ("dogwifhat", "dogwifcoin"),
+    ("noexiste-xyz", None),
+])
+def test_find_coin_exacto(mapper, entrada, esperado):
+    assert mapper.find_coin(entrada) == esperado
+
+@pytest.mark.parametrize("entrada,esperado", [
+    ("toncoim", "the-open-network"),
+    ("dogwifhatt", "dogwifcoin"),
+    ("rendr", "render-token"),
+    ("etherum", "ethereum"),
+])
+def test_find_coin_aproximado_devuelve_id_canonico(mapper, entrada, esperado):
+    assert mapper.find_coin(entrada) == esperado
+
+@pytest.mark.asyncio
+async def test_snapshot_y_refresco_condicional(tmp_path, monkeypatch):
+    peticiones = []
+
+    def responder(request):
+        if request.url.path.endswith("/coins/markets"):
+            return httpx.Response(200, json=[{"id": "bitcoin", "market_cap_rank": 1}])
+        peticiones.append(request)
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, json=COINS, headers={"ETag": '"v1"'})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(responder))
+    monkeypatch.setattr("src.services.crypto_mapper.get_http_client", lambda: client)
+    monkeypatch.setattr("src.services.crypto_mapper.coingecko_limiter", AsyncTokenBucket(1000, capacity=10))
+
+    snapshot = tmp_path / "coins.pkl.gz"
+    mapper = CryptoMapper(snapshot)
+    await mapper.maybe_refresh_list()
+    await mapper._refresh_task
+    assert mapper.find_coin("toncoin") == "the-open-network"
+    assert mapper._ranking == {"bitcoin": 1}
+    assert snapshot.exists()
+
+    # Un arranque nuevo carga el snapshot sin red y revalida con ETag
+    reiniciado = CryptoMapper(snapshot)
+    assert reiniciado.load_snapshot()
+    assert reiniciado.find_coin("wif") == "dogwifcoin"
+    reiniciado._last_update = None
+    await reiniciado.fetch_coingecko_list()
+    assert peticiones[-1].headers["If-None-Match"] == '"v1"'
+    assert reiniciado.find_coin("wif") == "dogwifcoin"
+
+def test_extraer_tokens_mencionados(mapper):
+    texto = "@SoonBot ¿cómo ves BTC, el precio de Toncoin y dogwifhat? también pepe y solo eso"
+
+    assert mapper.extraer_tokens_mencionados(texto) == ["bitcoin", "the-open-network", "dogwifcoin", "pepe"]
+
+def test_menciones_prefieren_frase_larga_y_filtran_palabras_comunes():
+    coins = COINS + [
+        {"id": "bitcoin-cash", "symbol": "bch", "name": "Bitcoin Cash"},
+        {"id": "harmony", "symbol": "one", "name": "Harmony"},
+        {"id": "hoy-token", "symbol": "hoy", "name": "Hoy"},
+    ]
+    index = CoinIndex(coins)
+
+    assert index.extraer_menciones("precio de bitcoin cash hoy") == ["bitcoin-cash"]
+    assert index.extraer_menciones("dame one") == []
+    assert index.extraer_menciones("dame ONE") == ["harmony"]
+
+def test_simbolo_repetido_se_resuelve_por_capitalizacion():
+    coins = [
+        {"id": "uniswap-clon", "symbol": "uni", "name": "Uni Clon"},
+        {"id": "uniswap", "symbol": "uni", "name": "Uniswap"},
+    ]
+
+    assert CoinIndex(coins).extraer_menciones("uni") == ["uniswap-clon"]
+    assert CoinIndex(coins, ranking={"uniswap": 20}).extraer_menciones("uni") == ["uniswap"]
+    assert CoinIndex(coins, ranking={"uniswap": 20}).resolve("uni") == "uniswap"
+
+@pytest.mark.asyncio
+async def test_ranking_gasta_del_presupuesto_de_coingecko(tmp_path, monkeypatch):
+    paginas = []
+
+    def responder(request):
+        paginas.append(request.url.params["page"])
+        return httpx.Response(429)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(responder))
+    limitador = AsyncTokenBucket(1000, capacity=10, min_rate=1)
+    monkeypatch.setattr("src.services.crypto_mapper.get_http_client", lambda: client)
+    monkeypatch.setattr("src.services.crypto_mapper.coingecko_limiter", limitador)
+
+    assert await CryptoMapper(tmp_path / "coins.pkl.gz")._fetch_ranking() is None
+    # La primera página consumió un token y el 429 frena también al resto de consultas
+    assert paginas == ["1"]
+    assert limitador.rate == 500
+    assert limitador._tokens < 10
@@ -0,0 +1,33 @@
+from datetime import datetime
+from types import SimpleNamespace
+from telegram import Chat, Message, MessageEntity, Update
+from src.config import GROUP_ID, TOPIC_ID
+from src.utils.filters import MentionedBotFilter, TopicFilter
+
+
+def mensaje(texto, entidades=(), chat_id=GROUP_ID, hilo=TOPIC_ID):
+    msg = Message(
+        message_id=1, date=datetime.now(), chat=Chat(chat_id, Chat.SUPERGROUP),
+        text=texto, entities=list(entidades), message_thread_id=hilo
+    )
+    msg.set_bot(SimpleNamespace(username="SoonBot"))
+    return Update(update_id=1, message=msg)
+
+def mencion(largo, offset=0):
+    return MessageEntity(MessageEntity.MENTION, offset, largo)
+
+def test_mencion_por_entidades():
+    filtro = MentionedBotFilter()
+
+    assert filtro.check_update(mensaje("@soonbot precio btc", [mencion(8)]))
+    assert not filtro.check_update(mensaje("@soonbotx hola", [mencion(9)]))
+    assert not filtro.check_update(mensaje("hola @soonbot", [mencion(8, offset=5)]))
+    assert not filtro.check_update(mensaje("@soonbot sin entidades"))
+    assert filtro.check_update(mensaje("/precio btc", [MessageEntity(MessageEntity.BOT_COMMAND, 0, 7)]))
+
+def test_topic_primero_descarta_otros_chats():
+    filtro = TopicFilter() & MentionedBotFilter()
+
+    assert filtro.check_update(mensaje("@SoonBot hola", [mencion(8)]))
+    assert not filtro.check_update(mensaje("@SoonBot hola", [mencion(8)], hilo=1))
+    assert not filtro.check_update(mensaje("@SoonBot hola", [mencion(8)], chat_id=123))
@@ -0,0 +1,42 @@
+import pytest
+from src.utils.html_extractor import BACKENDS, extraer_contenido
+
+HTML = """
+<html><head><title> Informe  semanal </title><script>var p = "<p>no</p>";</script></head>
+<body>
+  <nav><p>Inicio Mercados Noticias Contacto Ayuda Buscar</p></nav>
+  <h1>Bitcoin supera un nuevo máximo histórico esta semana</h1>
+  <p>Los analistas atribuyen la subida a la entrada de capital institucional.</p>
+  <h2>Ethereum acompaña el movimiento con fuerza renovada</h2>
+  <p>Corto</p>
+  <p>La red procesó un volumen récord de transacciones &amp; contratos.
+  <p>Sin cierre explícito, este párrafo también debe aparecer completo.</p>
+  <footer><p>Todos los derechos reservados por la empresa editora 2024</p></footer>
+</body></html>
+"""
+
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+def test_orden_del_documento_y_etiquetas_ignoradas(backend):
+    titulo, texto = extraer_contenido(HTML, backend=backend)
+
+    assert titulo == "Informe semanal"
+    assert texto.split("\n") == [
+        "Bitcoin supera un nuevo máximo histórico esta semana",
+        "Los analistas atribuyen la subida a la entrada de capital institucional.",
+        "Ethereum acompaña el movimiento con fuerza renovada",
+        "La red procesó un volumen récord de transacciones & contratos.",
+        "Sin cierre explícito, este párrafo también debe aparecer completo.",
+    ]
+
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+def test_se_detiene_al_agotar_el_presupuesto(backend):
+    _, por_bloques = extraer_contenido(HTML, max_bloques=2, backend=backend)
+    _, por_medida = extraer_contenido(HTML, max_medida=60, backend=backend)
+    _, por_palabras = extraer_contenido(HTML, max_medida=15, medir=lambda t: len(t.split()), backend=backend)
+
+    assert len(por_bloques.split("\n")) == 2
+    assert len(por_medida.split("\n")) == 2
+    assert len(por_palabras.split("\n")) == 2
+
+def test_sin_titulo():
+    assert extraer_contenido("<p>uno dos tres cuatro cinco seis</p>")[0] == "Contenido Web"
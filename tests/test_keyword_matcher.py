@@ -0,0 +1,35 @@
+from src.handlers.post import PostHandler
+from src.handlers.resume import ResumeHandler
+from src.utils.classifier import CryptoIntentClassifier
+from src.utils.keyword_matcher import KeywordMatcher
+
+
+def test_solo_palabras_completas_y_sin_tildes():
+    matcher = KeywordMatcher({"solana": ["sol"], "ia": ["ia"], "precio": ["cotización", "a cuánto"]})
+
+    assert matcher.categorias("Solo voy hacia allá") == set()
+    assert matcher.categorias("¿A CUANTO está SOL? cotizacion e IA") == {"solana", "precio", "ia"}
+
+def test_frases_solapadas_en_una_pasada():
+    matcher = KeywordMatcher({"contrato": ["smart contract"], "tecnologia": ["contract", "smart"]})
+
+    assert matcher.coincidencias("un smart contract nuevo") == [
+        (1, "tecnologia", "smart"),
+        (1, "contrato", "smart contract"),
+        (2, "tecnologia", "contract"),
+    ]
+
+def test_primera_por_prioridad_o_posicion():
+    matcher = KeywordMatcher({"a": ["uno"], "b": ["dos"]})
+
+    assert matcher.primera("dos y uno") == "b"
+    assert matcher.primera("dos y uno", prioridad=["a", "b"]) == "a"
+    assert matcher.primera("nada") is None
+
+def test_call_sites():
+    assert CryptoIntentClassifier.detectar_cripto("Solo quiero saber de ADA") == "cardano"
+    assert CryptoIntentClassifier.detectar_cripto("Lo haré solo") is None
+    assert CryptoIntentClassifier.classify_intent("Voy hacia el centro") == "otro"
+    assert ResumeHandler()._classify_content("La IA generativa cambia el software") == "tecnología"
+    assert ResumeHandler()._classify_content("Vamos hacia otro tema") == "general"
+    assert PostHandler()._generate_hashtags("Nuevo juego NFT con IA") == "#GameFi #IA"
@@ -0,0 +1,68 @@
+import asyncio
+import httpx
+import openai
+import pytest
+from types import SimpleNamespace
+from src.services import openai as servicio
+
+
+class ClienteFalso:
+    def __init__(self, fallos=0, demora=0.01):
+        self.fallos = fallos
+        self.demora = demora
+        self.activas = 0
+        self.max_activas = 0
+        self.llamadas = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        self.llamadas += 1
+        if self.fallos:
+            self.fallos -= 1
+            respuesta = httpx.Response(429, request=httpx.Request("POST", "https://api.openai.com"))
+            raise openai.RateLimitError("rate limit", response=respuesta, body=None)
+        self.activas += 1
+        self.max_activas = max(self.max_activas, self.activas)
+        await asyncio.sleep(self.demora)
+        self.activas -= 1
+        mensaje = SimpleNamespace(content="ok")
+        return SimpleNamespace(choices=[SimpleNamespace(message=mensaje)])
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    monkeypatch.setattr(servicio, "OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(servicio, "_semaforo", asyncio.Semaphore(2))
+    monkeypatch.setattr(servicio, "metricas", servicio.MetricasOpenAI())
+    monkeypatch.setattr(servicio.OpenAIConfig, "BACKOFF_BASE", 0.001)
+    cliente = ClienteFalso()
+    monkeypatch.setattr(servicio, "_get_client", lambda: cliente)
+    return cliente
+
+@pytest.mark.asyncio
+async def test_concurrencia_acotada_y_metricas(cliente):
+    respuestas = await asyncio.gather(*(servicio.generar_respuesta_ia("hola", "Ana") for _ in range(6)))
+
+    assert respuestas == ["ok"] * 6
+    assert cliente.max_activas == 2
+    resumen = servicio.metricas.resumen()
+    assert resumen["llamadas"] == 6
+    assert resumen["espera_max_s"] > 0
+    assert resumen["en_cola"] == 0
+
+@pytest.mark.asyncio
+async def test_reintenta_ante_429(cliente):
+    cliente.fallos = 2
+
+    assert await servicio.generar_respuesta_ia("hola", "Ana") == "ok"
+    assert cliente.llamadas == 3
+    assert servicio.metricas.reintentos == 2
+
+@pytest.mark.asyncio
+async def test_deadline(cliente):
+    cliente.demora = 1
+
+    respuesta = await servicio.generar_respuesta_ia("hola", "Ana", deadline=0.05)
+
+    assert "tardando" in respuesta
+    assert servicio.metricas.errores == 1
@@ -0,0 +1,91 @@
+import asyncio
+import pytest
+from src.services.persistence import SQLitePersistence
+
+
+@pytest.mark.asyncio
+async def test_escritura_diferida_en_un_solo_lote(tmp_path):
+    persistencia = SQLitePersistence(tmp_path / "p.db")
+    await persistencia.get_user_data()
+
+    for user_id in range(20):
+        await persistencia.update_user_data(user_id, {"pending_post": {"full": f"post {user_id}"}})
+    await persistencia.update_chat_data(-100, {"cripto_ctx": {"bitcoin": 1.0}})
+    # Nada se escribió todavía: el update no espera al disco
+    assert persistencia.stats()["lotes_escritos"] == 0
+
+    await asyncio.sleep(0.1)
+    assert persistencia.stats()["lotes_escritos"] == 1
+    assert persistencia.stats()["filas_escritas"] == 21
+    await persistencia.flush()
+
+    reiniciada = SQLitePersistence(tmp_path / "p.db")
+    assert (await reiniciada.get_user_data())[7] == {"pending_post": {"full": "post 7"}}
+    assert await reiniciada.get_chat_data() == {-100: {"cripto_ctx": {"bitcoin": 1.0}}}
+    await reiniciada.flush()
+
+@pytest.mark.asyncio
+async def test_otro_proceso_ve_los_cambios_en_el_siguiente_update(tmp_path):
+    a = SQLitePersistence(tmp_path / "p.db", retraso_escritura=0)
+    # Sin intervalo mínimo: cada refresh del test equivale a un update posterior
+    b = SQLitePersistence(tmp_path / "p.db", retraso_escritura=60, intervalo_sincronizacion=0)
+    await a.get_user_data()
+    datos_b = await b.get_user_data()
+
+    await a.update_user_data(1, {"pending_post": {"full": "hola"}})
+    await a.flush()
+
+    user_data = datos_b.get(1, {})
+    await b.refresh_user_data(1, user_data)
+    assert user_data == {"pending_post": {"full": "hola"}}
+
+    # Lo pendiente en este proceso es más nuevo que lo leído del disco
+    await b.update_user_data(2, {"propio": True})
+    c = SQLitePersistence(tmp_path / "p.db", retraso_escritura=0)
+    await c.get_user_data()
+    await c.update_user_data(2, {"ajeno": True})
+    await c.drop_user_data(1)
+    await c.flush()
+    propio = {"propio": True}
+    await b.refresh_user_data(2, propio)
+    assert propio == {"propio": True}
+
+    # Los borrados también se propagan
+    await b.refresh_user_data(1, user_data)
+    assert user_data == {}
+    await b.flush()
+    await a.flush()
+
+@pytest.mark.asyncio
+async def test_un_update_lee_los_cambios_ajenos_una_sola_vez(tmp_path):
+    a = SQLitePersistence(tmp_path / "p.db", retraso_escritura=0)
+    b = SQLitePersistence(tmp_path / "p.db", intervalo_sincronizacion=60)
+    await a.get_user_data()
+    await b.get_user_data()
+    await a.update_chat_data(-100, {"cripto_ctx": {"bitcoin": 1.0}})
+    await a.flush()
+
+    # Lo que PTB hace antes de cada update: tres refresh seguidos
+    bot_data, chat_data, user_data = {}, {}, {}
+    await asyncio.gather(
+        b.refresh_bot_data(bot_data), b.refresh_chat_data(-100, chat_data), b.refresh_user_data(1, user_data)
+    )
+    await b.refresh_user_data(1, user_data)
+
+    assert chat_data == {"cripto_ctx": {"bitcoin": 1.0}}
+    assert b.stats()["sincronizaciones"] == 1
+    await b.flush()
+
+@pytest.mark.asyncio
+async def test_conversaciones_y_bot_data(tmp_path):
+    persistencia = SQLitePersistence(tmp_path / "p.db")
+    await persistencia.update_conversation("post", (-100, 5), 1)
+    await persistencia.update_conversation("post", (-100, 6), 2)
+    await persistencia.update_conversation("post", (-100, 6), None)
+    await persistencia.update_bot_data({"arranques": 3})
+    await persistencia.flush()
+
+    reiniciada = SQLitePersistence(tmp_path / "p.db")
+    assert await reiniciada.get_conversations("post") == {(-100, 5): 1}
+    assert await reiniciada.get_bot_data() == {"arranques": 3}
+    await reiniciada.flush()
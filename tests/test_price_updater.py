@@ -0,0 +1,94 @@
+import httpx
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from src.services import price_updater
+from src.utils import decay_counter
+from src.utils.decay_counter import DecayingCounter
+
+
+@pytest.fixture
+def demanda(monkeypatch):
+    contador = DecayingCounter(vida_media=3600)
+    monkeypatch.setattr(price_updater, "_demanda", contador)
+    return contador
+
+def test_hot_set_incluye_los_ids_mas_pedidos(demanda, monkeypatch):
+    monkeypatch.setattr(price_updater.APIConfig, "HOT_SET_SIZE", 2)
+    for _ in range(5):
+        price_updater.registrar_demanda("pepe")
+    for _ in range(3):
+        price_updater.registrar_demanda("dogwifcoin")
+    price_updater.registrar_demanda("bonk")
+    price_updater.registrar_demanda("bitcoin")
+
+    tokens = price_updater.tokens_a_actualizar()
+
+    assert set(price_updater.TOKENS_PRINCIPALES) <= set(tokens)
+    assert tokens[-2:] == ["pepe", "dogwifcoin"]
+    assert "bonk" not in tokens
+
+def test_la_demanda_decae_con_el_tiempo(monkeypatch):
+    ahora = [0.0]
+    monkeypatch.setattr(decay_counter, "time", SimpleNamespace(monotonic=lambda: ahora[0]))
+    contador = DecayingCounter(vida_media=60)
+    for _ in range(4):
+        contador.registrar("pepe")
+    ahora[0] = 120
+    contador.registrar("bonk")
+    contador.registrar("bonk")
+
+    assert contador.valor("pepe") == pytest.approx(1.0)
+    assert contador.top(2) == ["bonk", "pepe"]
+
+def test_intervalo_adaptativo(monkeypatch):
+    monkeypatch.setattr(price_updater.APIConfig, "UPDATER_JITTER", 0)
+
+    assert price_updater.siguiente_intervalo(2.5, 0) == price_updater.APIConfig.UPDATER_MIN_INTERVAL
+    assert price_updater.siguiente_intervalo(0.1, 10) == price_updater.APIConfig.UPDATER_INTERVAL
+    assert price_updater.siguiente_intervalo(0.1, 3600) == price_updater.APIConfig.UPDATER_MAX_INTERVAL
+
+@pytest.mark.asyncio
+async def test_backoff_exponencial_ante_429(monkeypatch):
+    monkeypatch.setattr(price_updater.APIConfig, "UPDATER_JITTER", 0)
+    respuesta = httpx.Response(429, request=httpx.Request("GET", "https://api.coingecko.com"))
+
+    async def limitado():
+        raise httpx.HTTPStatusError("429", request=respuesta.request, response=respuesta)
+
+    programados = []
+    context = MagicMock()
+    context.job_queue.run_once.side_effect = lambda cb, when, name: programados.append(when) or MagicMock()
+    monkeypatch.setattr(price_updater, "actualizar_precios", limitado)
+    monkeypatch.setattr(price_updater, "_job", object())
+    monkeypatch.setattr(price_updater, "_fallos_429", 0)
+
+    for _ in range(3):
+        await price_updater._tick(context)
+
+    base = price_updater.APIConfig.UPDATER_INTERVAL
+    assert programados == [base, base * 2, base * 4]
+
+@pytest.mark.asyncio
+async def test_actualizador_comparte_el_presupuesto_de_coingecko(monkeypatch, tmp_path):
+    from src.services.coingecko import CoinGeckoAPI
+    from src.services.shared_price_cache import SharedPriceCache
+
+    def responder(request):
+        return httpx.Response(429)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(responder))
+    monkeypatch.setattr(price_updater, "get_http_client", lambda: client)
+    monkeypatch.setattr(price_updater, "lider_actualizador", SimpleNamespace(intentar=lambda: True))
+    monkeypatch.setattr(price_updater, "precio_cache", SharedPriceCache(tmp_path / "precios.db"))
+    limitador = price_updater.coingecko_limiter
+    monkeypatch.setattr(limitador, "rate", limitador.rate)
+    monkeypatch.setattr(limitador, "_tokens", limitador.capacity)
+    tasa = limitador.rate
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await price_updater.actualizar_precios()
+
+    # El 429 del actualizador también frena las consultas bajo demanda
+    assert CoinGeckoAPI._rate_limiter is limitador
+    assert limitador.rate == tasa / 2
@@ -0,0 +1,33 @@
+from src.utils.personality import Personalidad
+from src.utils.prompt_builder import construir_prompt, serializar_entrada
+
+
+def precio(simbolo, nombre, valor):
+    return {"nombre": nombre, "simbolo": simbolo, "precio": valor, "cambio_24h": 1.234,
+            "ultima_actualizacion": "15/05/2024 10:30"}
+
+def test_serializacion_compacta():
+    assert serializar_entrada("bitcoin", precio("BTC", "Bitcoin", 67123.456)) == \
+        "BTC (Bitcoin) 67,123.46 USD +1.23% 24h @15/05/2024 10:30"
+    assert serializar_entrada("pepe", precio("PEPE", "Pepe", 0.00001234)).startswith("PEPE 0.00001234 USD")
+
+def test_respeta_presupuesto_y_prioriza_menciones_y_recientes():
+    contexto = {"solana": precio("SOL", "Solana", 150)}  # la más antigua
+    contexto.update({f"coin{i}": precio(f"C{i}", f"Coin {i}", i) for i in range(50)})
+
+    prompt = construir_prompt("Base", contexto, consulta="¿Qué opinas de SOL?", presupuesto=60)
+
+    assert prompt.tokens_contexto <= 60
+    assert prompt.incluidas + prompt.descartadas == 51
+    lineas = prompt.texto.split("Contexto actual:\n")[1].split("\n")
+    assert lineas[0].startswith("- SOL")
+    assert lineas[1].startswith("- C49")
+
+def test_contexto_de_texto_se_recorta():
+    prompt = construir_prompt("Base", "dato " * 1000, presupuesto=50)
+
+    assert prompt.tokens_contexto <= 50
+    assert prompt.texto.endswith("…")
+
+def test_instrucciones_sin_contexto():
+    assert Personalidad.get_instructions() == Personalidad.INSTRUCCIONES
@@ -0,0 +1,38 @@
+import asyncio
+import time
+import pytest
+from src.utils.rate_limiter import AsyncTokenBucket
+
+
+@pytest.mark.asyncio
+async def test_acquire_espera_sin_bloquear_el_loop():
+    bucket = AsyncTokenBucket(rate=20, capacity=1)
+    ticks = []
+
+    async def latido():
+        for _ in range(5):
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.01)
+
+    inicio = time.monotonic()
+    await asyncio.gather(latido(), *(bucket.acquire() for _ in range(3)))
+
+    # 1 token inmediato + 2 esperas de 50 ms, mientras el latido sigue corriendo
+    assert time.monotonic() - inicio >= 0.09
+    assert len(ticks) == 5
+
+def test_penalizar_y_recuperar():
+    bucket = AsyncTokenBucket(rate=1, min_rate=0.25)
+    bucket.penalizar()
+    bucket.penalizar()
+    bucket.penalizar()
+    assert bucket.rate == 0.25
+    for _ in range(50):
+        bucket.recuperar()
+    assert bucket.rate == 1
+
+def test_try_acquire():
+    bucket = AsyncTokenBucket(rate=0.001, capacity=2)
+    assert bucket.try_acquire()
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
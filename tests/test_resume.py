@@ -0,0 +1,68 @@
+import asyncio
+import pytest
+from src.handlers import resume
+from src.handlers.resume import ResumeHandler
+from src.utils.tokens import contar_tokens, dividir_en_trozos
+
+
+def test_trozos_respetan_el_presupuesto():
+    texto = "\n".join(f"Párrafo {i}. " + "Bitcoin sube con fuerza hoy. " * 20 for i in range(30))
+    texto += "\n" + "palabra " * 2000  # un párrafo que no cabe en ningún trozo
+
+    trozos = dividir_en_trozos(texto, 300)
+
+    assert len(trozos) > 1
+    assert all(contar_tokens(t) <= 300 for t in trozos)
+    assert " ".join(" ".join(trozos).split()) == " ".join(texto.split())
+
+@pytest.mark.asyncio
+async def test_map_reduce_con_concurrencia_acotada(monkeypatch):
+    monkeypatch.setattr(resume.OpenAIConfig, "RESUMEN_TOKENS_TROZO", 200)
+    monkeypatch.setattr(resume.OpenAIConfig, "RESUMEN_CONCURRENCIA", 2)
+    activas = max_activas = 0
+    reduce = {}
+
+    async def completar_prompt(prompt, max_tokens):
+        nonlocal activas, max_activas
+        activas += 1
+        max_activas = max(max_activas, activas)
+        await asyncio.sleep(0.01)
+        activas -= 1
+        if "fragmento 3 de" in prompt:
+            raise TimeoutError
+        return "- parcial"
+
+    async def stream(prompt, nombre, max_tokens, al_completar):
+        reduce["prompt"] = prompt
+        yield "final"
+        if al_completar:
+            al_completar("final")
+
+    monkeypatch.setattr(resume, "completar_prompt", completar_prompt)
+    monkeypatch.setattr(resume, "generar_respuesta_ia_stream", stream)
+
+    texto = "\n".join("Ethereum lanza una actualización importante. " * 10 for _ in range(8))
+    completo = []
+    salida = [f async for f in ResumeHandler()._stream_document_summary(texto, "blockchain", completo.append)]
+
+    # Con un trozo fallido el resumen se avisa como parcial y no se guarda
+    assert salida[0] == "final" and "Resumen parcial" in salida[1]
+    assert completo == []
+    assert max_activas == 2
+    # El trozo fallido se omite y el reduce usa el formato temático
+    assert reduce["prompt"].count("- parcial") == len(dividir_en_trozos(texto, 200)) - 1
+    assert "💰 Tokenomics" in reduce["prompt"]
+
+@pytest.mark.asyncio
+async def test_resumen_guardado_con_markdown_roto_se_envia_sin_formato():
+    from unittest.mock import AsyncMock, MagicMock
+    from telegram.error import BadRequest
+
+    update = MagicMock()
+    update.message.reply_text = AsyncMock(side_effect=[BadRequest("Can't parse entities"), MagicMock()])
+    guardado = {"title": "snake_case sin cerrar", "summary": "*resumen"}
+
+    await ResumeHandler()._enviar_resumen_guardado(update, guardado, "https://ejemplo.com")
+
+    assert update.message.reply_text.call_count == 2
+    assert "parse_mode" not in update.message.reply_text.call_args.kwargs
@@ -0,0 +1,99 @@
+import asyncio
+import pytest
+from telegram.error import RetryAfter
+from src.utils.send_limiter import AGRUPABLE, EDICION_INTERMEDIA, LimitadorEnvios
+
+
+class Telegram:
+    """Callback falso de Bot._do_post: registra los envíos y puede fallar con RetryAfter"""
+    def __init__(self, fallos=0):
+        self.enviados = []
+        self.fallos = fallos
+
+    async def __call__(self, endpoint, data, **kwargs):
+        if self.fallos:
+            self.fallos -= 1
+            raise RetryAfter(0)
+        self.enviados.append((endpoint, dict(data)))
+        return {"message_id": len(self.enviados), "text": data.get("text")}
+
+async def enviar(limitador, telegram, texto, chat_id=5, endpoint="sendMessage", rate_limit_args=None, **extra):
+    data = {"chat_id": chat_id, "text": texto, **extra}
+    return await limitador.process_request(
+        telegram, (endpoint, data), {}, endpoint=endpoint, data=data, rate_limit_args=rate_limit_args
+    )
+
+@pytest.mark.asyncio
+async def test_mensajes_agrupables_en_cola_salen_unidos():
+    limitador = LimitadorEnvios(privado_por_segundo=50, rafaga_chat=1)
+    telegram = Telegram()
+
+    resultados = await asyncio.gather(
+        enviar(limitador, telegram, "a", rate_limit_args=AGRUPABLE),
+        enviar(limitador, telegram, "b", rate_limit_args=AGRUPABLE),
+        enviar(limitador, telegram, "c", rate_limit_args=AGRUPABLE, parse_mode="Markdown"),
+        enviar(limitador, telegram, "otro chat", chat_id=6, rate_limit_args=AGRUPABLE),
+    )
+
+    # Mismo chat y mismos parámetros se unen; otro parse_mode u otro chat van aparte
+    textos = sorted(data["text"] for _, data in telegram.enviados)
+    assert textos == ["a\n\nb", "c", "otro chat"]
+    assert resultados[0] is resultados[1]
+    assert limitador.stats()["agrupados"] == 1
+
+@pytest.mark.asyncio
+async def test_envio_no_agrupable_cierra_el_lote():
+    limitador = LimitadorEnvios(privado_por_segundo=50, rafaga_chat=1)
+    telegram = Telegram()
+
+    await asyncio.gather(
+        enviar(limitador, telegram, "a", rate_limit_args=AGRUPABLE),
+        enviar(limitador, telegram, "placeholder"),
+        enviar(limitador, telegram, "b", rate_limit_args=AGRUPABLE),
+    )
+
+    # "b" no se adelanta al placeholder uniéndose a "a"
+    assert sorted(data["text"] for _, data in telegram.enviados) == ["a", "b", "placeholder"]
+
+@pytest.mark.asyncio
+async def test_limite_por_chat_en_grupos():
+    limitador = LimitadorEnvios(grupo_por_minuto=600, rafaga_chat=1)
+    telegram = Telegram()
+    inicio = asyncio.get_running_loop().time()
+
+    await asyncio.gather(*(enviar(limitador, telegram, str(i), chat_id=-100) for i in range(3)))
+
+    # 10 mensajes/s en el grupo: el tercero sale a los ~200 ms
+    assert asyncio.get_running_loop().time() - inicio >= 0.19
+    assert len(telegram.enviados) == 3
+
+@pytest.mark.asyncio
+async def test_retry_after_se_reintenta_salvo_que_se_pida_lo_contrario():
+    limitador = LimitadorEnvios()
+    telegram = Telegram(fallos=2)
+
+    resultado = await enviar(limitador, telegram, "hola")
+    assert resultado["text"] == "hola"
+    assert limitador.stats()["flood_waits"] == 2
+
+    telegram.fallos = 1
+    with pytest.raises(RetryAfter):
+        await enviar(limitador, telegram, "edición", endpoint="editMessageText", rate_limit_args=EDICION_INTERMEDIA)
+
+@pytest.mark.asyncio
+async def test_edicion_intermedia_sin_token_se_salta_sin_retrasar_respuestas():
+    limitador = LimitadorEnvios(grupo_por_minuto=60, rafaga_chat=1)
+    telegram = Telegram()
+    await enviar(limitador, telegram, "primera", chat_id=-100)
+
+    # Sin token libre en el grupo la edición falla al momento en vez de hacer cola
+    with pytest.raises(RetryAfter):
+        await enviar(limitador, telegram, "edición", chat_id=-100, endpoint="editMessageText",
+                     rate_limit_args=EDICION_INTERMEDIA)
+    assert limitador.stats()["ediciones_saltadas"] == 1
+
+    # ...y la respuesta siguiente sale con el primer token que se libere
+    inicio = asyncio.get_running_loop().time()
+    await enviar(limitador, telegram, "/precio", chat_id=-100)
+    assert asyncio.get_running_loop().time() - inicio < 1.2
+    assert [d["text"] for _, d in telegram.enviados] == ["primera", "/precio"]
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import time
+import pytest
+from src.services.shared_price_cache import SharedPriceCache
+from src.utils.host_lock import HostLock
+
+
+@pytest.fixture
+def workers(tmp_path):
+    creados = [SharedPriceCache(tmp_path / "precios.db", ttl=60, stale_ttl=600, lease_seg=0.3) for _ in range(2)]
+    yield creados
+    for cache in creados:
+        cache.cerrar()
+
+@pytest.mark.asyncio
+async def test_un_solo_proceso_consulta_upstream_por_id(workers):
+    a, b = workers
+    llamadas = []
+
+    async def upstream():
+        llamadas.append(1)
+        await asyncio.sleep(0.1)
+        return {"precio": 100.0}
+
+    resultados = await asyncio.gather(
+        a.get_or_fetch("bitcoin", upstream),
+        b.get_or_fetch("bitcoin", upstream),
+    )
+
+    assert resultados == [{"precio": 100.0}, {"precio": 100.0}]
+    assert len(llamadas) == 1
+    assert a.stats()["upstream"] + b.stats()["upstream"] == 1
+    # Ya en L1 de ambos: la siguiente lectura no toca SQLite
+    assert b.get("bitcoin") == {"precio": 100.0}
+
+@pytest.mark.asyncio
+async def test_lo_publicado_por_el_lider_lo_leen_los_demas(workers):
+    a, b = workers
+    await a.publicar({"ethereum": {"precio": 3000.0}, "solana": {"precio": 150.0}})
+
+    async def upstream():
+        raise AssertionError("no debería consultar upstream")
+
+    assert await b.get_or_fetch("solana", upstream) == {"precio": 150.0}
+    assert b.stats()["l2_hits"] == 1
+
+@pytest.mark.asyncio
+async def test_lease_vencido_se_reclama(workers):
+    a, b = workers
+    # Un proceso tomó el lease y murió sin soltarlo
+    assert await asyncio.to_thread(a._tomar_lease, "pepe")
+
+    async def upstream():
+        return {"precio": 0.00001}
+
+    assert await b.get_or_fetch("pepe", upstream) == {"precio": 0.00001}
+    assert b.stats()["esperas_lease"] >= 1
+
+@pytest.mark.asyncio
+async def test_consulta_lenta_conserva_el_lease_y_los_demas_sirven_stale(workers):
+    a, b = workers
+    # Copia vieja en L2: ya no fresca (ttl 60) pero servible como stale (600)
+    await asyncio.to_thread(a._en_transaccion, lambda conn: conn.execute(
+        "INSERT INTO precios VALUES (?, ?, ?)", ("bitcoin", json.dumps({"precio": 90.0}), time.time() - 120)
+    ))
+    llamadas = []
+
+    async def upstream():
+        llamadas.append(1)
+        # Bastante más que lease_seg (0.3 s): sin renovación, b lo reclamaría y consultaría otra vez
+        await asyncio.sleep(1.0)
+        return {"precio": 100.0}
+
+    consulta = asyncio.create_task(a.get_or_fetch("bitcoin", upstream))
+    await asyncio.sleep(0.05)
+    inicio = time.monotonic()
+    # b no espera más de lease_seg: se queda con la copia stale de L2
+    assert await b.get_or_fetch("bitcoin", upstream) == {"precio": 90.0}
+    assert time.monotonic() - inicio < 0.9
+
+    assert await consulta == {"precio": 100.0}
+    assert len(llamadas) == 1
+
+@pytest.mark.asyncio
+async def test_el_lider_se_salta_los_ids_que_otro_esta_consultando(workers):
+    a, b = workers
+
+    async with a.reservar(["bitcoin"]):
+        async with b.reservar(["bitcoin", "ethereum"]) as propias:
+            assert propias == ["ethereum"]
+    # Al salir del bloque se sueltan y vuelven a estar libres
+    async with b.reservar(["bitcoin", "ethereum"]) as propias:
+        assert propias == ["bitcoin", "ethereum"]
+
+def test_host_lock_elige_un_solo_lider(tmp_path):
+    primero, segundo = HostLock(tmp_path / "lider.lock"), HostLock(tmp_path / "lider.lock")
+
+    assert primero.intentar()
+    assert not segundo.intentar()
+    primero.soltar()
+    assert segundo.intentar()
+    segundo.soltar()
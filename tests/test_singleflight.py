@@ -0,0 +1,52 @@
+import asyncio
+import pytest
+from src.utils.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_llamadas_concurrentes_comparten_resultado():
+    sf = SingleFlight()
+    llamadas = 0
+
+    async def fetch():
+        nonlocal llamadas
+        llamadas += 1
+        await asyncio.sleep(0.01)
+        return {"usd": 1.0}
+
+    resultados = await asyncio.gather(*(sf.do("pepe", fetch) for _ in range(20)))
+
+    assert llamadas == 1
+    assert all(r == {"usd": 1.0} for r in resultados)
+    assert len(sf) == 0
+
+@pytest.mark.asyncio
+async def test_llamadas_concurrentes_comparten_error():
+    sf = SingleFlight()
+    llamadas = 0
+
+    async def fetch():
+        nonlocal llamadas
+        llamadas += 1
+        await asyncio.sleep(0.01)
+        raise ValueError("429")
+
+    resultados = await asyncio.gather(*(sf.do("pepe", fetch) for _ in range(5)), return_exceptions=True)
+
+    assert llamadas == 1
+    assert all(isinstance(r, ValueError) for r in resultados)
+
+@pytest.mark.asyncio
+async def test_cancelar_un_llamador_no_cancela_a_los_demas():
+    sf = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return 42
+
+    primero = asyncio.create_task(sf.do("btc", fetch))
+    segundo = asyncio.create_task(sf.do("btc", fetch))
+    await asyncio.sleep(0)
+    primero.cancel()
+
+    assert await segundo == 42
@@ -0,0 +1,78 @@
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+from telegram.constants import ChatType
+from telegram.error import BadRequest
+from src.utils import streaming
+
+
+async def fragmentos(*partes):
+    for parte in partes:
+        yield parte
+
+
+@pytest.fixture
+def message():
+    message = MagicMock()
+    message.chat.type = ChatType.PRIVATE
+    message.reply_text = AsyncMock(return_value=MagicMock(edit_text=AsyncMock()))
+    return message
+
+@pytest.mark.asyncio
+async def test_placeholder_ediciones_espaciadas_y_edicion_final(message, monkeypatch):
+    reloj = iter([0.0, 0.1, 0.2, 1.5, 1.6, 1.7])
+    monkeypatch.setattr(streaming, "time", SimpleNamespace(monotonic=lambda: next(reloj)))
+
+    texto = await streaming.responder_en_streaming(
+        message, fragmentos("Bitcoin ", "sube ", "con ", "fuerza"), sufijo="\n\n⚠️", parse_mode="Markdown"
+    )
+
+    placeholder = message.reply_text.return_value
+    ediciones = [c.args[0] for c in placeholder.edit_text.call_args_list]
+    assert texto == "Bitcoin sube con fuerza"
+    assert message.reply_text.call_args.args[0] == streaming.PLACEHOLDER
+    # 1ª edición inmediata, 2 fragmentos dentro del intervalo se agrupan, y la final con formato
+    assert ediciones == ["Bitcoin " + streaming.CURSOR, "Bitcoin sube con " + streaming.CURSOR, "Bitcoin sube con fuerza\n\n⚠️"]
+    assert placeholder.edit_text.call_args.kwargs["parse_mode"] == "Markdown"
+
+@pytest.mark.asyncio
+async def test_texto_largo_se_reparte_en_varios_mensajes(message):
+    largo = "línea\n" * 1000
+
+    await streaming.responder_en_streaming(message, fragmentos(largo))
+
+    assert message.reply_text.call_count == 2
+
+@pytest.mark.asyncio
+async def test_partes_extra_conservan_el_formato(message):
+    largo = "*línea*\n" * 1000
+
+    await streaming.responder_en_streaming(message, fragmentos(largo), parse_mode="Markdown")
+
+    assert message.reply_text.call_args.kwargs["parse_mode"] == "Markdown"
+
+@pytest.mark.asyncio
+async def test_generador_se_cierra_si_falla_la_edicion(message):
+    cerrado = False
+
+    async def generador():
+        nonlocal cerrado
+        try:
+            yield "hola"
+            yield "mundo"
+        finally:
+            cerrado = True
+
+    message.reply_text.return_value.edit_text.side_effect = RuntimeError("caído")
+    with pytest.raises(RuntimeError):
+        await streaming.responder_en_streaming(message, generador())
+
+    assert cerrado
+
+@pytest.mark.asyncio
+async def test_formato_invalido_se_reenvia_como_texto_plano(message):
+    message.reply_text.side_effect = [BadRequest("Can't parse entities"), MagicMock()]
+
+    await streaming.responder_con_formato(message, "*sin cerrar", "Markdown")
+
+    assert "parse_mode" not in message.reply_text.call_args.kwargs
@@ -0,0 +1,27 @@
+from src.services.summary_store import SummaryStore, canonicalizar_url, hash_contenido
+
+
+def test_canonicalizar_url():
+    base = canonicalizar_url("https://ejemplo.com/articulo?a=1&b=2")
+
+    assert canonicalizar_url("HTTPS://www.Ejemplo.com/articulo/?b=2&a=1#comentarios") == base
+    assert canonicalizar_url("https://ejemplo.com/articulo?a=1&utm_source=x&b=2&fbclid=y") == base
+    assert canonicalizar_url("https://ejemplo.com/articulo?a=2&b=2") != base
+
+def test_hash_ignora_espacios():
+    assert hash_contenido("Bitcoin  sube\n hoy") == hash_contenido("Bitcoin sube hoy")
+
+def test_guardar_y_revalidar(tmp_path):
+    store = SummaryStore(tmp_path / "resumenes.db")
+    store.guardar("https://ejemplo.com/a", "Título", "Resumen", "abc", etag='"v1"')
+    antes = store.obtener("https://ejemplo.com/a")["checked_at"]
+
+    store.revalidado("https://ejemplo.com/a", last_modified="Mon, 01 Jan 2024 00:00:00 GMT")
+    guardado = store.obtener("https://ejemplo.com/a")
+
+    assert guardado["summary"] == "Resumen"
+    assert guardado["etag"] == '"v1"'
+    assert guardado["last_modified"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+    assert guardado["checked_at"] >= antes
+    assert store.obtener("https://ejemplo.com/b") is None
+    store.cerrar()
@@ -0,0 +1,61 @@
+import asyncio
+import pytest
+from datetime import datetime
+from telegram import Chat, Message, Update, User
+from src.utils.update_processor import ChatUpdateProcessor
+
+
+def update(update_id, chat_id, user_id):
+    msg = Message(message_id=update_id, date=datetime.now(), chat=Chat(chat_id, Chat.SUPERGROUP),
+                  from_user=User(user_id, "u", False), text="hola")
+    return Update(update_id=update_id, message=msg)
+
+@pytest.mark.asyncio
+async def test_orden_por_conversacion_y_paralelo_entre_ellas():
+    procesador = ChatUpdateProcessor(limite=4)
+    eventos = []
+    activas = max_activas = 0
+
+    async def manejar(nombre, demora):
+        nonlocal activas, max_activas
+        activas += 1
+        max_activas = max(max_activas, activas)
+        eventos.append(f"inicio {nombre}")
+        await asyncio.sleep(demora)
+        eventos.append(f"fin {nombre}")
+        activas -= 1
+
+    await asyncio.gather(
+        procesador.process_update(update(1, -1, 10), manejar("a1", 0.05)),
+        procesador.process_update(update(2, -1, 10), manejar("a2", 0)),
+        procesador.process_update(update(3, -1, 20), manejar("b1", 0.01)),
+    )
+
+    # El mismo usuario en el mismo chat va en orden; otro usuario no espera
+    assert eventos.index("fin a1") < eventos.index("inicio a2")
+    assert eventos.index("fin b1") < eventos.index("fin a1")
+    assert max_activas == 2
+    stats = procesador.stats()
+    assert stats["procesados"] == 3 and stats["en_cola"] == 0 and stats["conversaciones_activas"] == 0
+
+@pytest.mark.asyncio
+async def test_limite_global_no_lo_ocupan_los_que_esperan_carril():
+    procesador = ChatUpdateProcessor(limite=2)
+    liberar = asyncio.Event()
+    activas = 0
+
+    async def manejar():
+        nonlocal activas
+        activas += 1
+        await liberar.wait()
+
+    # Diez updates del mismo usuario esperan en su carril sin bloquear a los demás
+    tareas = [asyncio.create_task(procesador.process_update(update(i, -1, 10), manejar())) for i in range(10)]
+    otra = asyncio.create_task(procesador.process_update(update(99, -1, 20), manejar()))
+    await asyncio.sleep(0.01)
+
+    assert activas == 2
+    assert procesador.stats()["en_cola"] == 9
+    liberar.set()
+    await asyncio.gather(*tareas, otra)
+    assert activas == 11
@@ -0,0 +1,62 @@
+import httpx
+import pytest
+from src.services import web_fetcher
+from src.services.web_fetcher import WebFetchError, descargar_pagina
+
+
+def servir(respuesta):
+    cliente = httpx.AsyncClient(transport=httpx.MockTransport(respuesta))
+    return lambda: cliente
+
+@pytest.mark.asyncio
+async def test_descarga_html_con_validadores(monkeypatch):
+    def respuesta(request):
+        assert request.headers["if-none-match"] == '"v1"'
+        return httpx.Response(200, html="<p>hola</p>", headers={"ETag": '"v2"'})
+    monkeypatch.setattr(web_fetcher, "get_http_client", servir(respuesta))
+
+    pagina = await descargar_pagina("https://ejemplo.com", {"If-None-Match": '"v1"'})
+
+    assert pagina.status == 200
+    assert pagina.html == "<p>hola</p>"
+    assert pagina.etag == '"v2"'
+
+@pytest.mark.asyncio
+async def test_rechaza_contenido_no_html(monkeypatch):
+    monkeypatch.setattr(web_fetcher, "get_http_client", servir(
+        lambda request: httpx.Response(200, content=b"%PDF", headers={"Content-Type": "application/pdf"})
+    ))
+
+    with pytest.raises(WebFetchError, match="no es HTML"):
+        await descargar_pagina("https://ejemplo.com/doc.pdf")
+
+@pytest.mark.asyncio
+async def test_rechaza_content_length_excesivo(monkeypatch):
+    monkeypatch.setattr(web_fetcher, "get_http_client", servir(
+        lambda request: httpx.Response(200, html="x" * 5000)
+    ))
+
+    with pytest.raises(WebFetchError, match="pesa"):
+        await descargar_pagina("https://ejemplo.com", max_bytes=1024)
+
+@pytest.mark.asyncio
+async def test_trunca_cuerpo_sin_longitud_declarada(monkeypatch):
+    async def trozos():
+        for _ in range(100):
+            yield b"a" * 100
+    monkeypatch.setattr(web_fetcher, "get_http_client", servir(
+        lambda request: httpx.Response(200, content=trozos(), headers={"Content-Type": "text/html"})
+    ))
+
+    pagina = await descargar_pagina("https://ejemplo.com", max_bytes=1000)
+
+    assert pagina.truncada
+    assert len(pagina.html) == 1000
+
+@pytest.mark.asyncio
+async def test_parsea_fuera_del_loop():
+    import threading
+    hilo = await web_fetcher.parsear_en_pool(lambda html: threading.current_thread().name, "<p></p>")
+
+    assert hilo.startswith("html")
+    web_fetcher.cerrar_web_fetcher()
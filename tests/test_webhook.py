@@ -0,0 +1,76 @@
+import json
+import pytest
+import render_main
+
+
+class Cliente:
+    """Llama a la app ASGI como lo haría uvicorn y recoge la respuesta"""
+    def __init__(self):
+        self.status = None
+        self.cuerpo = b""
+
+    async def request(self, method, path, body=b"", headers=()):
+        scope = {"type": "http", "method": method, "path": path, "headers": list(headers)}
+        partes = [body[:10], body[10:]]
+
+        async def receive():
+            parte = partes.pop(0)
+            return {"type": "http.request", "body": parte, "more_body": bool(partes)}
+
+        async def send(mensaje):
+            if mensaje["type"] == "http.response.start":
+                self.status = mensaje["status"]
+            else:
+                self.cuerpo += mensaje.get("body", b"")
+
+        await render_main.app(scope, receive, send)
+        return self.status
+
+def update(update_id):
+    return json.dumps({
+        "update_id": update_id,
+        "message": {"message_id": 1, "date": 0, "chat": {"id": 1, "type": "private"}, "text": "hola"}
+    }).encode()
+
+@pytest.fixture
+def cola(monkeypatch):
+    monkeypatch.setattr(render_main, "secret_token", "s3cret")
+    monkeypatch.setattr(render_main, "updates_vistos", render_main.SeenSet(max_size=10))
+    cola = render_main.application.update_queue
+    while not cola.empty():
+        cola.get_nowait()
+    return cola
+
+@pytest.mark.asyncio
+async def test_health_check():
+    cliente = Cliente()
+    assert await cliente.request("GET", "/") == 200
+    assert "activo" in cliente.cuerpo.decode()
+
+@pytest.mark.asyncio
+async def test_webhook_valida_secreto_y_descarta_repetidos(cola):
+    secreto = [(b"x-telegram-bot-api-secret-token", b"s3cret")]
+    ruta = render_main.WEBHOOK_PATH
+
+    assert await Cliente().request("POST", ruta, update(7)) == 403
+    assert await Cliente().request("POST", ruta, b"{no json", secreto) == 400
+    assert await Cliente().request("POST", ruta, update(7), secreto) == 200
+    assert await Cliente().request("POST", ruta, update(7), secreto) == 200
+    assert await Cliente().request("POST", ruta, update(8), secreto) == 200
+
+    assert [cola.get_nowait().update_id for _ in range(cola.qsize())] == [7, 8]
+    assert render_main.updates_vistos.duplicados == 1
+
+def test_seen_set_acotado():
+    vistos = render_main.SeenSet(max_size=2)
+    assert vistos.add(1) and vistos.add(2) and not vistos.add(1)
+    vistos.add(3)
+    assert 1 not in vistos and len(vistos) == 2
+
+def test_secreto_derivado_es_estable_entre_procesos():
+    secreto = render_main.secreto_webhook("123:abc")
+
+    # Mismo token, mismo secreto en cada worker; y válido para Telegram (A-Z, a-z, 0-9, _ y -)
+    assert secreto == render_main.secreto_webhook("123:abc")
+    assert secreto != render_main.secreto_webhook("123:otro")
+    assert secreto.isalnum() and len(secreto) <= 256